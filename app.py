@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from supabase import create_client, Client
 import os
+from stockdb import StockRepository
+from stock_catalog import catalog_frame, summarize_day
+from backtest import load_history, build_panel, load_price_file, run_backtest, format_summary
+from stock_history import RANGE_COLUMNS, build_pivot, recurrence, daily_counts
+from table_format import COLUMN_LABELS, NUMBER_FORMATS, SORTABLE_COLUMNS, prepare_table
 
 # 页面配置
 st.set_page_config(
@@ -12,6 +16,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# 表格展示的列，同时也是从数据库读取的列
+DISPLAY_COLUMNS = [
+    'code', 'stock_name', 'latest_price', 'latest_change_pct',
+    'auction_change_pct', 'pe_ttm', 'market_cap', 'volume_ratio',
+    'listing_board', 'auction_type', 'auction_rating', 'strategies'
+]
+
 # 样式配置
 st.markdown("""
 <style>
@@ -34,8 +45,8 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 @st.cache_resource
-def init_supabase():
-    """初始化 Supabase 连接"""
+def init_repository():
+    """初始化 Supabase 连接，返回整个应用共用的 StockRepository（连接池在各会话间共享）"""
     SUPABASE_URL = st.secrets.get("SUPABASE_URL", os.getenv("SUPABASE_URL"))
     SUPABASE_KEY = st.secrets.get("SUPABASE_KEY", os.getenv("SUPABASE_KEY"))
     
@@ -64,10 +75,10 @@ def init_supabase():
         st.stop()
     
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        repo = StockRepository.connect(SUPABASE_URL, SUPABASE_KEY)
         # 测试连接
-        supabase.table('stocks').select('update_date').limit(1).execute()
-        return supabase
+        repo.ping()
+        return repo
     except Exception as e:
         st.error(f"❌ Supabase 连接失败: {e}")
         st.warning("""
@@ -80,39 +91,31 @@ def init_supabase():
         st.stop()
 
 @st.cache_data(ttl=300)  # 缓存5分钟
-def get_available_dates(_supabase):
-    """获取可用的数据日期"""
+def get_available_dates(_repo):
+    """获取可用的数据日期（查询 stock_dates 日期目录）"""
     try:
-        response = _supabase.table('stocks').select('update_date').execute()
-        dates = [row['update_date'] for row in response.data]
-        unique_dates = sorted(list(set(dates)), reverse=True)
-        return unique_dates
+        return _repo.available_dates()
     except Exception as e:
         st.error(f"❌ 获取日期列表失败: {e}")
         return []
 
 @st.cache_data(ttl=300)
-def get_stocks_by_date(_supabase, selected_date):
-    """根据日期获取股票数据"""
+def get_date_catalog(_repo):
+    """读取 stock_dates 日期目录：每天一行预先计算的汇总，一次查询覆盖全部日期"""
     try:
-        response = _supabase.table('stocks').select('*').eq('update_date', selected_date).execute()
-        if response.data:
-            df = pd.DataFrame(response.data)
-            return df
-        else:
-            return pd.DataFrame()
+        return catalog_frame(_repo.date_catalog())
     except Exception as e:
-        st.error(f"❌ 获取股票数据失败: {e}")
+        st.error(f"❌ 获取日期目录失败: {e}")
         return pd.DataFrame()
 
-def format_number(value, decimals=2):
-    """格式化数字显示"""
-    if pd.isna(value) or value is None:
-        return "N/A"
+@st.cache_data(ttl=300)
+def get_stocks_by_date(_repo, selected_date, columns=None):
+    """根据日期获取股票数据，返回 (DataFrame, 加载统计)；历史日期优先读取本地 Parquet 分区"""
     try:
-        return f"{float(value):.{decimals}f}"
-    except (ValueError, TypeError):
-        return str(value)
+        return _repo.day_rows(selected_date, columns)
+    except Exception as e:
+        st.error(f"❌ 获取股票数据失败: {e}")
+        return pd.DataFrame(), {}
 
 def format_percentage(value):
     """格式化百分比显示"""
@@ -124,6 +127,223 @@ def format_percentage(value):
     except (ValueError, TypeError):
         return str(value)
 
+def table_column_config():
+    """明细表的列配置：显示名和数值格式"""
+    config = {
+        column: st.column_config.NumberColumn(COLUMN_LABELS[column], format=fmt)
+        for column, fmt in NUMBER_FORMATS.items()
+    }
+    config['code'] = st.column_config.NumberColumn("股票代码", format=NUMBER_FORMATS['code'], width="small")
+    config['stock_name'] = st.column_config.TextColumn("股票名称", width="medium")
+    config['latest_change_pct'] = st.column_config.NumberColumn(
+        COLUMN_LABELS['latest_change_pct'], format=NUMBER_FORMATS['latest_change_pct'],
+        help="股票最新涨跌幅百分比", width="small"
+    )
+    config['strategies'] = st.column_config.ListColumn(COLUMN_LABELS['strategies'])
+    for column in ('listing_board', 'auction_type', 'auction_rating'):
+        config[column] = COLUMN_LABELS[column]
+    return config
+
+def show_load_stats(stats):
+    """在侧边栏显示数据加载来源和传输量"""
+    if not stats:
+        return
+    if stats.get('source') == 'local':
+        st.sidebar.caption(f"💾 本地缓存: {stats['rows']} 行")
+        return
+    size = f"{stats['bytes'] / 1024:.1f} KB" if stats.get('bytes') is not None else "未知"
+    st.sidebar.caption(
+        f"🌐 Supabase: {stats['rows']} 行, {stats['pages']} 页, {size}, {stats['elapsed']:.2f}s"
+    )
+
+def catalog_summary(catalog, selected_date):
+    """目录中某一天的汇总行，没有时返回 None"""
+    if catalog.empty:
+        return None
+    rows = catalog[catalog['update_date'] == selected_date]
+    return rows.iloc[0].to_dict() if len(rows) else None
+
+def show_overview(summary):
+    """数据概览：条数、平均涨跌幅、平均竞价涨幅、上涨占比，以及分位数和板块分布"""
+    total_stocks = summary.get('row_count') or 0
+    positive_count = summary.get('up_count') or 0
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(label="符合条件股票数量", value=f"{total_stocks} 只")
+    
+    with col2:
+        st.metric(label="平均涨跌幅", value=format_percentage(summary.get('avg_latest_change_pct')))
+    
+    with col3:
+        st.metric(label="平均竞价涨幅", value=format_percentage(summary.get('avg_auction_change_pct')))
+    
+    with col4:
+        positive_ratio = (positive_count / total_stocks * 100) if total_stocks > 0 else 0
+        st.metric(
+            label="上涨股票占比",
+            value=f"{positive_ratio:.1f}%",
+            delta=f"{positive_count}/{total_stocks}"
+        )
+    
+    st.caption(
+        f"涨跌幅中位数 {format_percentage(summary.get('median_latest_change_pct'))}，"
+        f"四分位 {format_percentage(summary.get('p25_latest_change_pct'))} ~ "
+        f"{format_percentage(summary.get('p75_latest_change_pct'))}，"
+        f"竞价涨幅中位数 {format_percentage(summary.get('median_auction_change_pct'))}"
+    )
+    
+    board_stats = summary.get('board_stats')
+    if isinstance(board_stats, dict) and board_stats:
+        with st.expander("📊 板块分布"):
+            boards = pd.DataFrame.from_dict(board_stats, orient='index')
+            st.dataframe(boards.rename(columns={
+                'row_count': '数量', 'up_count': '上涨数量',
+                'avg_latest_change_pct': '平均涨跌幅(%)', 'median_latest_change_pct': '涨跌幅中位数(%)',
+                'avg_auction_change_pct': '平均竞价涨幅(%)',
+            }), use_container_width=True)
+
+def show_trend(catalog):
+    """多日趋势：全部来自日期目录，不读取明细数据"""
+    if len(catalog) < 2:
+        return
+    trend = catalog.set_index(pd.to_datetime(catalog['update_date']))
+    lines = {
+        'avg_latest_change_pct': '平均涨跌幅',
+        'median_latest_change_pct': '涨跌幅中位数',
+        'avg_auction_change_pct': '平均竞价涨幅',
+    }
+    lines = {col: name for col, name in lines.items() if col in trend.columns}
+    
+    st.header("📈 多日趋势")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.line_chart(trend[list(lines)].astype(float).rename(columns=lines))
+    with col2:
+        st.bar_chart(trend['row_count'].rename('入选数量'))
+
+def filter_by_strategy(df):
+    """侧边栏按命中策略筛选，只有一个策略时不显示"""
+    if 'strategies' not in df.columns:
+        return df
+    
+    df = df.copy()
+    df['strategies'] = df['strategies'].apply(lambda tags: list(tags) if tags is not None else [])
+    exploded = df['strategies'].explode()
+    options = sorted(exploded.dropna().unique())
+    if len(options) <= 1:
+        return df
+    
+    selected = st.sidebar.multiselect("命中策略", options, default=options)
+    if set(selected) == set(options):
+        return df
+    mask = exploded.isin(selected).groupby(level=0).any()
+    return df[mask.reindex(df.index, fill_value=False)]
+
+@st.cache_resource(ttl=3600)
+def get_backtest_panel(_repo):
+    """读取全部历史并装入回测矩阵（矩阵较大，按资源缓存避免每次复制）"""
+    history = load_history(_repo)
+    if history.empty:
+        return None
+    return build_panel(history, load_price_file())
+
+def backtest_page(repo):
+    """策略回测页面"""
+    st.header("📈 策略回测")
+    
+    with st.spinner("加载历史数据..."):
+        panel = get_backtest_panel(repo)
+    if panel is None:
+        st.warning("⚠️ 暂无历史数据，可以先运行 backfill.py 补录")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        options = ["全部"] + sorted(panel.strategies)
+        strategy = st.selectbox("策略", options)
+    with col2:
+        horizons = st.multiselect("持有天数", [1, 2, 3, 5, 10, 20], default=[1, 3, 5])
+    if not horizons:
+        st.info("请选择持有天数")
+        return
+    
+    summary, curves = run_backtest(panel, sorted(horizons), None if strategy == "全部" else strategy)
+    st.caption(f"📅 {panel.dates[0]} ~ {panel.dates[-1]}，{len(panel.dates)} 个交易日，{len(panel.codes)} 只股票")
+    st.dataframe(format_summary(summary), use_container_width=True, hide_index=True)
+    st.line_chart(curves)
+    st.caption("价格取每天 9:27 获取时的竞价价格；N 天后未再次入选的股票没有价格，不计入收益（见覆盖率）")
+
+@st.cache_data(ttl=600, show_spinner="正在加载区间数据...")
+def get_range_pivot(_repo, dates):
+    """按日期区间读取并构建透视表和重复入选统计，同一区间只计算一次，切换标签页不再重新加载"""
+    history, stats = _repo.range_rows(dates, RANGE_COLUMNS)
+    pivot = build_pivot(history, dates)
+    table = recurrence(pivot)
+    return pivot, table, daily_counts(pivot, table), stats
+
+def comparison_page(repo):
+    """多日对比：重复入选、连续入选和个股时间序列"""
+    st.header("🗓️ 多日对比")
+    catalog = get_date_catalog(repo)
+    all_dates = catalog['update_date'].tolist() if not catalog.empty \
+        else sorted(get_available_dates(repo))
+    if len(all_dates) < 2:
+        st.warning("⚠️ 至少需要两天的数据")
+        return
+    
+    start, end = st.sidebar.select_slider(
+        "日期范围", options=all_dates, value=(all_dates[max(0, len(all_dates) - 20)], all_dates[-1])
+    )
+    dates = tuple(d for d in all_dates if start <= d <= end)
+    pivot, table, counts, stats = get_range_pivot(repo, dates)
+    st.sidebar.caption(
+        f"💾 本地 {stats['local_days']} 天，🌐 Supabase {stats['remote_days']} 天 "
+        f"({stats['pages']} 页)，共 {stats['rows']} 行"
+    )
+    if table.empty:
+        st.warning("⚠️ 所选区间无数据")
+        return
+    st.caption(f"📅 {start} ~ {end}：{len(dates)} 天，{len(table)} 只股票")
+    
+    tab_recur, tab_series, tab_daily = st.tabs(["🔁 重复入选", "📈 个股走势", "📅 每日统计"])
+    
+    with tab_recur:
+        min_days = st.slider("最少入选天数", 1, len(dates), min(2, len(dates)))
+        st.dataframe(
+            table[table['days'] >= min_days].reset_index(),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "code": st.column_config.NumberColumn("股票代码", format="%06d"),
+                "stock_name": "股票名称",
+                "days": "入选天数",
+                "ratio": st.column_config.ProgressColumn("入选占比", format="%.0f%%", min_value=0, max_value=1),
+                "first_seen": "首次入选",
+                "last_seen": "最近入选",
+                "longest_streak": "最长连续天数",
+                "current_streak": "当前连续天数",
+            },
+        )
+    
+    with tab_series:
+        code = st.selectbox(
+            "股票", table.index.tolist(),
+            format_func=lambda c: f"{c:06d} {table.at[c, 'stock_name']} ({table.at[c, 'days']} 天)"
+        )
+        series = pd.DataFrame({
+            '最新涨跌幅(%)': pivot.latest_change.loc[code],
+            '竞价涨幅(%)': pivot.auction_change.loc[code],
+        })
+        series.index = pd.to_datetime(series.index)
+        st.line_chart(series)
+        st.caption("未入选的日期没有数据，图中留空")
+    
+    with tab_daily:
+        daily = counts.rename(columns={'selected': '入选数量', 'new': '区间内首次入选'})
+        daily.index = pd.to_datetime(daily.index)
+        st.bar_chart(daily)
+
 def main():
     """主应用程序"""
     # 应用标题
@@ -131,13 +351,25 @@ def main():
     st.markdown("---")
     
     # 初始化 Supabase 连接
-    supabase = init_supabase()
+    repo = init_repository()
+    
+    page = st.sidebar.radio("页面", ["📋 每日数据", "🗓️ 多日对比", "📈 策略回测"])
+    if page == "📈 策略回测":
+        backtest_page(repo)
+        return
+    if page == "🗓️ 多日对比":
+        comparison_page(repo)
+        return
     
     # 侧边栏 - 日期选择
     st.sidebar.header("📅 数据筛选")
     
-    # 获取可用日期
-    available_dates = get_available_dates(supabase)
+    # 日期目录：日期列表、数据概览和多日趋势都来自这一次查询
+    catalog = get_date_catalog(repo)
+    if not catalog.empty:
+        available_dates = catalog['update_date'].iloc[::-1].tolist()
+    else:
+        available_dates = get_available_dates(repo)
     
     if not available_dates:
         st.warning("⚠️ 暂无数据，请先运行数据获取脚本")
@@ -151,144 +383,62 @@ def main():
     )
     
     # 获取选定日期的数据
-    df = get_stocks_by_date(supabase, selected_date)
+    df, load_stats = get_stocks_by_date(repo, selected_date, tuple(DISPLAY_COLUMNS))
+    show_load_stats(load_stats)
     
     if df.empty:
         st.warning(f"⚠️ {selected_date} 无股票数据")
         return
     
-    # 计算汇总统计
-    total_stocks = len(df)
-    avg_change = df['latest_change_pct'].mean() if 'latest_change_pct' in df.columns else 0
-    avg_auction_change = df['auction_change_pct'].mean() if 'auction_change_pct' in df.columns else 0
+    # 按命中策略筛选
+    df = filter_by_strategy(df)
+    
+    # 未按策略筛选时直接使用目录中预先计算的汇总，筛选后按当前数据计算
+    summary = catalog_summary(catalog, selected_date)
+    if summary is None or summary.get('row_count') != len(df):
+        summary = summarize_day(df, selected_date)
     
     # 顶部汇总展示
     st.header(f"📈 {selected_date} 数据概览")
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric(
-            label="符合条件股票数量",
-            value=f"{total_stocks} 只",
-            delta=None
-        )
-    
-    with col2:
-        change_color = "positive" if avg_change >= 0 else "negative"
-        st.metric(
-            label="平均涨跌幅",
-            value=format_percentage(avg_change),
-            delta=None
-        )
-    
-    with col3:
-        auction_color = "positive" if avg_auction_change >= 0 else "negative"
-        st.metric(
-            label="平均竞价涨幅",
-            value=format_percentage(avg_auction_change),
-            delta=None
-        )
-    
-    with col4:
-        positive_count = len(df[df['latest_change_pct'] > 0]) if 'latest_change_pct' in df.columns else 0
-        positive_ratio = (positive_count / total_stocks * 100) if total_stocks > 0 else 0
-        st.metric(
-            label="上涨股票占比",
-            value=f"{positive_ratio:.1f}%",
-            delta=f"{positive_count}/{total_stocks}"
-        )
+    show_overview(summary)
+    show_trend(catalog)
     
     st.markdown("---")
     
     # 数据表格展示
     st.header("📋 股票详细数据")
     
-    # 筛选和排序选项
-    col1, col2 = st.columns(2)
+    # 筛选和排序选项（在服务端完成，只发送结果）
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         sort_by = st.selectbox(
             "排序字段",
-            ["latest_change_pct", "auction_change_pct", "pe_ttm", "market_cap", "volume_ratio"],
-            format_func=lambda x: {
-                "latest_change_pct": "最新涨跌幅",
-                "auction_change_pct": "竞价涨幅", 
-                "pe_ttm": "市盈率TTM",
-                "market_cap": "总市值",
-                "volume_ratio": "量比"
-            }.get(x, x)
+            SORTABLE_COLUMNS,
+            format_func=lambda x: COLUMN_LABELS.get(x, x).replace('(%)', '')
         )
     
     with col2:
         sort_order = st.selectbox("排序方式", ["降序", "升序"])
         ascending = sort_order == "升序"
     
-    # 处理数据显示
-    display_df = df.copy()
-    
-    # 选择要显示的列
-    display_columns = [
-        'code', 'stock_name', 'latest_price', 'latest_change_pct',
-        'auction_change_pct', 'pe_ttm', 'market_cap', 'volume_ratio',
-        'listing_board', 'auction_type', 'auction_rating'
-    ]
-    
-    # 过滤存在的列
-    display_columns = [col for col in display_columns if col in display_df.columns]
-    display_df = display_df[display_columns]
-    
-    # 重命名列
-    column_names = {
-        'code': '股票代码',
-        'stock_name': '股票名称',
-        'latest_price': '最新价',
-        'latest_change_pct': '最新涨跌幅(%)',
-        'auction_change_pct': '竞价涨幅(%)',
-        'pe_ttm': '市盈率TTM',
-        'market_cap': '总市值',
-        'volume_ratio': '量比',
-        'listing_board': '上市板块',
-        'auction_type': '竞价异动类型',
-        'auction_rating': '竞价评级'
-    }
-    display_df = display_df.rename(columns=column_names)
+    with col3:
+        search = st.text_input("搜索代码 / 名称")
     
-    # 排序
-    if sort_by in df.columns:
-        display_df = display_df.sort_values(
-            by=column_names.get(sort_by, sort_by), 
-            ascending=ascending
-        )
+    with col4:
+        board_options = sorted(df['listing_board'].dropna().unique()) if 'listing_board' in df.columns else []
+        boards = st.multiselect("上市板块", board_options)
+    
+    display_df = prepare_table(df, DISPLAY_COLUMNS, sort_by, ascending, search, boards)
     
-    # 格式化数值列
-    if '最新价' in display_df.columns:
-        display_df['最新价'] = display_df['最新价'].apply(lambda x: format_number(x))
-    if '最新涨跌幅(%)' in display_df.columns:
-        display_df['最新涨跌幅(%)'] = display_df['最新涨跌幅(%)'].apply(format_percentage)
-    if '竞价涨幅(%)' in display_df.columns:
-        display_df['竞价涨幅(%)'] = display_df['竞价涨幅(%)'].apply(format_percentage)
-    if '市盈率TTM' in display_df.columns:
-        display_df['市盈率TTM'] = display_df['市盈率TTM'].apply(lambda x: format_number(x))
-    if '总市值' in display_df.columns:
-        display_df['总市值'] = display_df['总市值'].apply(lambda x: f"{float(x)/100000000:.2f}亿" if pd.notna(x) and x != 'N/A' else 'N/A')
-    if '量比' in display_df.columns:
-        display_df['量比'] = display_df['量比'].apply(lambda x: format_number(x))
-    
-    # 显示表格
+    # 显示表格：数值列保持数值，由 column_config 负责格式
+    st.caption(f"共 {len(display_df)} 只")
     st.dataframe(
         display_df,
         use_container_width=True,
         height=600,
-        column_config={
-            "股票代码": st.column_config.TextColumn("股票代码", width="small"),
-            "股票名称": st.column_config.TextColumn("股票名称", width="medium"),
-            "最新涨跌幅(%)": st.column_config.NumberColumn(
-                "最新涨跌幅(%)",
-                help="股票最新涨跌幅百分比",
-                width="small"
-            ),
-        }
+        hide_index=True,
+        column_config=table_column_config(),
     )
     
     # 底部信息
@@ -0,0 +1,136 @@
+"""
+历史数据补录
+按交易日历逐日查询问财历史结果，用进程池并行处理多天，
+映射和写库复用 fetch_stock_data 的同一套流程（stocks 表、本地分区、日期目录）。
+每完成一天写一次检查点，中断后重新执行同一命令会跳过已完成的日期，只重试失败的日期。
+
+用法:
+    python backfill.py 2025-01-02 2025-03-31
+    python backfill.py 2025-01-02 2025-03-31 --workers 3
+    python backfill.py 2025-01-02 2025-03-31 --dry-run     # 只列出待补录的日期
+    python backfill.py 2025-01-02 2025-03-31 --force       # 忽略检查点全部重跑
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from trading_calendar import trading_days
+
+# 检查点文件
+BACKFILL_CHECKPOINT = os.getenv(
+    'BACKFILL_CHECKPOINT',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'backfill_checkpoint.json')
+)
+
+# 默认并行进程数；各进程的限速间隔按进程数放大，总请求频率与单次运行相同
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', '2'))
+
+# 这些状态的日期不再重跑
+FINISHED_STATUSES = ('done', 'empty')
+
+def load_checkpoint(path=BACKFILL_CHECKPOINT):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_checkpoint(checkpoint, path=BACKFILL_CHECKPOINT):
+    """原子写入，中途被打断也不会留下损坏的检查点"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def pending_days(start, end, checkpoint, force=False):
+    days = trading_days(start, end)
+    if force:
+        return days
+    return [day for day in days if checkpoint.get(day, {}).get('status') not in FINISHED_STATUSES]
+
+def backfill_day(day, rate_scale=1):
+    """在子进程中补录一天：查询、映射、写库，返回结果摘要"""
+    import fetch_stock_data as fsd
+
+    start = time.perf_counter()
+    fetched, errors = fsd.fetch_strategy_frames(query_date=day, rate_scale=rate_scale)
+    rows, write_errors = 0, []
+    if fetched:
+        _, merged = fsd.map_strategy_frames(fetched, day)
+        rows, write_errors = fsd.write_strategy_frames(merged, errors, day)
+
+    # 有任何一行写库失败也记为失败，续跑时会重新补录这一天
+    if errors or write_errors:
+        status = 'failed'
+    else:
+        status = 'done' if rows else 'empty'
+    return {
+        'status': status,
+        'rows': rows,
+        'errors': [f"{strategy['name']}: {error}" for strategy, error in errors] +
+                  [f"{table}: {error}" for table, error in write_errors],
+        'elapsed': round(time.perf_counter() - start, 2),
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def run_backfill(days, workers=BACKFILL_WORKERS, checkpoint_path=BACKFILL_CHECKPOINT):
+    """并行补录多天，每完成一天更新检查点，返回检查点内容"""
+    checkpoint = load_checkpoint(checkpoint_path)
+    workers = max(1, min(workers, len(days)))
+    # spawn 启动子进程，避免继承父进程中已经建立的 HTTP 连接
+    context = multiprocessing.get_context('spawn')
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {executor.submit(backfill_day, day, workers): day for day in days}
+        for done, future in enumerate(as_completed(futures), start=1):
+            day = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'status': 'failed', 'rows': 0, 'errors': [str(e)],
+                          'finished_at': datetime.now().isoformat(timespec='seconds')}
+            checkpoint[day] = result
+            save_checkpoint(checkpoint, checkpoint_path)
+
+            icon = {'done': '✅', 'empty': '📭'}.get(result['status'], '❌')
+            detail = f"{result['rows']} 条" if result['status'] != 'failed' else '; '.join(result['errors'])
+            print(f"{icon} [{done}/{len(days)}] {day}: {detail}")
+    return checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('start', help='开始日期 YYYY-MM-DD')
+    parser.add_argument('end', help='结束日期 YYYY-MM-DD（包含）')
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS, help='并行进程数')
+    parser.add_argument('--force', action='store_true', help='忽略检查点，全部重跑')
+    parser.add_argument('--dry-run', action='store_true', help='只列出待补录的日期')
+    args = parser.parse_args()
+
+    if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_KEY'):
+        print("❌ 未设置 Supabase 配置环境变量")
+        return 1
+
+    checkpoint = load_checkpoint()
+    days = pending_days(args.start, args.end, checkpoint, force=args.force)
+    print(f"📅 {args.start} ~ {args.end}: 待补录 {len(days)} 个交易日")
+    if args.dry_run or not days:
+        for day in days:
+            print(day)
+        return 0
+
+    checkpoint = run_backfill(days, workers=args.workers)
+    failed = [day for day in days if checkpoint.get(day, {}).get('status') == 'failed']
+    if failed:
+        print(f"⚠️ {len(failed)} 天补录失败，重新执行同一命令即可重试: {', '.join(failed)}")
+        return 1
+    print("✅ 补录完成")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
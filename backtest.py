@@ -0,0 +1,214 @@
+"""
+向量化回测
+把历史每日筛选结果装入 (交易日 × 股票代码) 的 NumPy 矩阵，计算入选后第 N 个交易日的收益、胜率、
+资金曲线和最大回撤，全部为矩阵运算，几年的数据在一秒内完成。
+
+价格取每天 9:27 获取时的价格（竞价成交价，缺失时用最新价），收益相当于「竞价买入、N 天后竞价卖出」。
+stocks 表只保存当天入选的股票，N 天后没有再次入选的股票没有价格，这部分信号不计入收益，
+覆盖率（有收益的信号占比）会一并给出；设置 BACKTEST_PRICE_FILE 可以补充完整的每日价格
+（Parquet，列为 update_date、code、price）。
+
+用法:
+    python backtest.py --horizons 1 3 5
+    python backtest.py --strategy auction_breakout --start 2025-01-01 --end 2025-06-30
+"""
+
+import argparse
+import os
+import sys
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import local_store
+from stockdb import StockRepository
+from trading_calendar import trading_days
+
+# 补充价格文件（可选）
+BACKTEST_PRICE_FILE = os.getenv('BACKTEST_PRICE_FILE', '')
+
+DEFAULT_HORIZONS = (1, 3, 5)
+
+# 装入矩阵的数值列
+PANEL_FIELDS = (
+    'latest_price', 'auction_price', 'latest_change_pct', 'auction_change_pct', 'pe_ttm',
+    'volume_ratio', 'dde_large_order', 'interval_change_13d', 'interval_change_5d', 'market_cap',
+    'listing_days',
+)
+
+# dates: 交易日字符串数组；codes: 股票代码数组；fields: {列名: float64 矩阵}；
+# screened: 当天是否入选；strategies: {策略标签: bool 矩阵}
+Panel = namedtuple('Panel', ['dates', 'codes', 'fields', 'screened', 'strategies'])
+
+def load_history(repo=None, start=None, end=None, table=None):
+    """读取历史每日筛选结果（repo 为 stockdb.StockRepository）：优先本地分区，
+    缺失的日期从 Supabase 批量读取并写入本地分区；repo 为 None 时只用本地分区
+
+    table 为 stocks 以外的表（如参数扫描超集的 stocks_sweep）时不使用本地分区，
+    日期取自 stock_dates 目录（超集与 stocks 在同一次运行中写入）。"""
+    dates = repo.available_dates() if repo is not None else local_store.list_partitions()
+    dates = [d for d in dates if (not start or d >= start) and (not end or d <= end)]
+    if repo is None:
+        history, _ = local_store.read_partitions(dates)
+    else:
+        history, _ = repo.range_rows(dates, table=table)
+    return history
+
+def load_price_file(path=BACKTEST_PRICE_FILE):
+    if not path:
+        return None
+    prices = pd.read_parquet(path, columns=['update_date', 'code', 'price'])
+    prices['update_date'] = prices['update_date'].astype(str).str[:10]
+    return prices
+
+def build_panel(history, prices=None):
+    """长表 -> Panel；时间轴为覆盖区间内的全部交易日，N 天后即第 N 个交易日"""
+    history = history.dropna(subset=['code', 'update_date']).reset_index(drop=True)
+    update_dates = history['update_date'].astype(str).str[:10].to_numpy(dtype=object)
+    raw_codes = history['code'].to_numpy(dtype='int64')
+    seen_dates = pd.unique(update_dates)
+    calendar = trading_days(min(seen_dates), max(seen_dates)) if len(seen_dates) else []
+    dates = np.array(sorted(set(calendar).union(seen_dates)), dtype=str)
+    codes = np.sort(pd.unique(raw_codes))
+
+    # 哈希查找行列位置，比排序后 searchsorted 快
+    rows = pd.Index(dates).get_indexer(update_dates)
+    cols = pd.Index(codes).get_indexer(raw_codes)
+    shape = (len(dates), len(codes))
+
+    fields = {}
+    for field in PANEL_FIELDS:
+        matrix = np.full(shape, np.nan)
+        if field in history.columns:
+            matrix[rows, cols] = pd.to_numeric(history[field], errors='coerce').to_numpy(dtype='float64')
+        fields[field] = matrix
+
+    if prices is not None and not prices.empty:
+        # 只补充落在面板内的价格
+        p_rows = pd.Index(dates).get_indexer(prices['update_date'].to_numpy(dtype=str))
+        p_cols = pd.Index(codes).get_indexer(prices['code'].to_numpy(dtype='int64'))
+        ok = (p_rows >= 0) & (p_cols >= 0)
+        extra = np.full(shape, np.nan)
+        extra[p_rows[ok], p_cols[ok]] = prices['price'].to_numpy(dtype='float64')[ok]
+        fields['latest_price'] = np.where(np.isnan(fields['latest_price']), extra, fields['latest_price'])
+
+    screened = np.zeros(shape, dtype=bool)
+    screened[rows, cols] = True
+
+    strategies = {}
+    if 'strategies' in history.columns:
+        exploded = history['strategies'].explode().dropna()
+        positions = exploded.index.to_numpy()
+        tag_ids, tags = pd.factorize(exploded.astype(str))
+        for tag_id, tag in enumerate(tags):
+            selected = positions[tag_ids == tag_id]
+            mask = np.zeros(shape, dtype=bool)
+            mask[rows[selected], cols[selected]] = True
+            strategies[tag] = mask
+
+    return Panel(dates, codes, fields, screened, strategies)
+
+def signal_mask(panel, strategy=None):
+    """入选信号矩阵；指定策略时只取命中该策略的股票"""
+    if strategy:
+        return panel.strategies.get(strategy, np.zeros_like(panel.screened))
+    return panel.screened
+
+def entry_prices(panel):
+    """买入价：竞价成交价，缺失时用最新价"""
+    auction, latest = panel.fields['auction_price'], panel.fields['latest_price']
+    return np.where(np.isnan(auction), latest, auction)
+
+def forward_returns(panel, horizon):
+    """第 t 天买入、第 t + horizon 个交易日卖出的收益矩阵，缺价格处为 NaN"""
+    entry = entry_prices(panel)
+    exit_prices = np.full_like(entry, np.nan)
+    if horizon < len(entry):
+        exit_prices[:-horizon] = entry[horizon:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = exit_prices / entry - 1
+    returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+def max_drawdown(equity):
+    if len(equity) == 0:
+        return 0.0
+    peak = np.maximum.accumulate(equity)
+    return float(np.min(equity / peak - 1))
+
+def evaluate(panel, signal, horizon, returns=None):
+    """对一个信号矩阵计算某个持有期的统计和资金曲线
+
+    每天等权买入当天全部有收益的信号；持有 horizon 天时每天只投入 1/horizon 的资金，
+    资金曲线按每日组合收益 / horizon 累乘，是分批滚动持有的近似。
+    """
+    returns = forward_returns(panel, horizon) if returns is None else returns
+    observed = signal & ~np.isnan(returns)
+    picked = np.where(observed, returns, 0.0)
+
+    counts = observed.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        daily = np.where(counts > 0, picked.sum(axis=1) / np.maximum(counts, 1), 0.0)
+    equity = np.cumprod(1 + daily / horizon)
+    values = returns[observed]
+
+    signals = int(signal.sum())
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return {
+            'horizon': horizon,
+            'signals': signals,
+            'observed': int(observed.sum()),
+            'coverage': float(observed.sum() / signals) if signals else 0.0,
+            'mean_return': float(values.mean()) if len(values) else np.nan,
+            'median_return': float(np.median(values)) if len(values) else np.nan,
+            'hit_rate': float((values > 0).mean()) if len(values) else np.nan,
+            'total_return': float(equity[-1] - 1) if len(equity) else 0.0,
+            'max_drawdown': max_drawdown(equity),
+            'equity': equity,
+        }
+
+def run_backtest(panel, horizons=DEFAULT_HORIZONS, strategy=None):
+    """按持有期回测，返回 (统计表 DataFrame, 资金曲线 DataFrame)"""
+    signal = signal_mask(panel, strategy)
+    results = [evaluate(panel, signal, h) for h in horizons]
+    summary = pd.DataFrame([{k: v for k, v in r.items() if k != 'equity'} for r in results])
+    curves = pd.DataFrame({f'{r["horizon"]}日': r['equity'] for r in results},
+                          index=pd.to_datetime(panel.dates))
+    return summary, curves
+
+def format_summary(summary):
+    table = summary.copy()
+    for col in ('coverage', 'mean_return', 'median_return', 'hit_rate', 'total_return', 'max_drawdown'):
+        table[col] = (table[col] * 100).map(lambda v: f'{v:.2f}%' if pd.notna(v) else '-')
+    return table.rename(columns={
+        'horizon': '持有天数', 'signals': '信号数', 'observed': '有收益信号', 'coverage': '覆盖率',
+        'mean_return': '平均收益', 'median_return': '收益中位数', 'hit_rate': '胜率',
+        'total_return': '累计收益', 'max_drawdown': '最大回撤',
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--horizons', type=int, nargs='+', default=list(DEFAULT_HORIZONS))
+    parser.add_argument('--strategy', help='只回测命中该策略（strategies.json 中的 tag）的股票')
+    parser.add_argument('--start', help='开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', help='结束日期 YYYY-MM-DD')
+    parser.add_argument('--local', action='store_true', help='只使用本地分区，不访问 Supabase')
+    args = parser.parse_args()
+
+    repo = None if args.local else StockRepository.from_env()
+    history = load_history(repo, args.start, args.end)
+    if history.empty:
+        print("❌ 没有可用的历史数据")
+        return 1
+
+    panel = build_panel(history, load_price_file())
+    summary, _ = run_backtest(panel, args.horizons, args.strategy)
+    print(f"📅 {panel.dates[0]} ~ {panel.dates[-1]}: {len(panel.dates)} 个交易日, {len(panel.codes)} 只股票")
+    print(format_summary(summary).to_string(index=False))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+回测基准测试：合成多年的每日筛选结果，测量装入矩阵和回测的耗时
+
+用法:
+    python benchmarks/bench_backtest.py --days 750 --per-day 300 --universe 4000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest import build_panel, run_backtest, DEFAULT_HORIZONS  # noqa: E402
+from trading_calendar import trading_days  # noqa: E402
+
+def make_history(days, per_day, universe, seed=0):
+    """每天从 universe 只股票中随机抽取 per_day 只作为入选结果，价格为随机游走"""
+    rng = np.random.default_rng(seed)
+    dates = trading_days('2023-01-03', '2030-12-31')[:days]
+    codes = rng.choice(np.arange(1, 700000), size=universe, replace=False)
+    prices = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(len(dates), universe)), axis=0))
+    tags = np.array(['auction_breakout', 'low_pe_momentum', 'volume_ratio_spike'], dtype=object)
+
+    picks = np.argsort(rng.random((len(dates), universe)), axis=1)[:, :per_day]
+    rows = np.repeat(np.arange(len(dates)), per_day)
+    cols = picks.ravel()
+    n = len(rows)
+    return pd.DataFrame({
+        'update_date': np.array(dates, dtype=object)[rows],
+        'code': codes[cols],
+        'latest_price': prices[rows, cols],
+        'auction_price': prices[rows, cols] * (1 + rng.normal(0, 0.002, n)),
+        'auction_change_pct': rng.uniform(0, 6, n),
+        'volume_ratio': rng.uniform(0.5, 8, n),
+        'pe_ttm': rng.uniform(5, 80, n),
+        'strategies': [[tag] for tag in tags[rng.integers(0, len(tags), n)]],
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=750)
+    parser.add_argument('--per-day', type=int, default=300)
+    parser.add_argument('--universe', type=int, default=4000)
+    args = parser.parse_args()
+
+    history = make_history(args.days, args.per_day, args.universe)
+    print(f"{len(history)} 行历史数据 ({args.days} 天 x {args.per_day} 只/天, 股票池 {args.universe})")
+
+    start = time.perf_counter()
+    panel = build_panel(history)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary, _ = run_backtest(panel, DEFAULT_HORIZONS)
+    backtest_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for tag in panel.strategies:
+        run_backtest(panel, DEFAULT_HORIZONS, strategy=tag)
+    per_strategy = (time.perf_counter() - start) / max(1, len(panel.strategies))
+
+    print(f"矩阵 {len(panel.dates)} x {len(panel.codes)}")
+    print(f"装入矩阵: {build_seconds:.3f}s")
+    print(f"回测 {len(DEFAULT_HORIZONS)} 个持有期: {backtest_seconds:.3f}s (单个策略 {per_strategy:.3f}s)")
+    print(summary[['horizon', 'signals', 'coverage', 'mean_return', 'hit_rate']].to_string(index=False))
+
+if __name__ == '__main__':
+    main()
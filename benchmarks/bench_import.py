@@ -0,0 +1,83 @@
+"""
+启动耗时基准测试：用 python -X importtime 在子进程中测量各入口的导入耗时
+
+每个场景重复运行 --repeat 次取最小值，输出总耗时、累计耗时最高的模块，
+并检查不应出现的重型模块（--check 路径不应导入 pandas / supabase 等）。
+设置 --max-ms 时任一场景超出即返回非零，可放进 CI 发现启动耗时回退。
+
+用法:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --top 15 --repeat 5 --max-ms 300
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'supabase', 'postgrest', 'httpx', 'requests', 'pywencai']
+
+# 场景名 -> (命令参数, 不应导入的模块)
+SCENARIOS = {
+    'import fetch_stock_data': (['-c', 'import fetch_stock_data'], HEAVY_MODULES),
+    'fetch_stock_data --check': (['fetch_stock_data.py', '--check'], HEAVY_MODULES),
+    'import stockdb': (['-c', 'import stockdb'], []),
+    'import pandas': (['-c', 'import pandas'], []),
+}
+
+LINE_PATTERN = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 [(模块, 自身耗时 us, 累计耗时 us, 层级)]"""
+    records = []
+    for line in stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+def run_scenario(args):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    return parse_importtime(result.stderr)
+
+def summarize(records):
+    total_us = sum(cumulative for _, _, cumulative, level in records if level == 0)
+    modules = {name for name, _, _, _ in records}
+    return total_us, modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=10, help='每个场景显示累计耗时最高的模块数')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-ms', type=float, help='fetch_stock_data 场景的导入耗时上限（毫秒）')
+    args = parser.parse_args()
+
+    failed = False
+    for scenario, (command, forbidden) in SCENARIOS.items():
+        runs = [run_scenario(command) for _ in range(args.repeat)]
+        records = min(runs, key=lambda r: summarize(r)[0])
+        total_us, modules = summarize(records)
+        print(f"\n{scenario}: {total_us / 1000:.1f}ms, {len(modules)} 个模块")
+
+        top_level = sorted((r for r in records if r[3] == 0), key=lambda r: r[2], reverse=True)
+        for name, _, cumulative, _ in top_level[:args.top]:
+            print(f"   {cumulative / 1000:8.1f}ms  {name}")
+
+        loaded = [name for name in forbidden if name in modules]
+        if loaded:
+            print(f"   ❌ 导入了重型模块: {', '.join(loaded)}")
+            failed = True
+        if args.max_ms and scenario.startswith(('import fetch', 'fetch')) and total_us / 1000 > args.max_ms:
+            print(f"   ❌ 超过上限 {args.max_ms:.0f}ms")
+            failed = True
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
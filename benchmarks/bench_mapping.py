@@ -0,0 +1,196 @@
+"""
+列映射基准测试：旧版逐行 iterrows 映射 vs 按列批量映射
+
+用法:
+    python benchmarks/bench_mapping.py --rows 5000 50000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from column_plan import compile_plan  # noqa: E402
+from stock_mapping import build_stock_records, PLAN_SPECS, FIELD_SPECS, TEXT_FIELDS, INTEGER_FIELDS  # noqa: E402
+from synthetic import make_wencai_frame, wencai_headers  # noqa: E402
+
+# ---- 旧版实现（原 insert_stock_data 中的逐行循环），仅作对比基线 ----
+
+def _get_value(row, columns, possible_names, default=None):
+    for name in possible_names:
+        if name in columns and pd.notna(row[name]):
+            return row[name]
+    return default
+
+def _get_value_fuzzy(row, columns, possible_names, default=None):
+    for pattern in possible_names:
+        for col in columns:
+            if pattern in col and pd.notna(row[col]):
+                return row[col]
+    return default
+
+def _get_interval_change(row, columns, longer=True, default=None):
+    interval_cols = [col for col in columns if '区间涨跌幅:前复权' in col]
+    if not interval_cols:
+        return default
+    col = max(interval_cols, key=len) if longer else min(interval_cols, key=len)
+    if pd.notna(row[col]):
+        return row[col]
+    return default
+
+def legacy_build_records(df, update_date):
+    """原逐行映射逻辑"""
+    records = []
+    for _, row in df.iterrows():
+        stock_code = None
+        for col in ['代码', '股票代码', '证券代码', 'code']:
+            if col in df.columns and pd.notna(row[col]):
+                stock_code = str(row[col]).replace('.SH', '').replace('.SZ', '').replace('.BJ', '')
+                break
+        if not stock_code:
+            continue
+        try:
+            stock_code = int(stock_code)
+        except Exception:
+            continue
+
+        stock_name = ""
+        for col in ['股票简称', '证券简称', 'name']:
+            if col in df.columns and pd.notna(row[col]):
+                stock_name = str(row[col])
+                break
+        if not stock_name:
+            continue
+
+        records.append({
+            'code': stock_code,
+            'stock_name': stock_name,
+            'latest_price': _get_value(row, df.columns, ['最新价', '现价', 'price']),
+            'latest_change_pct': _get_value(row, df.columns, ['最新涨跌幅', '涨跌幅', '涨跌幅(%)']),
+            'listing_board': _get_value(row, df.columns, ['上市板块', '板块']),
+            'auction_change_pct': _get_value_fuzzy(row, df.columns, ['竞价涨幅']),
+            'pe_ttm': _get_value_fuzzy(row, df.columns, ['市盈率(pe,ttm)']),
+            'pe': _get_value_fuzzy(row, df.columns, ['市盈率(pe)']),
+            'dde_large_order': _get_value_fuzzy(row, df.columns, ['dde大单净量']),
+            'volume_ratio': _get_value_fuzzy(row, df.columns, ['分时量比']),
+            'interval_change_13d': _get_interval_change(row, df.columns, longer=True),
+            'interval_change_5d': _get_interval_change(row, df.columns, longer=False),
+            'listing_days': _get_value_fuzzy(row, df.columns, ['上市天数']),
+            'forecast_pe_1y': _get_value_fuzzy(row, df.columns, ['预测市盈率(pe,最新预测)[2025']),
+            'forecast_pe_2y': _get_value_fuzzy(row, df.columns, ['预测市盈率(pe,最新预测)[2026']),
+            'forecast_pe_3y': _get_value_fuzzy(row, df.columns, ['预测市盈率(pe,最新预测)[2027']),
+            'market_cap': _get_value_fuzzy(row, df.columns, ['总市值']),
+            'eps': _get_value(row, df.columns, ['基本每股收益', 'EPS']),
+            'gross_margin': _get_value(row, df.columns, ['销售毛利率', '毛利率']),
+            'net_margin': _get_value(row, df.columns, ['销售净利率', '净利率']),
+            'auction_price': _get_value_fuzzy(row, df.columns, ['竞价匹配价']),
+            'auction_type': _get_value_fuzzy(row, df.columns, ['竞价异动类型']),
+            'auction_desc': _get_value_fuzzy(row, df.columns, ['竞价异动说明']),
+            'auction_rating': _get_value_fuzzy(row, df.columns, ['集合竞价评级']),
+            'auction_volume': _get_value_fuzzy(row, df.columns, ['竞价量']),
+            'auction_amount': _get_value(row, df.columns, ['竞价金额', '竞价成交额']),
+            'market_code': _get_value(row, df.columns, ['market_code']),
+            'update_date': update_date,
+        })
+    return records
+
+# 预测年份组合 -> 运行日期：年份连续、整体晚一年、中间缺一年
+FORECAST_CASES = [
+    ([2026, 2027, 2028], '2026-03-02'),
+    ([2027, 2028, 2029], '2026-03-02'),
+    ([2026, 2028, 2029], '2026-03-02'),
+]
+
+def check_forecast_columns():
+    """各预测市盈率字段必须对应不同的列，并按年份先后排列"""
+    fields = ['forecast_pe_1y', 'forecast_pe_2y', 'forecast_pe_3y']
+    for years, run_date in FORECAST_CASES:
+        columns = ['股票代码', '股票简称'] + [f'预测市盈率(pe,最新预测)[{year}1231]' for year in years]
+        plan = compile_plan(columns, PLAN_SPECS, run_date)
+        picked = [plan[field] for field in fields]
+        assert picked == [[2], [3], [4]], f'预测列映射错误 {years} @ {run_date}: {picked}'
+
+# ---- 新旧结果逐字段比较，只允许下列有意的差异 ----
+
+NUMERIC_FIELDS = [field for field, _, _ in FIELD_SPECS if field not in TEXT_FIELDS]
+
+# 旧版取错或取不到列的字段，新版结果改为直接与源列比较：
+#   interval_change_5d  旧版按列名长度取最短的区间涨跌幅列，两列等长时与 13 日取到同一列；新版按日期跨度区分
+#   auction_amount      旧版精确匹配不到带 [日期] 后缀的列名；新版先去掉后缀再匹配
+SOURCE_CHECKED_FIELDS = ['interval_change_5d', 'auction_amount']
+
+# 代码格式：旧版 int('600000.0') 失败而丢弃该行，新版按数值解析；非整数代码两版都丢弃
+CODE_CASES = pd.DataFrame({
+    '股票代码': ['600000.0', '600001.SH', '000002.SZ', '1.5', None],
+    '股票简称': ['甲', '乙', '丙', '丁', '戊'],
+})
+
+def _number(value, field):
+    if value is None or pd.isna(value):
+        return None
+    value = float(value)
+    return int(round(value)) if field in INTEGER_FIELDS else value
+
+def expected_record(old, sources, index):
+    """旧版记录按有意的差异转换：数值字符串（如 '12.34'）转为数值，SOURCE_CHECKED_FIELDS 取源列的值"""
+    expected = dict(old)
+    for field in NUMERIC_FIELDS:
+        expected[field] = _number(old[field], field)
+    for field, source in sources.items():
+        expected[field] = _number(source.iloc[index], field)
+    return expected
+
+def check_equivalence(df, old_records, new_records, update_date):
+    """除上述有意的差异外，新旧映射的每个字段都必须一致"""
+    assert [r['code'] for r in old_records] == [r['code'] for r in new_records], '新旧映射的代码不一致'
+    # 合成数据每行都有效，记录与源数据按行对应
+    assert len(new_records) == len(df), '合成数据不应有被过滤的行'
+    headers = wencai_headers(datetime.strptime(update_date, '%Y-%m-%d'))
+    sources = {field: pd.to_numeric(df[headers[field]], errors='coerce') for field in SOURCE_CHECKED_FIELDS}
+    for index, (old, new) in enumerate(zip(old_records, new_records)):
+        expected = expected_record(old, sources, index)
+        assert expected.keys() == new.keys(), f'字段不一致: {sorted(set(expected) ^ set(new))}'
+        for field, value in expected.items():
+            assert new[field] == value, f'第 {index} 行 {field}: 旧版 {old[field]!r} -> 新版 {new[field]!r}'
+
+def check_code_formats():
+    old_codes = [r['code'] for r in legacy_build_records(CODE_CASES, '2025-09-03')]
+    new_codes = [r['code'] for r in build_stock_records(CODE_CASES, '2025-09-03')]
+    assert old_codes == [600001, 2], f'旧版代码解析: {old_codes}'
+    assert new_codes == [600000, 600001, 2], f'新版代码解析: {new_codes}'
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='列映射基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=[5000, 50000])
+    parser.add_argument('--skip-legacy', action='store_true', help='不运行旧版逐行映射')
+    args = parser.parse_args()
+
+    check_forecast_columns()
+    check_code_formats()
+
+    update_date = '2025-09-03'
+    print(f"{'行数':>8} {'旧版(s)':>10} {'新版(s)':>10} {'加速比':>8}")
+    for rows in args.rows:
+        df = make_wencai_frame(rows)
+        new_records, new_time = timed(build_stock_records, df, update_date)
+
+        if args.skip_legacy:
+            print(f"{rows:>8} {'-':>10} {new_time:>10.3f} {'-':>8}")
+            continue
+
+        old_records, old_time = timed(legacy_build_records, df, update_date)
+        check_equivalence(df, old_records, new_records, update_date)
+        print(f"{rows:>8} {old_time:>10.3f} {new_time:>10.3f} {old_time / new_time:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+stocks 表索引和分区基准测试（需要本地 PostgreSQL）
+分别在两个临时 schema 中建表：before 只执行 supabase_setup.sql，after 再依次执行 migrations/*.sql，
+写入相同的多年合成数据，比较写入吞吐量、表和索引大小，以及 app.py 各查询模式的延迟。
+
+写入方式与 PostgREST 的 upsert 一致（json_populate_recordset + ON CONFLICT），每块 500 行；
+查询与面板的分页查询一致（单日明细、单日全部列、多日对比、写入前读取当天代码、日期统计）。
+只会创建和删除 bench_before / bench_after 两个 schema，不改动 public。
+
+依赖 psycopg（3）或 psycopg2，不在 requirements.txt 中，按需安装:
+    pip install "psycopg[binary]"
+
+用法:
+    python benchmarks/bench_postgres.py --dsn postgresql://postgres@localhost/postgres
+    python benchmarks/bench_postgres.py --years 5 --rows-per-day 300 --repeat 50
+"""
+
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+    try:
+        import psycopg2
+    except ImportError:
+        psycopg2 = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stock_history import RANGE_COLUMNS  # noqa: E402
+from stock_mapping import map_stock_frame  # noqa: E402
+from stock_records import StockBatch  # noqa: E402
+from stock_writer import UPSERT_CHUNK_SIZE  # noqa: E402
+from synthetic import make_wencai_frame  # noqa: E402
+
+# 与 app.py 中的 DISPLAY_COLUMNS 一致（app.py 导入时会渲染页面，不能直接导入）
+DISPLAY_COLUMNS = [
+    'code', 'stock_name', 'latest_price', 'latest_change_pct',
+    'auction_change_pct', 'pe_ttm', 'market_cap', 'volume_ratio',
+    'listing_board', 'auction_type', 'auction_rating', 'strategies'
+]
+
+# 多日对比每批查询的天数（stock_loader.DATES_PER_REQUEST）和 PostgREST 单页行数
+RANGE_DAYS = 60
+PAGE_SIZE = 1000
+
+SCHEMAS = {
+    'before': ['supabase_setup.sql'],
+    'after': ['supabase_setup.sql'] + sorted(
+        os.path.relpath(path, ROOT) for path in glob.glob(os.path.join(ROOT, 'migrations', '*.sql'))
+    ),
+}
+
+def connect(dsn):
+    if psycopg is not None:
+        return psycopg.connect(dsn, autocommit=True)
+    if psycopg2 is not None:
+        conn = psycopg2.connect(dsn)
+        conn.autocommit = True
+        return conn
+    raise SystemExit('❌ 需要安装 psycopg 或 psycopg2')
+
+def create_schema(conn, schema, files):
+    """在独立 schema 中执行建表脚本和迁移（把脚本中的 public. 替换为该 schema）"""
+    with conn.cursor() as cur:
+        cur.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+        cur.execute(f'CREATE SCHEMA {schema}')
+        cur.execute(f'SET search_path TO {schema}')
+        for name in files:
+            with open(os.path.join(ROOT, name), 'r', encoding='utf-8') as f:
+                cur.execute(f.read().replace('public.', f'{schema}.'))
+
+def trading_days(years, end=None):
+    end = pd.Timestamp(end or '2025-12-31')
+    return [d.strftime('%Y-%m-%d') for d in pd.bdate_range(end=end, periods=int(years * 250))]
+
+def day_batches(days, rows_per_day):
+    """每个交易日一批合成数据（映射、校验后的 StockBatch），同一日期每次生成的代码相同"""
+    for day in days:
+        seed = int(day.replace('-', ''))
+        frame = map_stock_frame(make_wencai_frame(rows_per_day, run_date=pd.Timestamp(day), seed=seed), day)
+        frame['strategies'] = [['auction_breakout']] * len(frame)
+        yield StockBatch.from_frame(frame)
+
+def upsert_sql(schema, columns):
+    names = ', '.join(columns)
+    updates = ', '.join(f'{c} = EXCLUDED.{c}' for c in columns if c not in ('code', 'update_date'))
+    return (f'INSERT INTO {schema}.stocks ({names}) '
+            f'SELECT {names} FROM json_populate_recordset(NULL::{schema}.stocks, %s::json) '
+            f'ON CONFLICT (code, update_date) DO UPDATE SET {updates}')
+
+def load(conn, schema, batches, chunk_size=UPSERT_CHUNK_SIZE):
+    """按块 upsert，返回 (行数, 耗时)"""
+    rows, elapsed = 0, 0.0
+    with conn.cursor() as cur:
+        for batch in batches:
+            sql = upsert_sql(schema, batch.columns)
+            for chunk in batch.chunks(chunk_size):
+                body = chunk.encode().decode('utf-8')
+                start = time.perf_counter()
+                cur.execute(sql, (body,))
+                elapsed += time.perf_counter() - start
+                rows += len(chunk)
+    return rows, elapsed
+
+def random_window(days, size=RANGE_DAYS):
+    start = random.randrange(max(1, len(days) - size))
+    return days[start:start + size]
+
+def query_patterns(schema, days):
+    """app.py / 写入流程的查询模式：名称 -> 生成 (SQL, 参数) 的函数"""
+    display = ', '.join(DISPLAY_COLUMNS)
+    ranged = ', '.join(RANGE_COLUMNS)
+    return {
+        'day_display': lambda: (
+            f'SELECT {display} FROM {schema}.stocks WHERE update_date = %s ORDER BY code LIMIT {PAGE_SIZE}',
+            (random.choice(days),)),
+        'day_all': lambda: (
+            f'SELECT * FROM {schema}.stocks WHERE update_date = %s ORDER BY code LIMIT {PAGE_SIZE}',
+            (random.choice(days),)),
+        'range_60d': lambda: (
+            f'SELECT {ranged} FROM {schema}.stocks WHERE update_date = ANY(%s::date[]) '
+            f'ORDER BY update_date, code LIMIT {PAGE_SIZE}',
+            (random_window(days),)),
+        'codes_for_date': lambda: (
+            f'SELECT code FROM {schema}.stocks WHERE update_date = %s ORDER BY code',
+            (random.choice(days),)),
+        'date_counts': lambda: (f'SELECT * FROM {schema}.get_stock_dates()', None),
+    }
+
+def time_queries(conn, schema, days, repeat):
+    results = {}
+    with conn.cursor() as cur:
+        for name, make in query_patterns(schema, days).items():
+            latencies = []
+            for _ in range(repeat):
+                sql, params = make()
+                start = time.perf_counter()
+                cur.execute(sql, params)
+                cur.fetchall()
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            results[name] = (statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1])
+    return results
+
+def relation_sizes(conn, schema):
+    with conn.cursor() as cur:
+        cur.execute(f'VACUUM ANALYZE {schema}.stocks')
+        cur.execute("SELECT coalesce(sum(pg_table_size(relid)), 0), coalesce(sum(pg_indexes_size(relid)), 0) "
+                    "FROM pg_partition_tree(%s::regclass)", (f'{schema}.stocks',))
+        return cur.fetchone()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.getenv('BENCH_POSTGRES_DSN', 'postgresql://postgres@localhost/postgres'))
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--rows-per-day', type=int, default=300)
+    parser.add_argument('--rerun-days', type=int, default=20, help='重复写入最近多少天（更新已有行）')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--keep', action='store_true', help='结束后保留 bench_* schema')
+    args = parser.parse_args()
+
+    conn = connect(args.dsn)
+    days = trading_days(args.years)
+    print(f"📅 {len(days)} 个交易日 × {args.rows_per_day} 行 ({days[0]} ~ {days[-1]})")
+    # 两个 schema 写入同一份数据
+    batches = list(day_batches(days, args.rows_per_day))
+
+    for label, files in SCHEMAS.items():
+        schema = f'bench_{label}'
+        random.seed(0)
+        create_schema(conn, schema, files)
+        rows, elapsed = load(conn, schema, batches)
+        rerun_rows, rerun_elapsed = load(conn, schema, batches[-args.rerun_days:])
+        table_bytes, index_bytes = relation_sizes(conn, schema)
+        latencies = time_queries(conn, schema, days, args.repeat)
+
+        print(f"\n[{label}] {', '.join(files)}")
+        print(f"   写入: {rows} 行, {rows / elapsed:,.0f} 行/s; 重复写入: {rerun_rows / rerun_elapsed:,.0f} 行/s")
+        print(f"   表 {table_bytes / 1e6:.1f}MB, 索引 {index_bytes / 1e6:.1f}MB")
+        for name, (median, p95) in latencies.items():
+            print(f"   {name:<16} p50={median:7.2f}ms p95={p95:7.2f}ms")
+
+        if not args.keep:
+            with conn.cursor() as cur:
+                cur.execute(f'DROP SCHEMA {schema} CASCADE')
+    conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+入库记录编码基准测试：逐行字典 + json.dumps vs 列式 StockBatch 校验并按块编码
+
+测量从映射后的 DataFrame 到全部请求体的耗时和 Python 分配的内存峰值（tracemalloc），
+并确认两种方式解码后的数据一致。
+
+用法:
+    python benchmarks/bench_records.py --rows 10000 50000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_mapping import map_stock_frame, frame_to_records  # noqa: E402
+from stock_records import StockBatch  # noqa: E402
+from stock_writer import UPSERT_CHUNK_SIZE, chunked  # noqa: E402
+from synthetic import make_wencai_frame  # noqa: E402
+
+UPDATE_DATE = '2025-09-03'
+
+def encode_dicts(frame, chunk_size):
+    """旧方式：整表转为字典列表，再由客户端逐块 json.dumps"""
+    records = list({r['code']: r for r in frame_to_records(frame)}.values())
+    return [json.dumps(chunk).encode('utf-8') for chunk in chunked(records, chunk_size)]
+
+def encode_batch(frame, chunk_size):
+    batch = StockBatch.from_frame(frame)
+    return [chunk.encode() for chunk in batch.chunks(chunk_size)]
+
+def measure(func, *args):
+    """先计时，再单独跑一次记录内存峰值（tracemalloc 会拖慢执行）"""
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description='入库记录编码基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--chunk-size', type=int, default=UPSERT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'method':<12} {'time':>9} {'peak MB':>9} {'body MB':>9}")
+    for rows in args.rows:
+        frame = map_stock_frame(make_wencai_frame(rows), UPDATE_DATE)
+        frame['strategies'] = [['auction_breakout']] * len(frame)
+        results = {}
+        for name, func in [('dicts', encode_dicts), ('StockBatch', encode_batch)]:
+            bodies, elapsed, peak = measure(func, frame, args.chunk_size)
+            size = sum(len(body) for body in bodies)
+            results[name] = bodies
+            print(f"{rows:>8} {name:<12} {elapsed * 1000:>7.0f}ms {peak / 1e6:>9.1f} {size / 1e6:>9.2f}")
+
+        decoded = [[row for body in results[name] for row in json.loads(body)] for name in results]
+        assert decoded[0] == decoded[1], '两种方式的数据不一致'
+
+if __name__ == '__main__':
+    main()
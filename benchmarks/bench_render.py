@@ -0,0 +1,95 @@
+"""
+明细表渲染基准测试：旧版逐单元格格式化为字符串 vs 保持数值 dtype + column_config
+
+测量从加载后的 DataFrame 到 st.dataframe 发送给浏览器的 Arrow 数据的耗时
+（不启动 Streamlit 服务，直接调用 streamlit 的 Arrow 序列化函数）。
+
+用法:
+    python benchmarks/bench_render.py --rows 10000 50000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_loader import apply_dtypes  # noqa: E402
+from stock_mapping import map_stock_frame  # noqa: E402
+from synthetic import make_wencai_frame  # noqa: E402
+from table_format import COLUMN_LABELS, prepare_table  # noqa: E402
+
+DISPLAY_COLUMNS = list(COLUMN_LABELS)
+
+# ---- 旧版实现（原 app.py 中的逐单元格格式化），仅作对比基线 ----
+
+def format_number(value, decimals=2):
+    if pd.isna(value) or value is None:
+        return "N/A"
+    try:
+        return f"{float(value):.{decimals}f}"
+    except (ValueError, TypeError):
+        return str(value)
+
+def format_percentage(value):
+    if pd.isna(value) or value is None:
+        return "N/A"
+    try:
+        return f"{float(value):.2f}%"
+    except (ValueError, TypeError):
+        return str(value)
+
+def legacy_table(df, sort_by, ascending):
+    display_df = df.copy()
+    display_df = display_df[[col for col in DISPLAY_COLUMNS if col in display_df.columns]]
+    display_df = display_df.rename(columns=COLUMN_LABELS)
+    display_df = display_df.sort_values(by=COLUMN_LABELS[sort_by], ascending=ascending)
+    display_df['最新价'] = display_df['最新价'].apply(lambda x: format_number(x))
+    display_df['最新涨跌幅(%)'] = display_df['最新涨跌幅(%)'].apply(format_percentage)
+    display_df['竞价涨幅(%)'] = display_df['竞价涨幅(%)'].apply(format_percentage)
+    display_df['市盈率TTM'] = display_df['市盈率TTM'].apply(lambda x: format_number(x))
+    display_df['总市值'] = display_df['总市值'].apply(
+        lambda x: f"{float(x)/100000000:.2f}亿" if pd.notna(x) and x != 'N/A' else 'N/A')
+    display_df['量比'] = display_df['量比'].apply(lambda x: format_number(x))
+    return display_df
+
+def make_frame(rows):
+    df = map_stock_frame(make_wencai_frame(rows, run_date=date(2025, 9, 3)), '2025-09-03')
+    df = apply_dtypes(df)
+    tags = np.array(['auction_breakout', 'low_pe_momentum', 'volume_ratio_spike'], dtype=object)
+    df['strategies'] = [[tag] for tag in tags[np.arange(rows) % len(tags)]]
+    return df
+
+def timed(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        df = make_frame(rows)
+        legacy_prep, legacy = timed(lambda: legacy_table(df, 'latest_change_pct', False))
+        new_prep, table = timed(lambda: prepare_table(df, DISPLAY_COLUMNS, 'latest_change_pct', False))
+        legacy_arrow, legacy_bytes = timed(lambda: convert_pandas_df_to_arrow_bytes(legacy))
+        new_arrow, new_bytes = timed(lambda: convert_pandas_df_to_arrow_bytes(table))
+        print(f"{rows} 行:")
+        print(f"  旧版 逐单元格格式化: 准备 {legacy_prep * 1000:.1f}ms + Arrow {legacy_arrow * 1000:.1f}ms,"
+              f" {len(legacy_bytes) / 1024:.0f} KB")
+        print(f"  新版 数值列 + column_config: 准备 {new_prep * 1000:.1f}ms + Arrow {new_arrow * 1000:.1f}ms,"
+              f" {len(new_bytes) / 1024:.0f} KB")
+
+if __name__ == '__main__':
+    main()
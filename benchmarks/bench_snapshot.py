@@ -0,0 +1,69 @@
+"""
+快照格式基准测试：xlsx vs parquet vs feather 的写入耗时、读取耗时和文件大小
+
+用法:
+    python benchmarks/bench_snapshot.py --rows 1000 5000 20000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshot import arrow_safe  # noqa: E402
+from synthetic import make_wencai_frame  # noqa: E402
+
+# 名称 -> (扩展名, 写入函数, 读取函数)
+FORMATS = {
+    'xlsx': ('xlsx', lambda df, path: df.to_excel(path, index=False), pd.read_excel),
+    'parquet-snappy': ('parquet', lambda df, path: df.to_parquet(path, index=False, compression='snappy'),
+                       pd.read_parquet),
+    'parquet-zstd': ('parquet', lambda df, path: df.to_parquet(path, index=False, compression='zstd'),
+                     pd.read_parquet),
+    'feather-lz4': ('feather', lambda df, path: df.to_feather(path, compression='lz4'), pd.read_feather),
+    'feather-zstd': ('feather', lambda df, path: df.to_feather(path, compression='zstd'), pd.read_feather),
+}
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(rows, repeat, directory):
+    df = arrow_safe(make_wencai_frame(rows))
+    results = []
+    for name, (ext, write, read) in FORMATS.items():
+        # xlsx 很慢，只跑一次
+        times = 1 if name == 'xlsx' else repeat
+        path = os.path.join(directory, f'{name}-{rows}.{ext}')
+        write_seconds = timed(lambda: write(df, path), times)
+        read_seconds = timed(lambda: read(path), times)
+        results.append((name, write_seconds, read_seconds, os.path.getsize(path)))
+    return df.shape[1], results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.rows:
+            columns, results = run(rows, args.repeat, directory)
+            xlsx_write = results[0][1]
+            print(f"\n{rows} 行 x {columns} 列")
+            print(f"{'格式':<16}{'写入(s)':>10}{'读取(s)':>10}{'大小(KB)':>12}{'写入加速':>10}")
+            for name, write_seconds, read_seconds, size in results:
+                print(f"{name:<16}{write_seconds:>10.3f}{read_seconds:>10.3f}{size / 1024:>12.1f}"
+                      f"{xlsx_write / write_seconds:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
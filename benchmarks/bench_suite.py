@@ -0,0 +1,289 @@
+"""
+离线端到端基准测试套件：回放问财结果，逐阶段测量耗时和内存峰值，并按提交记录结果
+
+不访问同花顺和 Supabase。每个用例是一份问财原始结果（合成数据的不同规模和表头变体，
+或 `python wencai_client.py record DIR` 录制的真实结果），依次经过：
+    map              列映射（每次重新解析列映射计划，不读写计划缓存文件）
+    validate         按 stocks 表列类型整列校验（StockBatch）
+    encode           按块编码为请求体
+    snapshot_<格式>   原始结果快照导出（写入临时目录）
+    write            分块 upsert 到本地 PostgREST 桩服务（benchmarks/postgrest_stub.py）
+    read             面板读取当天数据（StockRepository.day_rows）
+每个阶段重复 --repeat 次取最短耗时，再单独运行一次记录 tracemalloc 内存峰值（包含同进程内桩服务的分配）。
+
+结果按行追加到 .benchmarks/suite.jsonl（带提交号），--compare 与某个提交的结果逐阶段比较，
+--fail-above 设置耗时比值上限，超出时返回非零，可以在改动前后各跑一次确认没有性能回退。
+
+表头变体:
+    standard  与 pywencai 返回一致的列名（带日期后缀）
+    alias     同义列名（证券代码、证券简称、现价、涨跌幅(%) 等），没有 code 列
+    dirty     缺少代码或名称的行、超出 DECIMAL 范围的数值、重复代码，并带有无关列
+
+用法:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --rows 300 20000 --variants standard dirty --formats parquet --repeat 5
+    python benchmarks/bench_suite.py --fixtures data/wencai_fixtures
+    python benchmarks/bench_suite.py --compare HEAD~1 --fail-above 1.25
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from postgrest_stub import PostgrestStub  # noqa: E402
+from snapshot import write_snapshots  # noqa: E402
+from stock_mapping import map_stock_frame, resolve_columns  # noqa: E402
+from stock_records import StockBatch  # noqa: E402
+from stock_writer import UPSERT_CHUNK_SIZE  # noqa: E402
+from stockdb import StockRepository  # noqa: E402
+from synthetic import make_wencai_frame  # noqa: E402
+
+UPDATE_DATE = '2025-09-03'
+
+RESULTS_FILE = os.path.join(ROOT, '.benchmarks', 'suite.jsonl')
+
+Case = namedtuple('Case', ['name', 'variant', 'frame'])
+
+# ---- 表头变体 ----
+
+ALIAS_COLUMNS = {
+    '股票代码': '证券代码',
+    '股票简称': '证券简称',
+    '最新价': '现价',
+    '最新涨跌幅': '涨跌幅(%)',
+    '上市板块': '板块',
+    '基本每股收益': 'EPS',
+    '销售毛利率': '毛利率',
+    '销售净利率': '净利率',
+}
+
+def alias_headers(df):
+    renamed = dict(ALIAS_COLUMNS)
+    renamed.update({col: col.replace('竞价金额', '竞价成交额') for col in df.columns if col.startswith('竞价金额')})
+    return df.drop(columns=['code']).rename(columns=renamed)
+
+def dirty_rows(df, seed=0):
+    """约 2% 的行缺代码或名称、2% 的市值超出 DECIMAL(20,4)、1% 的代码重复，另加两列无关的文本"""
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    rows = len(df)
+    picked = rng.permutation(rows)
+    step = max(1, rows // 50)
+    no_code, no_name, overflow = picked[:step], picked[step:2 * step], picked[2 * step:3 * step]
+    df.loc[no_code, ['code', '股票代码']] = None
+    df.loc[no_name, '股票简称'] = ''
+    market_cap = next(col for col in df.columns if col.startswith('总市值'))
+    df.loc[overflow, market_cap] = '1e30'
+    duplicates = picked[3 * step:3 * step + max(1, rows // 100)]
+    df.loc[duplicates, ['code', '股票代码']] = df.loc[picked[-len(duplicates):], ['code', '股票代码']].to_numpy()
+    df['所属概念'] = rng.choice(['人工智能;算力', '新能源;储能', '半导体'], size=rows)
+    df['所属同花顺行业'] = rng.choice(['电子-半导体', '电力设备-电池', '计算机-软件'], size=rows)
+    return df
+
+VARIANTS = {
+    'standard': lambda df: df,
+    'alias': alias_headers,
+    'dirty': dirty_rows,
+}
+
+def synthetic_cases(sizes, variants):
+    for rows in sizes:
+        frame = make_wencai_frame(rows, run_date=pd.Timestamp(UPDATE_DATE))
+        for variant in variants:
+            yield Case(f'{variant}-{rows}', variant, VARIANTS[variant](frame))
+
+def fixture_cases(directory):
+    """录制的问财结果（FixtureTransport 保存的 pickle）"""
+    for path in sorted(glob.glob(os.path.join(directory, '*.pkl'))):
+        frame = pd.read_pickle(path)
+        if frame is None or len(frame) == 0:
+            continue
+        name = os.path.splitext(os.path.basename(path))[0][:8]
+        yield Case(f'fixture-{name}-{len(frame)}', 'recorded', pd.DataFrame(frame))
+
+# ---- 测量 ----
+
+def quiet(func):
+    """屏蔽各阶段的进度输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func()
+
+def measure(func, repeat):
+    """返回 (最后一次的结果, 最短耗时, 内存峰值字节)；tracemalloc 会拖慢执行，单独运行一次"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = quiet(func)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        quiet(func)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, min(times), peak
+
+def stage_plan(case, stub, repo, directory, formats):
+    """(阶段名, func(state) -> 结果, 说明 func(结果) -> dict)；state 保存前面阶段的结果"""
+    def mapped(state):
+        plan = resolve_columns(case.frame.columns, run_date=UPDATE_DATE, use_cache=False)
+        frame = map_stock_frame(case.frame, UPDATE_DATE, plan=plan)
+        frame['strategies'] = [['auction_breakout']] * len(frame)
+        return frame
+
+    def write(state):
+        stub.reset()
+        return repo.write_day(state['validate'], UPDATE_DATE)
+
+    stages = [
+        ('map', mapped, lambda frame: {'rows': len(frame)}),
+        ('validate', lambda state: StockBatch.from_frame(state['map']),
+         lambda batch: {'rows': len(batch), 'rejected': len(batch.rejected),
+                        'nulled': sum(count for count, _ in batch.nulled.values())}),
+        ('encode', lambda state: [chunk.encode() for chunk in state['validate'].chunks(UPSERT_CHUNK_SIZE)],
+         lambda bodies: {'bytes': sum(len(body) for body in bodies)}),
+    ]
+    for fmt in formats:
+        stages.append((
+            f'snapshot_{fmt}',
+            lambda state, fmt=fmt: write_snapshots({'bench': case.frame}, UPDATE_DATE, formats=[fmt],
+                                                   directory=directory),
+            lambda paths: {'bytes': sum(os.path.getsize(path) for path in paths)},
+        ))
+    stages += [
+        ('write', write, lambda report: {'rows': report['written'], 'failed': report['failed']}),
+        ('read', lambda state: repo.day_rows(UPDATE_DATE)[0], lambda frame: {'rows': len(frame)}),
+    ]
+    return stages
+
+def run_case(case, stub, repo, directory, formats, repeat):
+    state, results = {}, []
+    for stage, func, describe in stage_plan(case, stub, repo, directory, formats):
+        output, elapsed, peak = measure(lambda: func(state), repeat)
+        state[stage] = output
+        results.append({'case': case.name, 'variant': case.variant, 'input_rows': len(case.frame),
+                        'stage': stage, 'seconds': round(elapsed, 6), 'peak_mb': round(peak / 1e6, 3),
+                        **describe(output)})
+    return results
+
+# ---- 结果记录和比较 ----
+
+def git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_info():
+    return {
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+    }
+
+def append_results(path, info, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps({**info, **result}, ensure_ascii=False) + '\n')
+
+def load_baseline(path, ref, current):
+    """读取某个提交（未指定时为上一次其他提交）的最后一次结果：{(用例, 阶段): 结果}"""
+    if not os.path.exists(path):
+        return None, {}
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    if ref:
+        commit = git('rev-parse', '--short', ref) or ref
+    else:
+        previous = [row['commit'] for row in rows if row.get('commit') != current]
+        commit = previous[-1] if previous else None
+    baseline = {}
+    for row in rows:
+        if commit and row.get('commit') == commit:
+            baseline[(row['case'], row['stage'])] = row
+    return commit, baseline
+
+def print_results(results, baseline, commit):
+    header = f"{'case':<24} {'stage':<16} {'time':>10} {'peak MB':>9}"
+    if baseline:
+        header += f" {'vs ' + commit:>14}"
+    print(header)
+    worst = 0.0
+    for result in results:
+        line = (f"{result['case']:<24} {result['stage']:<16} {result['seconds'] * 1000:>8.1f}ms "
+                f"{result['peak_mb']:>9.1f}")
+        old = baseline.get((result['case'], result['stage']))
+        if old and old['seconds'] > 0:
+            ratio = result['seconds'] / old['seconds']
+            worst = max(worst, ratio)
+            line += f" {ratio:>13.2f}x"
+        print(line)
+    return worst
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[300, 3000])
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument('--fixtures', help='录制的问财结果目录（WENCAI_FIXTURE_DIR 格式）')
+    parser.add_argument('--formats', nargs='+', default=['parquet', 'xlsx'], help='快照格式')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0, help='桩服务每个请求的延迟（秒）')
+    parser.add_argument('--output', default=RESULTS_FILE, help='结果文件（JSON lines），设为空则不保存')
+    parser.add_argument('--compare', help='与该提交的结果比较，默认为结果文件中上一个其他提交')
+    parser.add_argument('--fail-above', type=float, help='任一阶段耗时超过基线的该倍数时返回非零')
+    args = parser.parse_args()
+
+    cases = list(synthetic_cases(args.rows, args.variants))
+    if args.fixtures:
+        cases += list(fixture_cases(args.fixtures))
+
+    info = run_info()
+    directory = tempfile.mkdtemp(prefix='bench_suite_')
+    results = []
+    try:
+        with PostgrestStub(latency=args.latency) as stub:
+            repo = StockRepository.connect(stub.url, 'stub-key', local_cache=False)
+            for case in cases:
+                results += run_case(case, stub, repo, directory, args.formats, args.repeat)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    commit, baseline = load_baseline(args.output, args.compare, info['commit']) if args.output else (None, {})
+    print(f"📏 提交 {info['commit']}{' (有未提交的修改)' if info['dirty'] else ''}, "
+          f"Python {info['python']}, pandas {info['pandas']}, 每阶段 {args.repeat} 次取最短")
+    worst = print_results(results, baseline, commit)
+    if args.output:
+        append_results(args.output, info, results)
+        print(f"📄 结果已追加到: {args.output}")
+
+    if args.fail_above and worst > args.fail_above:
+        print(f"❌ 有阶段的耗时是基线的 {worst:.2f} 倍，超过上限 {args.fail_above}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
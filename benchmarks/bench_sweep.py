@@ -0,0 +1,53 @@
+"""
+参数扫描基准测试：在合成历史上对默认网格做全部组合评估，比较单进程和进程池的耗时
+
+用法:
+    python benchmarks/bench_sweep.py --days 750 --per-day 300 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_backtest import make_history  # noqa: E402
+from backtest import build_panel  # noqa: E402
+from sweep import DEFAULT_GRID, build_observations, run_sweep, rank_results  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=750)
+    parser.add_argument('--per-day', type=int, default=300)
+    parser.add_argument('--universe', type=int, default=4000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    history = make_history(args.days, args.per_day, args.universe)
+    # 补充网格用到、make_history 没有生成的字段
+    rng = np.random.default_rng(1)
+    n = len(history)
+    history['interval_change_13d'] = rng.uniform(-5, 30, n)
+    history['interval_change_5d'] = rng.uniform(-5, 20, n)
+    history['listing_days'] = rng.integers(60, 5000, n)
+    history['dde_large_order'] = rng.normal(0, 1, n)
+    print(f"{n} 行历史数据 ({args.days} 天 x {args.per_day} 只/天, 股票池 {args.universe})")
+
+    panel = build_panel(history)
+    start = time.perf_counter()
+    obs = build_observations(panel, DEFAULT_GRID, horizon=1)
+    print(f"预计算条件向量: {time.perf_counter() - start:.3f}s")
+
+    for workers in sorted({1, args.workers}):
+        start = time.perf_counter()
+        results = run_sweep(obs, DEFAULT_GRID, workers=workers)
+        print(f"{len(results)} 个组合, {workers} 个进程: {time.perf_counter() - start:.3f}s")
+
+    print(rank_results(results).head(5).to_string())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+写入基准测试：单次大批量 insert vs 分块并发 upsert
+在本地 PostgREST 桩服务上写入合成数据，模拟每个请求的网络往返延迟
+
+用法:
+    python benchmarks/bench_writer.py --rows 10000 20000 --latency 0.05
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase import create_client  # noqa: E402
+
+from postgrest_stub import PostgrestStub  # noqa: E402
+from stock_mapping import build_stock_records  # noqa: E402
+from stock_writer import write_stock_records  # noqa: E402
+from synthetic import make_wencai_frame  # noqa: E402
+
+UPDATE_DATE = '2025-09-03'
+
+def bench_single_insert(client, records):
+    """旧方式：删除当天数据后一次性 insert"""
+    start = time.perf_counter()
+    client.table('stocks').delete().eq('update_date', UPDATE_DATE).execute()
+    client.table('stocks').insert(records).execute()
+    return time.perf_counter() - start
+
+def bench_upsert(client, records, chunk_size, workers):
+    start = time.perf_counter()
+    report = write_stock_records(client, records, UPDATE_DATE, chunk_size=chunk_size, max_workers=workers)
+    assert report['failed'] == 0, report
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='分块并发写入基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 20000])
+    parser.add_argument('--latency', type=float, default=0.05, help='桩服务每个请求的模拟延迟（秒）')
+    parser.add_argument('--row-latency', type=float, default=0.0001, help='桩服务每写入一行的模拟耗时（秒）')
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[500, 1000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--fail-every', type=int, default=0, help='每 N 个请求注入一次 503')
+    args = parser.parse_args()
+
+    with PostgrestStub(latency=args.latency, row_latency=args.row_latency,
+                       fail_every=args.fail_every) as stub:
+        client = create_client(stub.url, 'stub-key')
+        print(f"{'行数':>7} {'方式':<22} {'耗时(s)':>8} {'行/秒':>10} {'请求数':>6}")
+        for rows in args.rows:
+            records = build_stock_records(make_wencai_frame(rows), UPDATE_DATE)
+
+            stub.reset()
+            before = stub.requests
+            if not args.fail_every:
+                elapsed = bench_single_insert(client, records)
+                print(f"{rows:>7} {'单次insert':<22} {elapsed:>8.2f} {rows / elapsed:>10.0f} "
+                      f"{stub.requests - before:>6}")
+
+            for chunk_size in args.chunk_sizes:
+                for workers in args.workers:
+                    stub.reset()
+                    before = stub.requests
+                    elapsed = bench_upsert(client, records, chunk_size, workers)
+                    assert len(stub.rows('stocks')) == len(records)
+                    label = f'upsert chunk={chunk_size} w={workers}'
+                    print(f"{rows:>7} {label:<22} {elapsed:>8.2f} {rows / elapsed:>10.0f} "
+                          f"{stub.requests - before:>6}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+本地 PostgREST 兼容桩服务
+在内存中实现 stocks 等表的 select / insert / upsert / delete 子集，
+供写入、读取相关的基准测试在不连接 Supabase 的情况下运行
+
+用法:
+    with PostgrestStub(latency=0.02) as stub:
+        client = create_client(stub.url, 'stub-key')
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+def _matches(row, column, expression):
+    """判断一行是否满足 PostgREST 过滤表达式（eq.x / in.(a,b) / not.in.(...) 等）"""
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    op, _, value = expression.partition('.')
+    actual = row.get(column)
+
+    if op == 'in':
+        options = {v.strip().strip('"') for v in value.strip('()').split(',') if v.strip()}
+        result = str(actual) in options
+    elif op == 'is':
+        result = actual is None if value == 'null' else str(actual).lower() == value
+    elif op in ('eq', 'neq'):
+        result = str(actual) == value
+        if op == 'neq':
+            result = not result
+    elif op in ('gt', 'gte', 'lt', 'lte'):
+        if actual is None:
+            return False
+        try:
+            left, right = float(actual), float(value)
+        except (TypeError, ValueError):
+            left, right = str(actual), value
+        result = {
+            'gt': left > right, 'gte': left >= right,
+            'lt': left < right, 'lte': left <= right,
+        }[op]
+    else:
+        raise ValueError(f'不支持的过滤操作: {op}')
+    return not result if negate else result
+
+class PostgrestStub:
+    """内存中的 PostgREST 子集，支持分页、投影、upsert 和故障注入"""
+
+    RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+    def __init__(self, latency=0.0, row_latency=0.0, max_rows=1000, fail_every=0,
+                 host='127.0.0.1', port=0):
+        self.latency = latency
+        self.row_latency = row_latency
+        self.max_rows = max_rows
+        self.fail_every = fail_every
+        self.tables = {}
+        self.rpcs = {}
+        # 视图名 -> func(tables)，查询时由全部表的当前数据计算出视图的行
+        self.views = {}
+        self._indexes = {}
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def rows(self, table):
+        with self._lock:
+            return list(self.tables.get(table, []))
+
+    def reset(self):
+        with self._lock:
+            self.tables.clear()
+            self._indexes.clear()
+
+    # ---- 请求处理 ----
+
+    def _filters(self, params):
+        return [(k, v) for k, v in params if k not in self.RESERVED_PARAMS]
+
+    def _select(self, table, params, headers):
+        query = dict(params)
+        with self._lock:
+            source = self.views[table](self.tables) if table in self.views else self.tables.get(table, [])
+            rows = [r for r in source
+                    if all(_matches(r, k, v) for k, v in self._filters(params))]
+
+        for spec in reversed([s for s in query.get('order', '').split(',') if s]):
+            column, _, direction = spec.partition('.')
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column)),
+                      reverse=direction.startswith('desc'))
+
+        total = len(rows)
+        offset = int(query.get('offset', 0))
+        limit = int(query['limit']) if 'limit' in query else None
+        range_header = headers.get('Range')
+        if range_header and '-' in range_header:
+            start, _, end = range_header.partition('-')
+            offset, limit = int(start), int(end) - int(start) + 1
+        limit = min(limit, self.max_rows) if limit is not None else self.max_rows
+        rows = rows[offset:offset + limit]
+
+        columns = [c.strip() for c in query.get('select', '*').split(',') if c.strip()]
+        if columns and columns != ['*']:
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+
+        end = offset + len(rows) - 1
+        count = total if 'count=exact' in headers.get('Prefer', '') else '*'
+        content_range = f'{offset}-{end}/{count}' if rows else f'*/{count}'
+        return rows, content_range
+
+    def _write(self, table, params, body, prefer):
+        rows = body if isinstance(body, list) else [body]
+        conflict = dict(params).get('on_conflict')
+        # 模拟服务端按行处理的开销
+        if self.row_latency:
+            time.sleep(self.row_latency * len(rows))
+        with self._lock:
+            existing = self.tables.setdefault(table, [])
+            if conflict or 'resolution=merge-duplicates' in prefer:
+                keys = tuple(k for k in (conflict or 'id').split(',') if k)
+                index = self._indexes.get((table, keys))
+                if index is None:
+                    index = {tuple(str(r.get(k)) for k in keys): i for i, r in enumerate(existing)}
+                    self._indexes[(table, keys)] = index
+                for row in rows:
+                    key = tuple(str(row.get(k)) for k in keys)
+                    if key in index:
+                        existing[index[key]] = {**existing[index[key]], **row}
+                    else:
+                        index[key] = len(existing)
+                        existing.append(dict(row))
+            else:
+                existing.extend(dict(r) for r in rows)
+                self._drop_indexes(table)
+        return rows if 'return=representation' in prefer else None
+
+    def _delete(self, table, params):
+        filters = self._filters(params)
+        with self._lock:
+            existing = self.tables.get(table, [])
+            kept, deleted = [], []
+            for r in existing:
+                (deleted if all(_matches(r, k, v) for k, v in filters) else kept).append(r)
+            self.tables[table] = kept
+            if deleted:
+                self._drop_indexes(table)
+        return deleted
+
+    def _drop_indexes(self, table):
+        for key in [k for k in self._indexes if k[0] == table]:
+            del self._indexes[key]
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload=None, headers=None):
+                body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.bytes_sent += len(body)
+
+            def _read_body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                with stub._lock:
+                    stub.bytes_received += len(raw)
+                return json.loads(raw) if raw else None
+
+            def _route(self):
+                parsed = urlparse(self.path)
+                parts = parsed.path.strip('/').split('/')
+                return parts, parse_qsl(parsed.query, keep_blank_values=True)
+
+            def _before(self):
+                with stub._lock:
+                    stub.requests += 1
+                    count = stub.requests
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub.fail_every and count % stub.fail_every == 0:
+                    self._send(503, {'message': '503 Service Unavailable (stub)'})
+                    return False
+                return True
+
+            def do_GET(self):
+                if not self._before():
+                    return
+                parts, params = self._route()
+                rows, content_range = stub._select(parts[-1], params, self.headers)
+                self._send(200, rows, {'Content-Range': content_range})
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_POST(self):
+                body = self._read_body()
+                if not self._before():
+                    return
+                parts, params = self._route()
+                if len(parts) >= 2 and parts[-2] == 'rpc':
+                    func = stub.rpcs.get(parts[-1])
+                    if func is None:
+                        self._send(404, {'message': f'rpc {parts[-1]} not found'})
+                    else:
+                        self._send(200, func(stub, body or {}))
+                    return
+                prefer = self.headers.get('Prefer', '')
+                result = stub._write(parts[-1], params, body, prefer)
+                self._send(201, result)
+
+            def do_DELETE(self):
+                if not self._before():
+                    return
+                parts, params = self._route()
+                deleted = stub._delete(parts[-1], params)
+                if 'return=representation' in self.headers.get('Prefer', ''):
+                    self._send(200, deleted)
+                else:
+                    self._send(204)
+
+        return Handler
@@ -0,0 +1,93 @@
+"""
+合成问财数据
+按 pywencai 返回的列名格式（带日期后缀）生成指定行数的 DataFrame，供基准测试使用
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+BOARDS = ['主板', '创业板', '北证']
+AUCTION_TYPES = ['竞价抢筹', '竞价砸盘', '高开', '大幅高开']
+AUCTION_RATINGS = ['强', '较强', '中性', '较弱']
+
+def wencai_headers(run_date):
+    """生成与 run_date 对应的带日期后缀的列名"""
+    day = run_date.strftime('%Y%m%d')
+    start_long = (run_date - timedelta(days=14)).strftime('%Y%m%d')
+    start_short = (run_date - timedelta(days=6)).strftime('%Y%m%d')
+    year = run_date.year
+    return {
+        'auction_change_pct': f'竞价涨幅[{day}]',
+        'pe_ttm': f'市盈率(pe,ttm)[{day}]',
+        'pe': f'市盈率(pe)[{day}]',
+        'dde_large_order': f'dde大单净量[{day}]',
+        'volume_ratio': f'分时量比[{day} 09:25]',
+        'interval_change_13d': f'区间涨跌幅:前复权[{start_long}-{day}]',
+        'interval_change_5d': f'区间涨跌幅:前复权[{start_short}-{day}]',
+        'listing_days': f'上市天数[{day}]',
+        'forecast_pe_1y': f'预测市盈率(pe,最新预测)[{year}1231]',
+        'forecast_pe_2y': f'预测市盈率(pe,最新预测)[{year + 1}1231]',
+        'forecast_pe_3y': f'预测市盈率(pe,最新预测)[{year + 2}1231]',
+        'market_cap': f'总市值[{day}]',
+        'auction_price': f'竞价匹配价[{day}]',
+        'auction_type': f'竞价异动类型[{day}]',
+        'auction_desc': f'竞价异动说明[{day}]',
+        'auction_rating': f'集合竞价评级[{day}]',
+        'auction_volume': f'竞价量[{day}]',
+        'auction_amount': f'竞价金额[{day}]',
+    }
+
+def make_wencai_frame(rows, run_date=None, seed=0):
+    """生成 rows 行的合成问财结果，数值列与真实返回一样以字符串形式出现
+
+    run_date 可以是 'YYYY-MM-DD' 字符串、date 或 datetime
+    """
+    run_date = pd.Timestamp(run_date or datetime(2025, 9, 3))
+    rng = np.random.default_rng(seed)
+    headers = wencai_headers(run_date)
+
+    codes = rng.choice(np.arange(1, 900000), size=rows, replace=False)
+    suffixes = rng.choice(['.SH', '.SZ', '.BJ'], size=rows)
+    code_text = np.char.zfill(codes.astype(str), 6)
+
+    def numbers(low, high, decimals=2):
+        return pd.Series(np.round(rng.uniform(low, high, rows), decimals)).astype(str)
+
+    frame = {
+        'code': code_text,
+        '股票代码': np.char.add(code_text, suffixes),
+        '股票简称': [f'股票{i}' for i in range(rows)],
+        '最新价': numbers(2, 300),
+        '最新涨跌幅': numbers(-10, 10, 4),
+        '上市板块': rng.choice(BOARDS, size=rows),
+        headers['auction_change_pct']: numbers(1, 6, 4),
+        headers['pe_ttm']: numbers(5, 200, 4),
+        headers['pe']: numbers(5, 200, 4),
+        headers['dde_large_order']: numbers(-2, 5, 4),
+        headers['volume_ratio']: numbers(0.5, 20, 4),
+        headers['interval_change_13d']: numbers(10, 80, 4),
+        headers['interval_change_5d']: numbers(10, 50, 4),
+        headers['listing_days']: rng.integers(100, 8000, rows).astype(str),
+        headers['forecast_pe_1y']: numbers(5, 100, 4),
+        headers['forecast_pe_2y']: numbers(5, 100, 4),
+        headers['forecast_pe_3y']: numbers(5, 100, 4),
+        headers['market_cap']: numbers(1e9, 5e11, 2),
+        '基本每股收益': numbers(-1, 5, 6),
+        '销售毛利率': numbers(0, 90, 4),
+        '销售净利率': numbers(-20, 50, 4),
+        headers['auction_price']: numbers(2, 300, 2),
+        headers['auction_type']: rng.choice(AUCTION_TYPES, size=rows),
+        headers['auction_desc']: ['竞价成交活跃'] * rows,
+        headers['auction_rating']: rng.choice(AUCTION_RATINGS, size=rows),
+        headers['auction_volume']: rng.integers(1000, 10_000_000, rows).astype(str),
+        headers['auction_amount']: rng.integers(10_000, 500_000_000, rows).astype(str),
+        'market_code': rng.choice(['17', '33', '151'], size=rows),
+    }
+    df = pd.DataFrame(frame)
+
+    # 随机置空部分数值，模拟问财缺失数据
+    for col in [headers['pe'], headers['forecast_pe_3y'], '销售毛利率']:
+        df.loc[rng.random(rows) < 0.1, col] = None
+    return df
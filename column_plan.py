@@ -0,0 +1,242 @@
+"""
+问财列名解析与列映射计划缓存
+
+pywencai 返回的列名带有每天变化的日期后缀，例如:
+    区间涨跌幅:前复权[20250820-20250903]
+    预测市盈率(pe,最新预测)[20251231]
+    分时量比[20250903 09:25]
+
+这里把列名解析为 (基础指标, 日期区间, 预测年份)，去掉日期后得到列名签名，
+按签名编译一次"列映射计划"（字段 -> 源列位置）并缓存到磁盘，
+列名结构不变时后续运行直接复用，不再逐列模糊匹配。
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+from datetime import date, datetime
+
+# 列映射计划缓存文件
+COLUMN_PLAN_CACHE = os.getenv(
+    'COLUMN_PLAN_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.column_plan_cache.json')
+)
+
+# 缓存中最多保留的计划数量
+MAX_CACHED_PLANS = 50
+
+# 解析规则版本，规则变化时加一，使已缓存的计划失效
+PLAN_VERSION = 2
+
+HEADER_PATTERN = re.compile(r'^(?P<base>[^\[]*?)\s*(?:\[(?P<suffix>[^\]]*)\])?$')
+DATE_RANGE_PATTERN = re.compile(r'^(\d{8})-(\d{8})$')
+DATE_PATTERN = re.compile(r'^(\d{8})(?:\s+(.+))?$')
+
+# 预测类指标的基础名前缀
+FORECAST_PREFIX = '预测'
+
+HeaderInfo = namedtuple('HeaderInfo', ['header', 'base', 'start', 'end', 'time', 'raw_suffix'])
+
+# 进程内缓存：签名 -> 计划
+_plans = None
+
+def _parse_date(text):
+    try:
+        return datetime.strptime(text, '%Y%m%d').date()
+    except ValueError:
+        return None
+
+def parse_header(header):
+    """解析列名为 HeaderInfo，无法识别的后缀保留在 raw_suffix 中"""
+    header = str(header)
+    match = HEADER_PATTERN.match(header)
+    if not match:
+        return HeaderInfo(header, header, None, None, None, None)
+
+    base = match.group('base')
+    suffix = match.group('suffix')
+    if suffix is None:
+        return HeaderInfo(header, base, None, None, None, None)
+
+    range_match = DATE_RANGE_PATTERN.match(suffix)
+    if range_match:
+        start, end = _parse_date(range_match.group(1)), _parse_date(range_match.group(2))
+        if start and end:
+            return HeaderInfo(header, base, start, end, None, None)
+
+    date_match = DATE_PATTERN.match(suffix)
+    if date_match:
+        end = _parse_date(date_match.group(1))
+        if end:
+            return HeaderInfo(header, base, None, end, date_match.group(2), None)
+
+    return HeaderInfo(header, base, None, None, None, suffix)
+
+def is_forecast(info):
+    return info.base.startswith(FORECAST_PREFIX) and info.end is not None
+
+def span_days(info):
+    """日期区间跨度（天），非区间列返回 None"""
+    if info.start is None or info.end is None:
+        return None
+    return (info.end - info.start).days
+
+def _span_ranks(infos):
+    """同一基础指标下的区间列按跨度从大到小排名"""
+    ranks = {}
+    groups = {}
+    for i, info in enumerate(infos):
+        if span_days(info) is not None:
+            groups.setdefault(info.base, []).append(i)
+    for indexes in groups.values():
+        ordered = sorted(indexes, key=lambda i: -span_days(infos[i]))
+        for rank, i in enumerate(ordered):
+            ranks[i] = rank
+    return ranks
+
+def normalize_headers(infos, run_year):
+    """去掉日期，得到跨天稳定的列名序列；预测年份转为相对运行年份的偏移"""
+    ranks = _span_ranks(infos)
+    normalized = []
+    for i, info in enumerate(infos):
+        if info.raw_suffix is not None:
+            normalized.append(f'{info.base}[{info.raw_suffix}]')
+        elif info.start is not None:
+            normalized.append(f'{info.base}[D-D#{ranks[i]}]')
+        elif is_forecast(info):
+            normalized.append(f'{info.base}[Y{info.end.year - run_year:+d}]')
+        elif info.end is not None:
+            normalized.append(f'{info.base}[D {info.time}]' if info.time else f'{info.base}[D]')
+        else:
+            normalized.append(info.base)
+    return normalized
+
+def header_signature(columns, field_specs, run_date):
+    """列名签名：归一化列名 + 字段规则，两者都不变时计划可复用"""
+    run_year = _as_date(run_date).year
+    infos = [parse_header(col) for col in columns]
+    payload = json.dumps(
+        [PLAN_VERSION, normalize_headers(infos, run_year), field_specs],
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _as_date(value):
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+def _resolve_field(infos, kind, patterns, run_year):
+    """按规则返回一个字段的候选列位置（按优先级）"""
+    if kind == 'exact':
+        return [i for name in patterns for i, info in enumerate(infos)
+                if info.header == name or info.base == name]
+
+    if kind == 'fuzzy':
+        return [i for pattern in patterns for i, info in enumerate(infos) if pattern in info.base]
+
+    if kind in ('interval_long', 'interval_short'):
+        candidates = [i for pattern in patterns for i, info in enumerate(infos) if pattern in info.base]
+        if not candidates:
+            return []
+        ranged = [i for i in candidates if span_days(infos[i]) is not None]
+        # 跨度相同时 max/min 取靠前的列；后缀无法解析时退回按列名长度判断
+        key = (lambda i: span_days(infos[i])) if ranged else (lambda i: len(infos[i].header))
+        pick = max if kind == 'interval_long' else min
+        return [pick(ranged or candidates, key=key)]
+
+    if kind.startswith('forecast'):
+        offset = int(kind.split(':', 1)[1]) if ':' in kind else 0
+        candidates = [i for pattern in patterns for i, info in enumerate(infos)
+                      if pattern in info.base and is_forecast(info)]
+        # 各偏移统一按预测年份顺序取第 offset 个（不早于运行年份的年份，没有时用全部年份），
+        # 保证 1y / 2y / 3y 对应不同的列；年份连续时与按运行年份 + offset 精确匹配的结果相同
+        all_years = sorted({infos[i].end.year for i in candidates})
+        years = [year for year in all_years if year >= run_year] or all_years
+        if offset < len(years):
+            return [i for i in candidates if infos[i].end.year == years[offset]]
+        return []
+
+    raise ValueError(f'未知的列匹配方式: {kind}')
+
+def compile_plan(columns, field_specs, run_date=None):
+    """编译列映射计划：{字段: [源列位置, ...]}"""
+    run_year = _as_date(run_date).year
+    infos = [parse_header(col) for col in columns]
+    return {
+        field: _resolve_field(infos, kind, patterns, run_year)
+        for field, kind, patterns in field_specs
+    }
+
+def bind_plan(plan, columns):
+    """把位置计划绑定到当天的具体列名"""
+    columns = list(columns)
+    return {field: [columns[i] for i in positions] for field, positions in plan.items()}
+
+def _load_plans():
+    global _plans
+    if _plans is None:
+        _plans = {}
+        try:
+            with open(COLUMN_PLAN_CACHE, 'r', encoding='utf-8') as f:
+                _plans = json.load(f)
+        except (OSError, ValueError):
+            _plans = {}
+    return _plans
+
+def _save_plans(plans):
+    # 只保留最近使用的计划
+    if len(plans) > MAX_CACHED_PLANS:
+        ordered = sorted(plans.items(), key=lambda item: item[1].get('last_used', ''), reverse=True)
+        plans.clear()
+        plans.update(ordered[:MAX_CACHED_PLANS])
+
+    # 补录时多个进程会同时写缓存，临时文件名带上进程号
+    tmp_path = f'{COLUMN_PLAN_CACHE}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(plans, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, COLUMN_PLAN_CACHE)
+    except OSError as e:
+        print(f"⚠️ 列映射计划缓存写入失败: {e}")
+
+def get_column_plan(columns, field_specs, run_date=None, use_cache=True):
+    """获取绑定到具体列名的映射计划，列名签名命中缓存时跳过编译"""
+    columns = [str(col) for col in columns]
+    if not use_cache:
+        return bind_plan(compile_plan(columns, field_specs, run_date), columns)
+
+    signature = header_signature(columns, field_specs, run_date)
+    plans = _load_plans()
+    entry = plans.get(signature)
+    today = date.today().isoformat()
+
+    if entry is None:
+        entry = {
+            'plan': compile_plan(columns, field_specs, run_date),
+            'columns': columns,
+            'created': today,
+        }
+        plans[signature] = entry
+        entry['last_used'] = today
+        _save_plans(plans)
+    elif entry.get('last_used') != today:
+        entry['last_used'] = today
+        _save_plans(plans)
+
+    return bind_plan(entry['plan'], columns)
+
+def clear_plan_cache():
+    """清空进程内和磁盘上的计划缓存"""
+    global _plans
+    _plans = {}
+    try:
+        os.remove(COLUMN_PLAN_CACHE)
+    except OSError:
+        pass
@@ -5,28 +5,32 @@
 
 import os
 from datetime import datetime
-from supabase import create_client, Client
+
+import pandas as pd
+
+from stockdb import StockRepository
 
 def test_supabase_connection():
     """测试 Supabase 连接"""
     print("🔌 测试 Supabase 连接...")
     
     # 从环境变量获取配置
-    SUPABASE_URL = os.getenv("SUPABASE_URL", "https://jsnrbuzrtvxuysotstyh.supabase.co")
+    SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("❌ 未设置 SUPABASE_URL / SUPABASE_KEY 环境变量")
+        return False
     
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        repo = StockRepository.connect(SUPABASE_URL, SUPABASE_KEY)
         print("✅ Supabase 客户端创建成功")
         
         # 测试连接
-        response = supabase.table('stocks').select('*').limit(1).execute()
+        repo.ping()
         print("✅ 数据库连接成功")
         
-        # 获取可用日期
-        response = supabase.table('stocks').select('update_date').execute()
-        dates = [row['update_date'] for row in response.data]
-        unique_dates = sorted(list(set(dates)), reverse=True)
+        # 获取可用日期（查询 stock_dates 日期目录）
+        unique_dates = repo.available_dates()
         
         print(f"📅 可用数据日期: {len(unique_dates)} 个")
         if unique_dates:
@@ -35,27 +39,26 @@ def test_supabase_connection():
             
             # 获取最新日期的数据统计
             latest_date = unique_dates[0]
-            response = supabase.table('stocks').select('*').eq('update_date', latest_date).execute()
-            stocks_data = response.data
+            stocks_data, _ = repo.day_rows(
+                latest_date, columns=['code', 'stock_name', 'latest_price', 'latest_change_pct']
+            )
             
-            if stocks_data:
+            if not stocks_data.empty:
                 print(f"\n📊 {latest_date} 数据统计:")
                 print(f"   股票数量: {len(stocks_data)} 只")
                 
                 # 计算平均涨跌幅
-                changes = [row.get('latest_change_pct', 0) for row in stocks_data if row.get('latest_change_pct') is not None]
-                if changes:
-                    avg_change = sum(changes) / len(changes)
+                avg_change = stocks_data['latest_change_pct'].mean()
+                if pd.notna(avg_change):
                     print(f"   平均涨跌幅: {avg_change:.2f}%")
                 
                 # 显示前5只股票
                 print(f"\n📋 前5只股票:")
-                for i, stock in enumerate(stocks_data[:5]):
-                    code = stock.get('code', 'N/A')
-                    name = stock.get('stock_name', 'N/A')
-                    price = stock.get('latest_price', 'N/A')
-                    change = stock.get('latest_change_pct', 'N/A')
-                    print(f"   {i+1}. {code} {name} {price} ({change}%)")
+                for i, stock in enumerate(stocks_data.head(5).itertuples(index=False)):
+                    print(f"   {i+1}. {stock.code:06d} {stock.stock_name} {stock.latest_price:.2f} "
+                          f"({stock.latest_change_pct:.2f}%)")
+        
+        repo.print_timings()
         
         return True
         
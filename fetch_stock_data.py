@@ -1,57 +1,105 @@
-import pywencai
-import pandas as pd
+"""
+从同花顺问财获取股票数据并写入 Supabase（GitHub Actions 定时任务入口）
+启动时只导入标准库和轻量模块，pandas、Supabase 客户端、通知等在用到时才导入和创建，
+配置缺失等提前退出的路径不再为重型依赖付出导入时间。
+
+用法:
+    python fetch_stock_data.py              # 获取当天数据并写库
+    python fetch_stock_data.py --intraday   # 盘中轮询模式
+    python fetch_stock_data.py --check      # 只检查配置，不导入 pandas / supabase
+
+各阶段耗时、行数计数和内存峰值写入 pipeline_metrics.log（JSON lines，见 metrics.py）；
+设置 METRICS_PROFILE=cprofile 或 pyinstrument 时同时保存性能分析结果。
+"""
+
+import argparse
+import importlib.util
 import os
 import sys
+import time
 from datetime import datetime
-import requests
-import json
-from supabase import create_client, Client
 
-# 钉钉机器人配置（可选）
-DINGTALK_WEBHOOK = os.getenv('DINGTALK_WEBHOOK', '')
+import metrics
+from strategies import load_strategy_config, run_strategies, merge_strategy_frames, dated_query
+from pipeline import Pipeline, BEIJING_TZ, PIPELINE_DEADLINE, parse_deadline
+from wencai_client import WencaiClient, WENCAI_FIXTURE_DIR, WENCAI_COOKIE_INTERVAL, parse_cookies
 
-# 同花顺Cookie配置
+# 同花顺Cookie配置（多个 Cookie 每行一个，轮换使用）
 COOKIE = os.getenv('THS_COOKIE', '')
 
 # Supabase配置
 SUPABASE_URL = os.getenv('SUPABASE_URL', '')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY', '')
 
-# 初始化Supabase客户端
-supabase: Client = None
-if SUPABASE_URL and SUPABASE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# 获取和写库需要的第三方包，--check 只确认可以找到，不导入
+REQUIRED_PACKAGES = ['pandas', 'numpy', 'pyarrow', 'supabase', 'pywencai', 'requests']
+
+# 数据访问仓库和通知在第一次使用时创建
+_repo = None
+_notifier = None
+
+def get_repo():
+    """数据访问仓库（带连接池的 Supabase 客户端），未配置时为 None"""
+    global _repo
+    if _repo is None:
+        from stockdb import StockRepository
+        _repo = StockRepository.from_env()
+    return _repo
 
-def dingtalk_robot(message):
-    """发送钉钉通知"""
-    if not DINGTALK_WEBHOOK:
-        print("钉钉Webhook未配置，跳过通知")
-        return
-    
-    headers = {'Content-Type': 'application/json'}
-    data = {
-        "msgtype": "text",
-        "text": {
-            "content": message
-        }
-    }
+def get_notifier():
+    """通知（钉钉 / Webhook / 本地文件）由后台线程发送，不阻塞写库"""
+    global _notifier
+    if _notifier is None:
+        from notifier import Notifier
+        _notifier = Notifier.from_env()
+    return _notifier
+
+def check_config():
+    """只检查配置和依赖是否齐全，返回问题列表；不导入 pandas、supabase 等重型模块"""
+    problems = []
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        problems.append('未设置 SUPABASE_URL / SUPABASE_KEY')
+    
+    cookies = parse_cookies(COOKIE)
+    if WENCAI_FIXTURE_DIR:
+        if not os.path.isdir(WENCAI_FIXTURE_DIR):
+            problems.append(f'WENCAI_FIXTURE_DIR 不存在: {WENCAI_FIXTURE_DIR}')
+        print(f"🎞️ 回放录制的问财结果: {WENCAI_FIXTURE_DIR}")
+    elif not cookies:
+        problems.append('未设置 THS_COOKIE')
+    else:
+        print(f"🍪 {len(cookies)} 个 Cookie")
     
     try:
-        response = requests.post(DINGTALK_WEBHOOK, headers=headers, json=data)
-        response.raise_for_status()
-        print("✅ 钉钉通知发送成功")
-    except Exception as e:
-        print(f"❌ 钉钉通知发送失败: {e}")
-
-def clean_stock_code(code):
-    """清理股票代码，去除 .SH, .SZ 等后缀"""
-    if isinstance(code, str):
-        return code.replace('.SH', '').replace('.SZ', '').replace('.BJ', '')
-    return str(code)
+        config = load_strategy_config()
+        if config['strategies']:
+            print(f"📋 {len(config['strategies'])} 个启用的策略: "
+                  f"{', '.join(s['name'] for s in config['strategies'])}")
+        else:
+            problems.append('strategies.json 中没有启用的策略')
+    except (OSError, ValueError) as e:
+        problems.append(f'策略配置无效: {e}')
+    
+    try:
+        deadline = parse_deadline(PIPELINE_DEADLINE, datetime.now(BEIJING_TZ))
+        print(f"⏰ 截止时间: {PIPELINE_DEADLINE or '无'}"
+              f"{'' if deadline or not PIPELINE_DEADLINE else ' (已过，不限时)'}")
+    except ValueError as e:
+        problems.append(f'PIPELINE_DEADLINE 格式错误 ({PIPELINE_DEADLINE}): {e}')
+    
+    storage_mode = os.getenv('STOCK_STORAGE_MODE', 'upsert')
+    if storage_mode not in ('upsert', 'versioned'):
+        problems.append(f'STOCK_STORAGE_MODE 无效: {storage_mode}（可选 upsert / versioned）')
+    
+    missing = [name for name in REQUIRED_PACKAGES if importlib.util.find_spec(name) is None]
+    if missing:
+        problems.append(f'缺少依赖: {", ".join(missing)}')
+    return problems
 
 def init_database():
     """初始化数据库表结构 - Supabase版本"""
-    if not supabase:
+    repo = get_repo()
+    if not repo:
         print("❌ Supabase 客户端未初始化")
         return False
     
@@ -59,216 +107,236 @@ def init_database():
     # 这里只是检查连接
     try:
         # 测试连接
-        result = supabase.table('stocks').select('*').limit(1).execute()
+        repo.ping()
         print("✅ Supabase 数据库连接成功")
         return True
     except Exception as e:
         print(f"❌ Supabase 数据库连接失败: {e}")
         return False
 
-def insert_stock_data(df, update_date):
-    """插入股票数据到Supabase数据库"""
-    if not supabase:
+def insert_stock_data(stock_frame, update_date, table='stocks', delete_stale=True):
+    """写入映射后的股票数据到Supabase数据库
+
+    返回写入报告 {'written', 'failed', ...}；未连接或出错时整批记为失败，调用方据此判断是否需要重试。
+    """
+    import local_store
+    from stock_catalog import summarize_day
+    from stock_records import StockBatch, print_validation_report
+    from stock_writer import print_write_report
+    
+    repo = get_repo()
+    if not repo:
         print("❌ Supabase 客户端未初始化")
-        return 0
+        return {'written': 0, 'failed': len(stock_frame), 'error': 'Supabase 客户端未初始化'}
     
     try:
-        # 清理和映射数据列
-        data_to_insert = []
+        # 按 stocks 表的列类型整列校验，超出精度的数值置空，缺少代码或名称的行剔除
+        data_to_insert = StockBatch.from_frame(stock_frame)
+        print_validation_report(data_to_insert)
+        metrics.count('rows_rejected', len(data_to_insert.rejected))
+        metrics.count('values_nulled', sum(count for count, _ in data_to_insert.nulled.values()))
         
-        for _, row in df.iterrows():
-            # 获取股票代码
-            stock_code = None
-            for col in ['代码', '股票代码', '证券代码', 'code']:
-                if col in df.columns and pd.notna(row[col]):
-                    stock_code = clean_stock_code(str(row[col]))
-                    break
-            
-            if not stock_code:
-                continue
-                
-            try:
-                stock_code = int(stock_code)
-            except:
-                continue
+        if len(data_to_insert):
+            # 本地分区和日期目录只用通过校验的行，与数据库中的内容一致
+            kept_frame = data_to_insert.to_frame() if table == 'stocks' else None
+            # 同时写入本地 Parquet 分区，供面板和离线分析直接读取
+            if table == 'stocks':
+                try:
+                    if local_store.is_enabled():
+                        local_store.write_partition(kept_frame, update_date)
+                        print(f"💾 数据已保存到本地分区: {local_store.partition_path(update_date)}")
+                except Exception as e:
+                    print(f"⚠️ 写入本地分区失败: {e}")
             
-            # 获取股票名称
-            stock_name = ""
-            for col in ['股票简称', '证券简称', 'name']:
-                if col in df.columns and pd.notna(row[col]):
-                    stock_name = str(row[col])
-                    break
+            # 按 (code, update_date) 分块并发 upsert，成功后再清理当天的旧数据
+            report = repo.write_day(data_to_insert, update_date, table=table, delete_stale=delete_stale)
+            print_write_report(report)
+            metrics.count('rows_written', report['written'])
+            metrics.count('rows_failed', report['failed'])
+            metrics.event('write', **{k: v for k, v in report.items() if k != 'chunks'},
+                          chunks=len(report['chunks']),
+                          retries=sum(c['attempts'] - 1 for c in report['chunks']))
             
-            if not stock_name:
-                continue
-            
-            # 映射其他字段 - 使用模糊匹配来处理包含日期的字段名
-            data_row = {
-                'code': stock_code,
-                'stock_name': stock_name,
-                'latest_price': get_value(row, df.columns, ['最新价', '现价', 'price']),
-                'latest_change_pct': get_value(row, df.columns, ['最新涨跌幅', '涨跌幅', '涨跌幅(%)']),
-                'listing_board': get_value(row, df.columns, ['上市板块', '板块']),
-                'auction_change_pct': get_value_fuzzy(row, df.columns, ['竞价涨幅']),
-                'pe_ttm': get_value_fuzzy(row, df.columns, ['市盈率(pe,ttm)']),
-                'pe': get_value_fuzzy(row, df.columns, ['市盈率(pe)']),
-                'dde_large_order': get_value_fuzzy(row, df.columns, ['dde大单净量']),
-                'volume_ratio': get_value_fuzzy(row, df.columns, ['分时量比']),
-                'interval_change_13d': get_interval_change(row, df.columns, longer=True),   # 取较长区间
-                'interval_change_5d': get_interval_change(row, df.columns, longer=False),  # 取较短区间
-                'listing_days': get_value_fuzzy(row, df.columns, ['上市天数']),
-                'forecast_pe_1y': get_value_fuzzy(row, df.columns, ['预测市盈率(pe,最新预测)[2025']),
-                'forecast_pe_2y': get_value_fuzzy(row, df.columns, ['预测市盈率(pe,最新预测)[2026']),
-                'forecast_pe_3y': get_value_fuzzy(row, df.columns, ['预测市盈率(pe,最新预测)[2027']),
-                'market_cap': get_value_fuzzy(row, df.columns, ['总市值']),
-                'eps': get_value(row, df.columns, ['基本每股收益', 'EPS']),
-                'gross_margin': get_value(row, df.columns, ['销售毛利率', '毛利率']),
-                'net_margin': get_value(row, df.columns, ['销售净利率', '净利率']),
-                'auction_price': get_value_fuzzy(row, df.columns, ['竞价匹配价']),
-                'auction_type': get_value_fuzzy(row, df.columns, ['竞价异动类型']),
-                'auction_desc': get_value_fuzzy(row, df.columns, ['竞价异动说明']),
-                'auction_rating': get_value_fuzzy(row, df.columns, ['集合竞价评级']),
-                'auction_volume': get_value_fuzzy(row, df.columns, ['竞价量']),
-                'auction_amount': get_value(row, df.columns, ['竞价金额', '竞价成交额']),
-                'market_code': get_value(row, df.columns, ['market_code']),
-                'update_date': update_date
-            }
-            
-            data_to_insert.append(data_row)
-        
-        if data_to_insert:
-            # 先删除当天的数据，避免重复
-            try:
-                supabase.table('stocks').delete().eq('update_date', update_date).execute()
-                print(f"🗑️ 已清理当天的旧数据")
-            except Exception as e:
-                print(f"⚠️ 清理旧数据时出现警告: {e}")
-            
-            # 批量插入数据到Supabase
-            result = supabase.table('stocks').insert(data_to_insert).execute()
-            
-            print(f"✅ 成功插入 {len(data_to_insert)} 条股票数据到Supabase数据库")
-            return len(data_to_insert)
+            if report['failed']:
+                print(f"⚠️ {report['failed']} 条数据写入失败，已保留当天的旧数据")
+            else:
+                if table == 'stocks':
+                    # 更新日期目录，面板只需查询这张小表
+                    try:
+                        summary = summarize_day(kept_frame, update_date)
+                        repo.upsert_date_summary(summary)
+                    except Exception as e:
+                        print(f"⚠️ 更新日期目录失败: {e}")
+                print(f"✅ 成功写入 {report['written']} 条股票数据到Supabase数据库 ({table})")
+            return report
         else:
             print("❌ 没有有效的数据可插入")
-            return 0
+            return {'written': 0, 'failed': 0}
             
     except Exception as e:
         print(f"❌ 插入数据到Supabase数据库时出错: {e}")
-        return 0
+        return {'written': 0, 'failed': len(stock_frame), 'error': str(e)}
 
-def get_value(row, columns, possible_names, default=None):
-    """从行数据中获取值"""
-    for name in possible_names:
-        if name in columns and pd.notna(row[name]):
-            return row[name]
-    return default
+def make_wencai_client(rate_scale=1):
+    """带重试、Cookie 轮换和结果缓存的问财客户端，各策略线程共享"""
+    return WencaiClient.from_env(COOKIE, cookie_interval=WENCAI_COOKIE_INTERVAL * rate_scale)
 
-def get_value_fuzzy(row, columns, possible_names, default=None):
-    """使用模糊匹配从行数据中获取值"""
-    for pattern in possible_names:
-        for col in columns:
-            if pattern in col and pd.notna(row[col]):
-                return row[col]
-    return default
+def fetch_strategy_frames(timeout=None, query_date=None, rate_scale=1, client=None, use_cache=True):
+    """并发执行 strategies.json 中的全部策略
 
-def get_interval_change(row, columns, longer=True, default=None):
-    """获取区间涨跌幅，longer=True取较长区间，False取较短区间"""
-    interval_cols = [col for col in columns if '区间涨跌幅:前复权' in col]
-    if not interval_cols:
-        return default
-    
-    if longer:
-        # 取较长区间（日期范围较大的）
-        col = max(interval_cols, key=len, default=None)
+    返回 ([(策略, 原始 DataFrame)], [(失败的策略, 错误信息)])；timeout 秒内未返回的策略记为失败。
+    query_date 不为空时查询该日期的历史结果；多个进程同时请求时用 rate_scale 放大限速间隔，
+    使总请求频率不超过单进程的限额。client 为空时新建问财客户端；盘中轮询传入同一个客户端，
+    保留 Cookie 的冷却和限流状态，并用 use_cache=False 跳过按分钟缓存的结果。
+    """
+    config = load_strategy_config()
+    strategies = config['strategies']
+    if query_date:
+        strategies = [dict(strategy, query=dated_query(strategy['query'], query_date)) for strategy in strategies]
+    print(f"📋 共 {len(strategies)} 个策略: {', '.join(s['title'] for s in strategies)}")
+    
+    client = client or make_wencai_client(rate_scale)
+    results = run_strategies(
+        strategies,
+        client.get if use_cache else lambda query: client.get(query, use_cache=False),
+        max_workers=config['max_workers'],
+        min_interval=config['min_interval_seconds'] * rate_scale,
+        timeout=timeout,
+    )
+    
+    stats = client.stats()
+    metrics.event('wencai', **stats)
+    print(f"🍪 问财请求: {stats['attempts']} 次, 缓存命中 {stats['cache_hits']}/{stats['queries']}, "
+          f"使用 {len(stats['cookies'])} 个 Cookie")
+    for cookie in stats['cookies']:
+        if cookie['errors']:
+            print(f"   ⚠️ Cookie {cookie['cookie']}: 失败 {cookie['errors']} 次, 被限流 {cookie['rate_limited']} 次")
+    
+    fetched, errors = [], []
+    for result in results:
+        strategy, res = result['strategy'], result['data']
+        metrics.event('strategy', strategy=strategy['name'], rows=None if res is None else len(res),
+                      elapsed=round(result['elapsed'], 4), error=result['error'])
+        if result['error']:
+            print(f"❌ 策略 {strategy['title']} 获取失败: {result['error']}")
+            errors.append((strategy, result['error']))
+            continue
+        if res is None:
+            print(f"⚠️ 策略 {strategy['title']} 未获取到数据")
+            continue
+        
+        print(f"📊 策略 {strategy['title']}: 获取到 {len(res)} 条股票数据 ({result['elapsed']:.1f}s)")
+        
+        # 清理股票代码
+        for col in ['代码', '股票代码', '证券代码']:
+            if col in res.columns:
+                res[col] = res[col].astype(str).str.replace(r'\.(SH|SZ|BJ)', '', regex=True)
+        
+        fetched.append((strategy, res))
+    
+    return fetched, errors
+
+def map_strategy_frames(fetched, update_date):
+    """映射各策略的原始结果并按目标表合并，返回 ([(策略, 映射后的 DataFrame)], {表名: DataFrame})"""
+    from stock_mapping import map_stock_frame
+    
+    tagged_frames = [(strategy, map_stock_frame(res, update_date)) for strategy, res in fetched]
+    for (strategy, res), (_, frame) in zip(fetched, tagged_frames):
+        # 代码或名称为空的行在映射时被过滤
+        metrics.count('rows_mapped', len(frame))
+        metrics.count('rows_filtered', len(res) - len(frame))
+    return tagged_frames, merge_strategy_frames(tagged_frames)
+
+def write_strategy_frames(merged, errors, update_date):
+    """按目标表写入数据库，返回 (stocks 表写入的条数, [(表名, 写入失败说明)])；
+    有策略失败的表不清理当天旧数据"""
+    failed_tables = {strategy['table'] for strategy, _ in errors}
+    data_count, write_errors = 0, []
+    for table, frame in merged.items():
+        report = insert_stock_data(frame, update_date, table=table,
+                                   delete_stale=table not in failed_tables)
+        if table == 'stocks':
+            data_count = report['written']
+        if report['failed']:
+            write_errors.append((table, report.get('error') or f"{report['failed']} 条写入失败"))
+    return data_count, write_errors
+
+def build_update_message(current_date, data_count, stock_frame, tagged_frames, errors):
+    """准备钉钉通知消息"""
+    import pandas as pd
+    
+    message = f"📊 **股票数据更新通知** ({current_date})\n\n"
+    message += f"📈 **符合条件股票数量**: {data_count} 只\n\n"
+    
+    if len(tagged_frames) + len(errors) > 1:
+        message += f"🧭 **各策略命中数量**:\n"
+        for strategy, frame in tagged_frames:
+            message += f"- {strategy['title']}: {len(frame)} 只\n"
+        message += "\n"
+    for strategy, error in errors:
+        message += f"⚠️ 策略 {strategy['title']} 获取失败: {error}\n"
+    if errors:
+        message += "\n"
+    
+    if data_count > 0 and stock_frame is not None:
+        message += f"📋 **部分股票列表**:\n"
+        
+        # 显示前10只股票
+        top = stock_frame.head(10)
+        for i, row in enumerate(top.itertuples(index=False)):
+            price_change = f"{row.auction_change_pct:.2f}%" if pd.notna(row.auction_change_pct) else ""
+            tags = f" [{', '.join(row.strategies)}]" if len(tagged_frames) > 1 else ""
+            message += f"{i+1}. {int(row.code):06d} {row.stock_name} {price_change}{tags}\n"
+        
+        if len(stock_frame) > 10:
+            message += f"... 还有 {len(stock_frame) - 10} 只股票\n"
     else:
-        # 取较短区间（日期范围较小的）  
-        col = min(interval_cols, key=len, default=None)
+        message += f"📝 **提示**: 今日无符合条件的股票\n"
     
-    if col and pd.notna(row[col]):
-        return row[col]
-    return default
+    message += f"\n💾 **数据已更新到数据库**"
+    return message
+
+def fetch_stock_data(pipeline=None):
+    """获取股票数据
 
-def fetch_stock_data():
-    """获取股票数据"""
+    获取、映射、写库为关键路径；原始结果快照和通知在写库完成后交给后台线程执行
+    """
+    from snapshot import save_snapshots
+    
+    pipeline = pipeline or Pipeline()
+    notifier = get_notifier()
     try:
         print("🔄 开始从同花顺获取股票数据...")
         
-        # 同花顺查询条件
-        query = '''今天非st，非科创板，竞价涨跌幅大于1%且小于6%，
-                   TTM 市盈率不为亏损，主力净量大于0，集合竞价量比大于1，
-                   10日涨幅大于等于10%，5日涨幅大于等于10%，上市时间大于100天'''
+        current_date = datetime.now(BEIJING_TZ).strftime('%Y-%m-%d')
         
-        # 获取数据
-        res = pywencai.get(query=query, cookie=COOKIE)
+        # 并发执行全部策略，有截止时间时为写库预留时间
+        with pipeline.stage('fetch') as stage:
+            fetched, errors = fetch_strategy_frames(timeout=pipeline.fetch_timeout())
+            stage['rows'] = sum(len(res) for _, res in fetched)
+            stage['failed_strategies'] = [strategy['name'] for strategy, _ in errors]
+            pipeline.count('rows_fetched', stage['rows'])
+            pipeline.count('strategies_failed', len(errors))
         
-        current_date = datetime.now().strftime('%Y-%m-%d')
+        if errors and not fetched:
+            raise RuntimeError('; '.join(f"{strategy['title']}: {error}" for strategy, error in errors))
         
-        if res is not None:
-            # 确保数据是DataFrame格式
-            if not isinstance(res, pd.DataFrame):
-                res = pd.DataFrame(res)
-            
-            print(f"📊 获取到 {len(res)} 条股票数据")
-            
-            # 清理股票代码
-            for col in ['代码', '股票代码', '证券代码']:
-                if col in res.columns:
-                    res[col] = res[col].astype(str).str.replace(r'\.(SH|SZ|BJ)', '', regex=True)
-            
-            # 保存到Excel文件（可选）
-            excel_path = os.path.join(os.path.dirname(__file__), f'stock_data_{current_date}.xlsx')
-            res.to_excel(excel_path, index=False)
-            print(f"📄 数据已保存到Excel: {excel_path}")
-            
-            # 插入数据库
-            data_count = insert_stock_data(res, current_date)
+        if fetched:
+            with pipeline.stage('map') as stage:
+                tagged_frames, merged = map_strategy_frames(fetched, current_date)
+                stage['rows'] = sum(len(frame) for frame in merged.values())
             
-            # 准备钉钉通知消息
-            message = f"📊 **股票数据更新通知** ({current_date})\n\n"
-            message += f"📈 **符合条件股票数量**: {data_count} 只\n\n"
-            
-            if data_count > 0:
-                message += f"📋 **部分股票列表**:\n"
-                
-                # 显示前10只股票
-                display_count = min(10, len(res))
-                for i in range(display_count):
-                    row = res.iloc[i]
-                    
-                    # 获取股票基本信息
-                    stock_code = ""
-                    if '代码' in res.columns:
-                        stock_code = str(row['代码'])
-                    elif '股票代码' in res.columns:
-                        stock_code = str(row['股票代码'])
-                    
-                    stock_name = ""
-                    if '股票简称' in res.columns:
-                        stock_name = str(row['股票简称'])
-                    
-                    # 获取竞价涨幅
-                    price_change = ""
-                    for col in ['竞价涨跌幅', '涨跌幅', '最新涨跌幅']:
-                        if col in res.columns and pd.notna(row[col]):
-                            if isinstance(row[col], (int, float)):
-                                price_change = f"{row[col]:.2f}%"
-                            break
-                    
-                    message += f"{i+1}. {stock_code} {stock_name} {price_change}\n"
-                
-                if len(res) > 10:
-                    message += f"... 还有 {len(res) - 10} 只股票\n"
-            else:
-                message += f"📝 **提示**: 今日无符合条件的股票\n"
+            with pipeline.stage('db_write') as stage:
+                data_count, write_errors = write_strategy_frames(merged, errors, current_date)
+                stage['rows'] = data_count
+                stage['failed_tables'] = [table for table, _ in write_errors]
             
-            message += f"\n💾 **数据已更新到数据库**"
-            
-            # 发送钉钉通知
-            try:
-                dingtalk_robot(message)
-            except Exception as e:
-                print(f"❌ 钉钉通知发送失败: {e}")
+            # 写库完成后再发送通知和保存原始结果快照
+            message = build_update_message(current_date, data_count, merged.get('stocks'),
+                                           tagged_frames, errors)
+            notifier.notify(message)
+            pipeline.defer('snapshot', save_snapshots,
+                           {strategy['name']: res for strategy, res in fetched}, current_date)
             
             return True, data_count
             
@@ -279,11 +347,7 @@ def fetch_stock_data():
             message = f"📊 **股票数据更新通知** ({current_date})\n\n"
             message += f"📈 **符合条件股票数量**: 0 只\n\n"
             message += f"📝 **提示**: 今日无符合条件的股票"
-            
-            try:
-                dingtalk_robot(message)
-            except Exception as e:
-                print(f"❌ 钉钉通知发送失败: {e}")
+            notifier.notify(message)
             
             return False, 0
     
@@ -294,21 +358,107 @@ def fetch_stock_data():
         error_message = f"❌ **股票数据获取失败**\n\n"
         error_message += f"🕒 **时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         error_message += f"💻 **错误信息**: {str(e)}"
-        
-        try:
-            dingtalk_robot(error_message)
-        except:
-            pass
+        notifier.notify(error_message)
         
         return False, 0
 
+def poll_once(previous, current_date, client=None):
+    """执行一轮盘中筛选，把相对上一轮的变化写入 stock_snapshots，返回本轮结果（作为下一轮的基准）
+
+    client 为各轮共用的问财客户端；每轮都重新查询，不使用按分钟缓存的结果。
+    """
+    import pandas as pd
+    from intraday import index_by_code, diff_snapshots, write_snapshot_changes, snapshot_time
+    from stock_writer import print_write_report
+    
+    fetched, errors = fetch_strategy_frames(client=client, use_cache=False)
+    if any(strategy['table'] == 'stocks' for strategy, _ in errors):
+        # 有策略失败时结果不完整，比较会把未返回的股票误判为退出
+        print("⚠️ 有策略获取失败，本轮跳过比较")
+        return previous
+    
+    _, merged = map_strategy_frames(
+        [(strategy, res) for strategy, res in fetched if strategy['table'] == 'stocks'], current_date
+    )
+    merged = merged.get('stocks')
+    current = index_by_code(merged) if merged is not None else pd.DataFrame(index=pd.Index([], name='code'))
+    
+    snapshot_at = snapshot_time()
+    records, counts = diff_snapshots(previous, current, snapshot_at, current_date)
+    print(f"🔁 {snapshot_at}: 新入选 {counts['enter']}, 退出 {counts['exit']}, "
+          f"变化 {counts['update']}, 未变 {counts['unchanged']}")
+    if records:
+        report = write_snapshot_changes(get_repo(), records)
+        print_write_report(report)
+        if report['failed']:
+            # 写入失败时保留旧基准，下一轮重新生成这些变化
+            return previous
+    return current
+
+def run_intraday(interval=None, max_rounds=None):
+    """盘中轮询：交易时段内每 interval 秒重新筛选一次，只把变化写入 stock_snapshots
+
+    启动后的第一轮没有上一轮结果，全部股票记为新入选，作为当天的基线；interval 为空时使用 INTRADAY_INTERVAL。
+    周末和 trading_holidays.txt 中的休市日直接退出。
+    """
+    from intraday import INTRADAY_INTERVAL, parse_sessions, next_session_wait
+    from trading_calendar import is_trading_day
+    
+    interval = INTRADAY_INTERVAL if interval is None else interval
+    sessions = parse_sessions()
+    current_date = datetime.now(BEIJING_TZ).strftime('%Y-%m-%d')
+    if not is_trading_day(current_date):
+        print(f"📅 {current_date} 不是交易日，不启动盘中轮询")
+        return 0
+    # 各轮共用一个问财客户端，Cookie 的冷却和限流状态跨轮保留
+    client = make_wencai_client()
+    previous = None
+    rounds = 0
+    print(f"⏱️ 盘中轮询模式: 每 {interval:.0f}s 一轮")
+    
+    while max_rounds is None or rounds < max_rounds:
+        wait = next_session_wait(datetime.now(BEIJING_TZ), sessions)
+        if wait is None:
+            print("🏁 今日交易时段已结束，停止轮询")
+            break
+        if wait > 0:
+            print(f"⏸️ 等待下一个交易时段 ({wait:.0f}s)")
+            time.sleep(wait)
+            continue
+        
+        started = time.monotonic()
+        rounds += 1
+        try:
+            previous = poll_once(previous, current_date, client)
+        except Exception as e:
+            print(f"❌ 第 {rounds} 轮轮询出错: {e}")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    
+    return rounds
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='从同花顺问财获取股票数据并写入 Supabase')
+    parser.add_argument('--intraday', action='store_true', help='盘中轮询模式，只写入变化到 stock_snapshots')
+    parser.add_argument('--interval', type=float, default=None, help='盘中轮询间隔（秒），默认 INTRADAY_INTERVAL')
+    parser.add_argument('--rounds', type=int, default=None, help='盘中轮询的最大轮数')
+    parser.add_argument('--check', action='store_true', help='只检查配置和依赖，不导入重型模块、不访问网络')
+    args = parser.parse_args()
+    
+    if args.check:
+        problems = check_config()
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print("✅ 配置检查通过")
+        return True
+    
     print("🚀 启动股票数据获取脚本...")
     print(f"📅 执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     # 检查必要的环境变量
-    if not COOKIE:
+    if not COOKIE and not WENCAI_FIXTURE_DIR:
         print("❌ 未设置 THS_COOKIE 环境变量")
         return False
     
@@ -316,19 +466,52 @@ def main():
         print("❌ 未设置 Supabase 配置环境变量")
         return False
     
+    if args.intraday:
+        if not init_database():
+            print("❌ 数据库初始化失败")
+            return False
+        run_intraday(args.interval, args.rounds)
+        get_notifier().close()
+        get_repo().print_timings()
+        return True
+    
+    pipeline = Pipeline()
+    if pipeline.deadline:
+        print(f"⏰ 截止时间: {pipeline.deadline.strftime('%H:%M:%S')} (剩余 {pipeline.remaining():.0f}s)")
+    
     # 初始化数据库连接
-    if not init_database():
+    with pipeline.stage('db_check'):
+        ready = init_database()
+    if not ready:
         print("❌ 数据库初始化失败")
+        pipeline.log_summary(success=False)
         return False
     
-    # 获取股票数据
-    success, count = fetch_stock_data()
+    # 获取股票数据（METRICS_PROFILE 开启时对关键路径做性能分析）
+    with pipeline.metrics.profile():
+        success, count = fetch_stock_data(pipeline)
     
     if success:
         print(f"✅ 任务完成！共处理 {count} 条股票数据")
     else:
         print("❌ 任务失败")
     
+    # 等待后台阶段和通知发送结束并输出计时报告
+    pipeline.finish()
+    with pipeline.stage('notify', critical=False):
+        get_notifier().close()
+    pipeline.print_summary()
+    get_repo().print_timings()
+    pipeline.log_summary(
+        success=success,
+        db_queries=get_repo().timing_summary().reset_index().to_dict('records'),
+        notify=get_notifier().metrics(),
+    )
+    try:
+        print(f"📄 计时报告已保存: {pipeline.write_report()}")
+    except Exception as e:
+        print(f"⚠️ 保存计时报告失败: {e}")
+    
     return success
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+"""
+盘中增量轮询：变化检测
+每轮筛选结果按 code 建索引，与上一轮在内存中比较，只生成变化的记录：
+新入选（enter）、退出（exit）、字段变化（update，只记录变化的字段），
+写入 stock_snapshots 表。写库量与变化量成正比，而不是与入选股票总数成正比。
+轮询循环见 fetch_stock_data.py --intraday
+"""
+
+import os
+from datetime import datetime, time as dtime
+
+import numpy as np
+
+from pipeline import BEIJING_TZ
+from stock_mapping import frame_to_records
+
+SNAPSHOT_TABLE = 'stock_snapshots'
+
+# 对应 supabase_setup.sql 中的 idx_stock_snapshots_code_time，重试时不会重复写入
+SNAPSHOT_CONFLICT_COLUMNS = 'code,snapshot_at'
+
+# 轮询间隔（秒）；盘中每轮都绕过按分钟的结果缓存重新查询
+INTRADAY_INTERVAL = float(os.getenv('INTRADAY_INTERVAL', '60'))
+
+# 交易时段（北京时间），逗号分隔
+INTRADAY_SESSIONS = os.getenv('INTRADAY_SESSIONS', '09:25-11:30,13:00-15:00')
+
+# 不参与比较的列
+DIFF_EXCLUDE = ('code', 'update_date')
+
+def parse_sessions(text=INTRADAY_SESSIONS):
+    """'09:25-11:30,13:00-15:00' -> [(time(9, 25), time(11, 30)), ...]"""
+    sessions = []
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        start, end = (dtime.fromisoformat(part.strip()) for part in item.split('-'))
+        sessions.append((start, end))
+    return sorted(sessions)
+
+def next_session_wait(now, sessions):
+    """距离下一个交易时段的秒数：正在交易时段内返回 0，今天的交易时段都已结束返回 None"""
+    now = now.astimezone(BEIJING_TZ)
+    for start, end in sessions:
+        if start <= now.time() < end:
+            return 0.0
+        if now.time() < start:
+            start_at = now.replace(hour=start.hour, minute=start.minute, second=0, microsecond=0)
+            return (start_at - now).total_seconds()
+    return None
+
+def index_by_code(frame):
+    """映射后的 DataFrame 转为以 code 为索引的比较用结构，strategies 转为有序元组便于比较"""
+    frame = frame.drop_duplicates('code', keep='last').set_index('code')
+    frame = frame.drop(columns=[c for c in DIFF_EXCLUDE if c in frame.columns])
+    if 'strategies' in frame.columns:
+        frame['strategies'] = frame['strategies'].map(
+            lambda tags: tuple(sorted(tags)) if isinstance(tags, (list, tuple, np.ndarray)) else ()
+        )
+    return frame
+
+def _differs(old, new):
+    """逐元素比较两列，两边都为空视为相同"""
+    both_missing = old.isna().to_numpy() & new.isna().to_numpy()
+    equal = (old.astype(object) == new.astype(object)).to_numpy(dtype=bool)
+    return ~(equal | both_missing)
+
+def _records_by_code(frame):
+    records = frame_to_records(frame.reset_index())
+    return {record.pop('code'): record for record in records}
+
+def diff_snapshots(previous, current, snapshot_at, update_date):
+    """比较两轮结果（index_by_code 的输出），返回 (变化记录列表, 各类变化数量)
+
+    previous 为 None 时当前全部股票记为 enter，作为当天的基线。
+    """
+    if previous is None:
+        previous = current.iloc[0:0]
+
+    entered = current.index.difference(previous.index)
+    exited = previous.index.difference(current.index)
+    common = current.index.intersection(previous.index)
+    fields = [c for c in current.columns if c in previous.columns]
+
+    old = previous.loc[common, fields]
+    new = current.loc[common, fields]
+    if len(common) and fields:
+        changed = np.column_stack([_differs(old[col], new[col]) for col in fields])
+    else:
+        changed = np.zeros((len(common), len(fields)), dtype=bool)
+    updated_mask = changed.any(axis=1)
+
+    base = {'snapshot_at': snapshot_at, 'update_date': update_date}
+    records = []
+
+    for code, row in _records_by_code(current.loc[entered]).items():
+        records.append({**base, 'code': int(code), 'change_type': 'enter',
+                        'stock_name': row.get('stock_name'), 'strategies': list(row.get('strategies') or []),
+                        'data': row, 'previous': None})
+
+    for code, row in _records_by_code(previous.loc[exited]).items():
+        records.append({**base, 'code': int(code), 'change_type': 'exit',
+                        'stock_name': row.get('stock_name'), 'strategies': [],
+                        'data': {}, 'previous': row})
+
+    # 只为有变化的股票生成字典，只保留变化的字段
+    old_rows = _records_by_code(old[updated_mask])
+    new_rows = _records_by_code(new[updated_mask])
+    field_array = np.array(fields, dtype=object)
+    for code, mask in zip(common[updated_mask], changed[updated_mask]):
+        columns = field_array[mask]
+        new_row, old_row = new_rows[code], old_rows[code]
+        records.append({**base, 'code': int(code), 'change_type': 'update',
+                        'stock_name': new_row.get('stock_name'),
+                        'strategies': list(new_row.get('strategies') or []),
+                        'data': {col: new_row[col] for col in columns},
+                        'previous': {col: old_row[col] for col in columns}})
+
+    counts = {'enter': len(entered), 'exit': len(exited), 'update': int(updated_mask.sum()),
+              'unchanged': int(len(common) - updated_mask.sum())}
+    return records, counts
+
+def write_snapshot_changes(repo, records):
+    """把变化记录写入 stock_snapshots（repo 为 stockdb.StockRepository），返回写入报告"""
+    return repo.upsert(SNAPSHOT_TABLE, records, on_conflict=SNAPSHOT_CONFLICT_COLUMNS)
+
+def snapshot_time(now=None):
+    return (now or datetime.now(BEIJING_TZ)).astimezone(BEIJING_TZ).replace(microsecond=0).isoformat()
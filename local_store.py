@@ -0,0 +1,148 @@
+"""
+本地列式历史数据存储
+按 update_date 分区保存为 Parquet 文件（data/stocks/update_date=YYYY-MM-DD/part.parquet），
+作为 Supabase 前面的读穿透缓存；历史交易日的数据不再变化，本地命中后无需再走网络。
+安装 duckdb 后可以直接对全部分区执行 SQL 分析。
+
+用法:
+    python local_store.py sync      # 从 Supabase 补齐本地缺失的分区
+    python local_store.py list      # 列出本地分区
+    python local_store.py sql "SELECT update_date, count(*) FROM stocks GROUP BY 1"
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from pipeline import BEIJING_TZ
+from stock_loader import apply_dtypes
+from stock_records import STOCKS_SCHEMA
+
+try:
+    import duckdb
+except ImportError:  # duckdb 为可选依赖，仅 SQL 查询需要
+    duckdb = None
+
+# 本地存储目录，设为空字符串可关闭本地存储
+LOCAL_STORE_DIR = os.getenv(
+    'LOCAL_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'stocks')
+)
+
+PARTITION_PREFIX = 'update_date='
+PARTITION_FILE = 'part.parquet'
+
+# 分区文件统一保存 stocks 表的数据列：获取脚本写入的映射结果和从 Supabase 同步的整行
+# （含 id、created_at 等数据库生成的列）写出相同的列和类型，update_date 由分区目录记录
+PARTITION_COLUMNS = [column for column in STOCKS_SCHEMA if column != 'update_date']
+
+def is_enabled():
+    return bool(LOCAL_STORE_DIR)
+
+def partition_path(update_date):
+    return os.path.join(LOCAL_STORE_DIR, f'{PARTITION_PREFIX}{update_date}', PARTITION_FILE)
+
+def has_partition(update_date):
+    return is_enabled() and os.path.exists(partition_path(update_date))
+
+def list_partitions():
+    """本地已有的分区日期，按日期倒序"""
+    if not is_enabled() or not os.path.isdir(LOCAL_STORE_DIR):
+        return []
+    dates = [
+        name[len(PARTITION_PREFIX):] for name in os.listdir(LOCAL_STORE_DIR)
+        if name.startswith(PARTITION_PREFIX)
+        and os.path.exists(os.path.join(LOCAL_STORE_DIR, name, PARTITION_FILE))
+    ]
+    return sorted(dates, reverse=True)
+
+def write_partition(data, update_date):
+    """写入一天的数据（DataFrame 或字典列表），整个分区原子替换，返回写入行数"""
+    if not is_enabled():
+        return 0
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    # 分区目录本身记录日期，文件内不重复保存；缺少的列补空值，多余的列不写入
+    df = apply_dtypes(df.reindex(columns=PARTITION_COLUMNS).reset_index(drop=True))
+    df['strategies'] = [list(v) if isinstance(v, (list, tuple, np.ndarray)) else [] for v in df['strategies']]
+
+    path = partition_path(update_date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    df.to_parquet(tmp_path, index=False, compression='zstd')
+    os.replace(tmp_path, path)
+    return len(df)
+
+def read_partition(update_date, columns=None):
+    """读取一天的数据，本地没有该分区时返回 None"""
+    if not has_partition(update_date):
+        return None
+    read_columns = [c for c in columns if c != 'update_date'] if columns else None
+    try:
+        df = pd.read_parquet(partition_path(update_date), columns=read_columns)
+    except Exception as e:
+        print(f"⚠️ 读取本地分区 {update_date} 失败: {e}")
+        return None
+    df['update_date'] = update_date
+    return df
+
+def read_partitions(dates, columns=None):
+    """读取多天数据并合并，返回 (DataFrame, 本地缺失的日期列表)"""
+    frames, missing = [], []
+    for update_date in dates:
+        df = read_partition(update_date, columns)
+        if df is None:
+            missing.append(update_date)
+        else:
+            frames.append(df)
+    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return combined, missing
+
+def today():
+    """北京时间的当天日期，与获取脚本写入的 update_date 一致，不受机器时区影响"""
+    return datetime.now(BEIJING_TZ).strftime('%Y-%m-%d')
+
+def is_immutable(update_date):
+    """当天的数据可能被重跑覆盖，只有历史日期可以长期缓存"""
+    return str(update_date)[:10] < today()
+
+def query(sql):
+    """用 DuckDB 对全部本地分区执行 SQL，表名为 stocks"""
+    if duckdb is None:
+        raise RuntimeError('未安装 duckdb，请先执行 pip install duckdb')
+    pattern = os.path.join(LOCAL_STORE_DIR, f'{PARTITION_PREFIX}*', PARTITION_FILE)
+    con = duckdb.connect()
+    try:
+        con.execute(
+            f"CREATE VIEW stocks AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+        )
+        return con.execute(sql).df()
+    finally:
+        con.close()
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+
+    if command == 'list':
+        for update_date in list_partitions():
+            print(update_date)
+    elif command == 'sync':
+        from stockdb import StockRepository
+
+        repo = StockRepository.from_env(local_cache=True)
+        if repo is None:
+            print("❌ 未设置 Supabase 配置环境变量")
+            return 1
+        synced = repo.sync_local()
+        print(f"✅ 同步完成，共 {len(synced)} 个分区")
+    elif command == 'sql' and len(sys.argv) > 2:
+        print(query(sys.argv[2]).to_string())
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+运行指标：计时、计数和内存峰值，按 JSON lines 追加写入日志文件
+每行一个 JSON 对象，包含 ts（UTC 时间）、run_id、pipeline、type 和具体字段：
+    stage    流水线阶段（Pipeline.stage 自动写入）：耗时、行数、当前内存和进程内存峰值
+    span     阶段内更细的计时（快照各格式、追加数据集等）
+    event    单次事件：各策略的问财请求、数据库查询、通知发送
+    profile  性能分析结果（METRICS_PROFILE 开启时）
+    summary  运行结束时的汇总：计数器、关键路径耗时、内存峰值、CPU 时间
+默认写入 pipeline_metrics.log，GitHub Actions 按 *.log 随执行结果上传，可以跨天比较各阶段耗时。
+只依赖标准库，获取脚本启动时导入不增加开销；没有活动的 Metrics 时模块级函数什么都不做。
+
+用法:
+    python metrics.py pipeline_metrics.log [更多日志 ...]   # 按运行汇总各阶段耗时
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不记录内存峰值
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 指标日志路径，设为空字符串可关闭
+METRICS_LOG = os.getenv('METRICS_LOG', os.path.join(BASE_DIR, 'pipeline_metrics.log'))
+
+# 性能分析：cprofile / pyinstrument（需单独安装），为空时不分析
+METRICS_PROFILE = os.getenv('METRICS_PROFILE', '').strip().lower()
+
+# 性能分析结果写入日志的函数个数（按累计耗时排序）
+METRICS_PROFILE_TOP = int(os.getenv('METRICS_PROFILE_TOP', '30'))
+
+def new_run_id():
+    """本次运行的标识：STOCK_RUN_ID，未设置时为 UTC 时间 + GitHub Actions 运行号（或进程号）"""
+    run_id = os.getenv('STOCK_RUN_ID', '')
+    if run_id:
+        return run_id
+    suffix = os.getenv('GITHUB_RUN_ID') or str(os.getpid())
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{suffix}"
+
+def peak_rss_mb():
+    """进程启动以来的常驻内存峰值（MB），不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def rss_mb():
+    """当前常驻内存（MB），只在有 /proc 的系统上可用"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+
+def cpu_seconds():
+    times = os.times()
+    return {'user': round(times.user, 3), 'system': round(times.system, 3)}
+
+class Metrics:
+    """一次运行的指标：计数器在内存中累加，阶段和事件立即追加写入日志（中途失败也能保留）"""
+
+    def __init__(self, name='fetch_stock_data', path=METRICS_LOG, run_id=None):
+        self.name = name
+        self.path = path
+        self.run_id = run_id or new_run_id()
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def emit(self, kind, **fields):
+        """追加一行 JSON；写入失败只提示一次，之后不再写入"""
+        if not self.path:
+            return
+        line = {
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'run_id': self.run_id,
+            'pipeline': self.name,
+            'type': kind,
+            **fields,
+        }
+        text = json.dumps(line, ensure_ascii=False, default=str)
+        with self._lock:
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(text + '\n')
+            except OSError as e:
+                print(f"⚠️ 写入指标日志失败，不再记录: {e}")
+                self.path = ''
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+    @contextmanager
+    def span(self, name, **fields):
+        """计时一段代码；yield 的字典可以补充字段"""
+        record = {'name': name, **fields}
+        start = time.perf_counter()
+        try:
+            yield record
+            record['status'] = 'ok'
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = str(e)
+            raise
+        finally:
+            record['elapsed'] = round(time.perf_counter() - start, 4)
+            record['rss_mb'] = rss_mb()
+            record['peak_rss_mb'] = peak_rss_mb()
+            self.emit('span', **record)
+
+    def summary(self, **fields):
+        """写入汇总行，返回写入的内容"""
+        record = {
+            'counters': self.snapshot(),
+            'peak_rss_mb': peak_rss_mb(),
+            'cpu_seconds': cpu_seconds(),
+            'python': sys.version.split()[0],
+            'commit': os.getenv('GITHUB_SHA'),
+            **fields,
+        }
+        self.emit('summary', **record)
+        return record
+
+    @contextmanager
+    def profile(self, mode=METRICS_PROFILE):
+        """按 mode 对代码块做性能分析，结果文件与指标日志放在同一目录
+
+        cprofile：保存 .prof 文件（可用 snakeviz 等查看），累计耗时最高的函数写入日志；
+        pyinstrument：保存 HTML 报告，未安装时退回 cprofile。只分析当前线程。
+        """
+        if not mode:
+            yield
+            return
+        directory = os.path.dirname(os.path.abspath(self.path or METRICS_LOG))
+        stem = os.path.join(directory, f'profile_{self.run_id}')
+
+        if mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("⚠️ 未安装 pyinstrument，改用 cProfile")
+                mode = 'cprofile'
+            else:
+                profiler = Profiler()
+                profiler.start()
+                try:
+                    yield
+                finally:
+                    profiler.stop()
+                    self._save_profile(mode, f'{stem}.html', lambda path: _write_text(path, profiler.output_html()))
+                return
+
+        if mode != 'cprofile':
+            print(f"⚠️ 不支持的性能分析方式: {mode}")
+            yield
+            return
+
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._save_profile(mode, f'{stem}.prof', profiler.dump_stats, top=_top_functions(profiler))
+
+    def _save_profile(self, mode, path, save, **fields):
+        try:
+            save(path)
+        except Exception as e:
+            print(f"⚠️ 保存性能分析结果失败: {e}")
+            path = None
+        else:
+            print(f"🔬 性能分析结果已保存: {path}")
+        self.emit('profile', mode=mode, path=path, **fields)
+
+def _write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def _top_functions(profiler, limit=METRICS_PROFILE_TOP):
+    """cProfile 结果中累计耗时最高的函数"""
+    import pstats
+
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f'{os.path.relpath(filename, BASE_DIR) if filename.startswith(BASE_DIR) else filename}'
+                        f':{line}({function})',
+            'calls': calls,
+            'tottime': round(total, 4),
+            'cumtime': round(cumulative, 4),
+        })
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:limit]
+
+# ---- 当前运行的指标（Pipeline 创建时设置），供各模块直接记录 ----
+
+_active = None
+
+def activate(metrics):
+    global _active
+    _active = metrics
+    return metrics
+
+def active():
+    return _active
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+def event(kind, **fields):
+    if _active is not None:
+        _active.emit('event', event=kind, **fields)
+
+@contextmanager
+def span(name, **fields):
+    if _active is None:
+        yield {}
+        return
+    with _active.span(name, **fields) as record:
+        yield record
+
+# ---- 跨运行汇总 ----
+
+def read_runs(paths):
+    """读取指标日志，返回 {run_id: {'summary': ..., 'stages': {阶段: 耗时}}}（按出现顺序）"""
+    runs = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                run = runs.setdefault(item.get('run_id'), {'summary': None, 'stages': {}})
+                if item.get('type') == 'stage':
+                    run['stages'][item['name']] = item.get('elapsed')
+                elif item.get('type') == 'summary':
+                    run['summary'] = item
+    return runs
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    runs = read_runs(sys.argv[1:])
+    stage_names = []
+    for run in runs.values():
+        stage_names += [name for name in run['stages'] if name not in stage_names]
+
+    print(f"{'run_id':<34} {'total':>7} {'peak MB':>8} {'written':>8} " +
+          ' '.join(f'{name:>10}' for name in stage_names))
+    for run_id, run in runs.items():
+        summary = run['summary'] or {}
+        total = summary.get('elapsed')
+        written = summary.get('counters', {}).get('rows_written')
+        cells = [f"{run['stages'][name]:>10.2f}" if run['stages'].get(name) is not None else f"{'-':>10}"
+                 for name in stage_names]
+        print(f"{str(run_id):<34} {f'{total:.2f}' if total is not None else '-':>7} "
+              f"{summary.get('peak_rss_mb') or '-':>8} {written if written is not None else '-':>8} " +
+              ' '.join(cells))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+-- 0001 stocks 表索引精简
+-- 在 supabase_setup.sql 之后执行。stocks 表按日期追加写入、按日期读取：
+--   面板单日明细: WHERE update_date = ? ORDER BY code（分页）
+--   多日对比 / 回测: WHERE update_date IN (...) ORDER BY update_date, code，只取少数几列
+--   写入: upsert ON CONFLICT (code, update_date)，清理旧数据 WHERE update_date = ? AND code IN (...)
+-- 没有只按代码、价格、涨跌幅或策略过滤的查询（排序和策略筛选都在面板本地完成），
+-- 这些单列索引只增加每次 upsert 的写入量。
+
+CREATE TABLE IF NOT EXISTS public.schema_migrations (
+    version TEXT PRIMARY KEY,
+    applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 唯一键改为 (update_date, code)，按日期读取并按代码排序时直接走索引顺序；
+-- ON CONFLICT (code, update_date) 按列集合匹配唯一索引，与列顺序无关。
+-- INCLUDE 多日对比读取的列，这类查询可以只扫描索引
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stocks_date_code_unique
+ON public.stocks(update_date, code) INCLUDE (stock_name, latest_change_pct, auction_change_pct);
+
+-- 与唯一索引完全重复
+DROP INDEX IF EXISTS public.idx_stocks_code_date;
+-- 被新的唯一索引取代
+DROP INDEX IF EXISTS public.idx_stocks_code_date_unique;
+-- 被 (update_date, code) 的前缀覆盖
+DROP INDEX IF EXISTS public.idx_stocks_update_date;
+-- 没有对应的查询
+DROP INDEX IF EXISTS public.idx_stocks_code;
+DROP INDEX IF EXISTS public.idx_stocks_latest_price;
+DROP INDEX IF EXISTS public.idx_stocks_change_pct;
+DROP INDEX IF EXISTS public.idx_stocks_strategies;
+
+INSERT INTO public.schema_migrations (version) VALUES ('0001') ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,89 @@
+-- 0002 stocks 表按 update_date 月度范围分区
+-- 单日、多日查询只扫描涉及的月份分区；历史月份的分区不再有写入，索引和 VACUUM 的开销只在当月分区。
+-- 旧表改名为 stocks_unpartitioned 保留，确认数据无误后手动执行 DROP TABLE public.stocks_unpartitioned。
+-- 分区外的日期写入 stocks_default；获取脚本每次写入前调用 ensure_stock_partitions 补建未来三个月的分区
+-- （新分区的范围内不能已有 stocks_default 中的数据）。
+-- 已记录在 schema_migrations 中时跳过建表和迁移数据，可以重复执行。
+
+BEGIN;
+
+-- 创建 from_date 到 to_date 之间缺少的月度分区，返回新建的分区数
+-- StockRepository.write_day 写入 stocks 前通过 RPC 调用（写入日期到三个月后），以函数所有者的权限建表
+CREATE OR REPLACE FUNCTION public.ensure_stock_partitions(from_date DATE, to_date DATE)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_date)::DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= to_date LOOP
+        partition_name := format('stocks_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(format('public.%I', partition_name)) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.stocks FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::DATE
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+DO $migration$
+BEGIN
+IF NOT EXISTS (SELECT 1 FROM public.schema_migrations WHERE version = '0002') THEN
+    CREATE TABLE public.stocks_partitioned (
+        LIKE public.stocks INCLUDING DEFAULTS
+    ) PARTITION BY RANGE (update_date);
+
+    -- 分区表的主键必须包含分区键；与 0001 的唯一索引一致，同时覆盖多日对比读取的列
+    ALTER TABLE public.stocks_partitioned
+    ADD PRIMARY KEY (update_date, code) INCLUDE (stock_name, latest_change_pct, auction_change_pct);
+
+    ALTER TABLE public.stocks RENAME TO stocks_unpartitioned;
+    ALTER TABLE public.stocks_partitioned RENAME TO stocks;
+
+    -- id 的序列改由新表持有，删除旧表时不会一起删除
+    ALTER SEQUENCE public.stocks_id_seq OWNED BY public.stocks.id;
+
+    CREATE TABLE public.stocks_default PARTITION OF public.stocks DEFAULT;
+
+    -- 覆盖已有数据的月份和之后两年
+    PERFORM public.ensure_stock_partitions(
+        coalesce((SELECT min(update_date) FROM public.stocks_unpartitioned), CURRENT_DATE),
+        (CURRENT_DATE + INTERVAL '2 years')::DATE
+    );
+
+    INSERT INTO public.stocks SELECT * FROM public.stocks_unpartitioned;
+
+    -- 行级安全策略和更新时间触发器随旧表改名，在新表上重新创建
+    ALTER TABLE public.stocks ENABLE ROW LEVEL SECURITY;
+
+    CREATE POLICY "Enable read access for all users" ON public.stocks
+    FOR SELECT USING (true);
+
+    CREATE POLICY "Enable insert for service role" ON public.stocks
+    FOR INSERT WITH CHECK (true);
+
+    CREATE POLICY "Enable update for service role" ON public.stocks
+    FOR UPDATE USING (true);
+
+    CREATE TRIGGER update_stocks_updated_at
+        BEFORE UPDATE ON public.stocks
+        FOR EACH ROW
+        EXECUTE FUNCTION update_updated_at_column();
+END IF;
+END
+$migration$;
+
+INSERT INTO public.schema_migrations (version) VALUES ('0002') ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
+
+-- 表已替换，让 PostgREST 重新加载结构缓存
+NOTIFY pgrst, 'reload schema';
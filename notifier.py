@@ -0,0 +1,224 @@
+"""
+后台通知发送
+通知先放入队列立即返回，由后台线程发送，不阻塞获取和写库；
+短时间内连续到达的多条消息合并为一条发送，每个请求设置超时，瞬时错误退避重试，
+HTTP 请求复用同一个连接池。支持钉钉、通用 Webhook 和本地文件三种渠道，退出时输出发送统计。
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics as run_metrics
+from retries import with_retries
+
+# 钉钉机器人、通用 Webhook（POST JSON {"title", "text"}）、本地文件（追加写入）
+DINGTALK_WEBHOOK = os.getenv('DINGTALK_WEBHOOK', '')
+NOTIFY_WEBHOOK_URL = os.getenv('NOTIFY_WEBHOOK_URL', '')
+NOTIFY_FILE = os.getenv('NOTIFY_FILE', '')
+
+# 单个请求超时（秒）、最大重试次数、合并消息的等待窗口（秒）
+NOTIFY_TIMEOUT = float(os.getenv('NOTIFY_TIMEOUT', '5'))
+NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', '3'))
+NOTIFY_BATCH_WINDOW = float(os.getenv('NOTIFY_BATCH_WINDOW', '0.5'))
+
+# 钉钉文本消息长度上限约 20000 字节，合并时按字符数留出余量
+MAX_MESSAGE_CHARS = 6000
+
+MESSAGE_SEPARATOR = '\n\n——————\n\n'
+
+_STOP = object()
+
+def coalesce(messages, limit=MAX_MESSAGE_CHARS):
+    """去掉重复消息后按长度上限合并，返回合并后的消息列表"""
+    unique = list(dict.fromkeys(messages))
+    merged, current = [], ''
+    for message in unique:
+        candidate = f'{current}{MESSAGE_SEPARATOR}{message}' if current else message
+        if current and len(candidate) > limit:
+            merged.append(current)
+            current = message
+        else:
+            current = candidate
+    if current:
+        merged.append(current)
+    return merged
+
+class DingTalkChannel:
+    name = 'dingtalk'
+
+    def __init__(self, webhook):
+        self.webhook = webhook
+
+    def send(self, session, message, timeout):
+        data = {"msgtype": "text", "text": {"content": message}}
+        response = session.post(self.webhook, json=data, timeout=timeout)
+        response.raise_for_status()
+        # 钉钉出错时也返回 200，错误码在响应体里
+        result = response.json()
+        if result.get('errcode', 0) != 0:
+            raise RuntimeError(f"钉钉返回错误 {result.get('errcode')}: {result.get('errmsg')}")
+
+class WebhookChannel:
+    name = 'webhook'
+
+    def __init__(self, url):
+        self.url = url
+
+    def send(self, session, message, timeout):
+        title = message.strip().splitlines()[0] if message.strip() else ''
+        response = session.post(self.url, json={'title': title, 'text': message}, timeout=timeout)
+        response.raise_for_status()
+
+class FileChannel:
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, session, message, timeout):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]\n{message}\n\n")
+
+class Notifier:
+    """通知队列和后台发送线程，首次 notify 时才启动线程"""
+
+    def __init__(self, channels, timeout=NOTIFY_TIMEOUT, max_retries=NOTIFY_MAX_RETRIES,
+                 batch_window=NOTIFY_BATCH_WINDOW):
+        self.channels = list(channels)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.batch_window = batch_window
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._metrics = {'queued': 0, 'batches': 0, 'dropped': 0}
+        self._channel_metrics = {
+            channel.name: {'sent': 0, 'failed': 0, 'retries': 0, 'latency': 0.0, 'max_latency': 0.0}
+            for channel in self.channels
+        }
+
+    @classmethod
+    def from_env(cls):
+        channels = []
+        if DINGTALK_WEBHOOK:
+            channels.append(DingTalkChannel(DINGTALK_WEBHOOK))
+        if NOTIFY_WEBHOOK_URL:
+            channels.append(WebhookChannel(NOTIFY_WEBHOOK_URL))
+        if NOTIFY_FILE:
+            channels.append(FileChannel(NOTIFY_FILE))
+        return cls(channels)
+
+    def notify(self, message):
+        """放入发送队列后立即返回"""
+        if not self.channels:
+            print("通知渠道未配置，跳过通知")
+            return False
+        with self._lock:
+            if self._closed:
+                return False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='notifier', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            self._metrics['queued'] += 1
+        self._queue.put(message)
+        return True
+
+    def _run(self):
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        try:
+            stop = False
+            while not stop:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                # 等待一个短窗口，把同时完成的多个策略的消息合并发送
+                batch = [item]
+                wait_until = time.monotonic() + self.batch_window
+                while True:
+                    remaining = wait_until - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                for message in coalesce(batch):
+                    self._deliver(session, message)
+        finally:
+            session.close()
+
+    def _deliver(self, session, message):
+        with self._lock:
+            self._metrics['batches'] += 1
+        for channel in self.channels:
+            attempts = 0
+
+            def send():
+                nonlocal attempts
+                attempts += 1
+                channel.send(session, message, self.timeout)
+
+            start = time.perf_counter()
+            try:
+                with_retries(send, max_retries=self.max_retries)
+                ok = True
+                print(f"✅ 通知已发送 ({channel.name})")
+            except Exception as e:
+                ok = False
+                print(f"❌ 通知发送失败 ({channel.name}): {e}")
+            latency = time.perf_counter() - start
+            # metrics() 可能在其他线程读取，统计在锁内更新
+            with self._lock:
+                metrics = self._channel_metrics[channel.name]
+                metrics['sent' if ok else 'failed'] += 1
+                metrics['retries'] += attempts - 1
+                metrics['latency'] += latency
+                metrics['max_latency'] = max(metrics['max_latency'], latency)
+            run_metrics.event('notify', channel=channel.name, ok=ok, attempts=attempts,
+                              elapsed=round(latency, 4), chars=len(message))
+
+    def close(self, timeout=30):
+        """等待队列中的消息发送完（最多 timeout 秒），返回发送统计；可重复调用"""
+        with self._lock:
+            already_closed = self._closed
+            self._closed = True
+            thread = self._thread
+        if not already_closed and thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            if thread.is_alive():
+                # 超时仍未发送的消息直接丢弃，不拖住退出
+                with self._lock:
+                    self._metrics['dropped'] = max(0, self._queue.qsize() - 1)
+            self.print_metrics()
+        return self.metrics()
+
+    def metrics(self):
+        with self._lock:
+            result = dict(self._metrics)
+            result['channels'] = {name: dict(m) for name, m in self._channel_metrics.items()}
+        return result
+
+    def print_metrics(self):
+        metrics = self.metrics()
+        print(f"📨 通知统计: 入队 {metrics['queued']} 条, 合并后发送 {metrics['batches']} 批, "
+              f"丢弃 {metrics['dropped']} 条")
+        for name, m in metrics['channels'].items():
+            average = m['latency'] / max(1, m['sent'] + m['failed'])
+            print(f"   {name}: 成功 {m['sent']}, 失败 {m['failed']}, 重试 {m['retries']}, "
+                  f"平均耗时 {average:.2f}s, 最长 {m['max_latency']:.2f}s")
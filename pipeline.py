@@ -0,0 +1,182 @@
+"""
+获取任务流水线：分阶段计时与截止时间控制
+
+关键阶段（获取、映射、写库）按顺序在主线程执行并计时；
+非关键阶段（快照导出、通知）通过 defer 放到写库之后的后台线程执行，不占用关键路径。
+任务在截止时间（默认北京时间 09:29:30）之前启动时，获取阶段的超时会按剩余时间收紧，
+保证写库在开盘前完成；结束后输出 JSON 格式的计时报告。
+各阶段、计数器和内存峰值同时按 JSON lines 追加到指标日志（见 metrics.py）。
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import metrics as run_metrics
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+# 截止时间（北京时间 HH:MM[:SS]），设为空字符串表示不限制
+PIPELINE_DEADLINE = os.getenv('PIPELINE_DEADLINE', '09:29:30')
+
+# 为写库预留的时间（秒），获取阶段最多用到截止时间减去该值
+PIPELINE_WRITE_RESERVE = float(os.getenv('PIPELINE_WRITE_RESERVE', '20'))
+
+# 获取阶段按截止时间收紧时的最短超时（秒）：启动较晚、剩余时间不足时不再按截止时间限制，
+# 宁可晚一点写库，也不让全部策略超时导致当天没有数据
+MIN_FETCH_TIMEOUT = float(os.getenv('PIPELINE_MIN_FETCH_TIMEOUT', '30'))
+
+# 获取阶段的硬上限（秒）：没有截止时间或不按截止时间限制时，卡住的问财请求最多等待这么久
+PIPELINE_FETCH_MAX = float(os.getenv('PIPELINE_FETCH_MAX', '300'))
+
+# 计时报告输出目录
+PIPELINE_REPORT_DIR = os.getenv('PIPELINE_REPORT_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+def parse_deadline(text, now):
+    """解析当天的截止时间；启动时已过截止时间（手动补跑等）返回 None"""
+    if not text:
+        return None
+    parts = [int(p) for p in text.split(':')]
+    hour, minute, second = (parts + [0, 0])[:3]
+    now = now.astimezone(BEIJING_TZ)
+    deadline = now.replace(hour=hour, minute=minute, second=second, microsecond=0)
+    return deadline if deadline > now else None
+
+class Pipeline:
+    """记录各阶段耗时，管理截止时间和后台执行的非关键阶段"""
+
+    def __init__(self, name='fetch_stock_data', deadline=PIPELINE_DEADLINE, now=None, metrics=None):
+        self.name = name
+        # 各模块通过 metrics.count / metrics.event 记录到这次运行
+        self.metrics = run_metrics.activate(metrics or run_metrics.Metrics(name))
+        self.started_at = (now or datetime.now(BEIJING_TZ)).astimezone(BEIJING_TZ)
+        self.deadline = parse_deadline(deadline, self.started_at)
+        self.stages = []
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._background = []
+
+    def _offset(self):
+        return round(time.perf_counter() - self._t0, 4)
+
+    def remaining(self):
+        """距截止时间的剩余秒数，没有截止时间时返回 None"""
+        if self.deadline is None:
+            return None
+        return (self.deadline - datetime.now(BEIJING_TZ)).total_seconds()
+
+    def fetch_timeout(self):
+        """获取阶段的超时：剩余时间减去写库预留
+
+        没有截止时间，或剩余时间已不足 MIN_FETCH_TIMEOUT 时，返回硬上限 PIPELINE_FETCH_MAX
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return PIPELINE_FETCH_MAX
+        budget = remaining - PIPELINE_WRITE_RESERVE
+        if budget < MIN_FETCH_TIMEOUT:
+            print(f"⚠️ 距截止时间只剩 {remaining:.0f}s，获取阶段不再按截止时间限制"
+                  f"（最多等待 {PIPELINE_FETCH_MAX:.0f}s）")
+            return PIPELINE_FETCH_MAX
+        return min(budget, PIPELINE_FETCH_MAX)
+
+    @contextmanager
+    def stage(self, name, critical=True):
+        """计时一个阶段；yield 的字典可以补充行数等信息写入报告"""
+        record = {'name': name, 'critical': critical, 'start': self._offset()}
+        start = time.perf_counter()
+        try:
+            yield record
+            record['status'] = 'ok'
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = str(e)
+            raise
+        finally:
+            record['elapsed'] = round(time.perf_counter() - start, 4)
+            record['end'] = self._offset()
+            remaining = self.remaining()
+            record['before_deadline'] = remaining is None or remaining >= 0
+            record['rss_mb'] = run_metrics.rss_mb()
+            record['peak_rss_mb'] = run_metrics.peak_rss_mb()
+            with self._lock:
+                self.stages.append(record)
+            self.metrics.emit('stage', **record)
+
+    def count(self, name, n=1):
+        """累加计数器（行数等），写入报告和指标日志的汇总行"""
+        self.metrics.count(name, n)
+
+    def defer(self, name, func, *args, **kwargs):
+        """在后台线程执行非关键阶段，不阻塞关键路径"""
+        def run():
+            try:
+                with self.stage(name, critical=False):
+                    func(*args, **kwargs)
+            except Exception as e:
+                print(f"⚠️ 后台阶段 {name} 失败: {e}")
+
+        thread = threading.Thread(target=run, name=f'pipeline-{name}', daemon=True)
+        thread.start()
+        self._background.append(thread)
+        return thread
+
+    def finish(self, timeout=120):
+        """等待后台阶段结束（最多 timeout 秒），返回计时报告"""
+        wait_until = time.monotonic() + timeout
+        for thread in self._background:
+            thread.join(max(0.0, wait_until - time.monotonic()))
+        return self.report()
+
+    def report(self):
+        with self._lock:
+            stages = sorted(self.stages, key=lambda s: s['start'])
+        critical = [s for s in stages if s['critical']]
+        return {
+            'pipeline': self.name,
+            'started_at': self.started_at.isoformat(),
+            'deadline': self.deadline.isoformat() if self.deadline else None,
+            'elapsed': self._offset(),
+            'critical_path_seconds': max((s['end'] for s in critical), default=0.0),
+            'deadline_met': all(s['before_deadline'] for s in critical),
+            'pending_background': [t.name for t in self._background if t.is_alive()],
+            'run_id': self.metrics.run_id,
+            'counters': self.metrics.snapshot(),
+            'peak_rss_mb': run_metrics.peak_rss_mb(),
+            'stages': stages,
+        }
+
+    def log_summary(self, **fields):
+        """把计时报告（不含已逐条写入的阶段）和额外字段写入指标日志的汇总行"""
+        report = self.report()
+        report.pop('stages')
+        report.pop('counters')
+        report.pop('peak_rss_mb')
+        return self.metrics.summary(**report, **fields)
+
+    def write_report(self, directory=PIPELINE_REPORT_DIR):
+        """写入 JSON 计时报告，返回文件路径"""
+        report = self.report()
+        path = os.path.join(
+            directory, f"pipeline_report_{self.started_at.strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return path
+
+    def print_summary(self):
+        report = self.report()
+        print(f"⏱️ 阶段耗时 (关键路径 {report['critical_path_seconds']:.2f}s, 总计 {report['elapsed']:.2f}s):")
+        for s in report['stages']:
+            kind = '关键' if s['critical'] else '后台'
+            status = '✅' if s.get('status') == 'ok' else '❌'
+            peak = f", 内存峰值 {s['peak_rss_mb']:.0f}MB" if s.get('peak_rss_mb') else ''
+            print(f"   {status} [{kind}] {s['name']}: {s['elapsed']:.2f}s{peak}")
+        if report['deadline']:
+            state = '✅ 已在截止时间前完成' if report['deadline_met'] else '⚠️ 超过截止时间'
+            print(f"   截止时间 {report['deadline']}: {state}")
+        if report['counters']:
+            print(f"   计数: {', '.join(f'{k}={v}' for k, v in report['counters'].items())}")
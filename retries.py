@@ -0,0 +1,39 @@
+"""
+瞬时错误判断和退避重试
+写库（stock_writer）、读库（stockdb）和通知（notifier）共用；只依赖标准库，
+导入时不会带入数据库客户端
+"""
+
+import random
+import re
+import time
+
+# 默认最大重试次数（不含第一次尝试）
+DEFAULT_MAX_RETRIES = 3
+
+# 视为瞬时错误、可以重试的 HTTP 状态码和错误关键字
+TRANSIENT_STATUS = ('408', '425', '429', '500', '502', '503', '504')
+TRANSIENT_STATUS_PATTERN = re.compile(r'\b(' + '|'.join(TRANSIENT_STATUS) + r')\b')
+TRANSIENT_KEYWORDS = ('timeout', 'timed out', 'connection', 'temporarily', 'reset by peer')
+
+def is_transient_error(error):
+    """判断错误是否为可重试的瞬时错误（超时、连接中断、限流、5xx）"""
+    code = str(getattr(error, 'code', '') or '')
+    if code in TRANSIENT_STATUS:
+        return True
+    message = str(error).lower()
+    return bool(TRANSIENT_STATUS_PATTERN.search(message)) or \
+        any(keyword in message for keyword in TRANSIENT_KEYWORDS)
+
+def with_retries(func, max_retries=DEFAULT_MAX_RETRIES, backoff=0.5, max_backoff=8.0):
+    """执行 func，瞬时错误时按指数退避加随机抖动重试，返回 (结果, 尝试次数)"""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return func(), attempt
+        except Exception as e:
+            if attempt > max_retries or not is_transient_error(e):
+                raise
+            delay = min(max_backoff, backoff * (2 ** (attempt - 1)))
+            time.sleep(delay + random.uniform(0, delay / 2))
@@ -6,7 +6,7 @@
 echo "🔧 设置 Supabase 环境变量..."
 
 # 请将以下值替换为您的实际 Supabase 配置
-export SUPABASE_URL="https://jsnrbuzrtvxuysotstyh.supabase.co"
+export SUPABASE_URL="https://your-project-id.supabase.co"
 export SUPABASE_KEY="your-supabase-service-role-key-here"
 
 # 验证环境变量是否设置
@@ -0,0 +1,143 @@
+"""
+问财原始结果快照
+每次运行把各策略的原始结果（保留问财原始列名和类型）保存为快照文件，默认压缩 Parquet；
+Excel 只在 SNAPSHOT_FORMATS 中包含 xlsx 时生成，供人工查看。
+同时可以追加到按策略、日期分区的滚动数据集（data/wencai_raw/strategy=.../update_date=.../），
+方便日后回看某天各次运行的原始结果。
+
+格式对比见 benchmarks/bench_snapshot.py
+"""
+
+import os
+from datetime import datetime
+
+import pandas as pd
+
+import metrics
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 快照格式，逗号分隔：parquet / feather / xlsx
+SNAPSHOT_FORMATS = [
+    fmt.strip() for fmt in os.getenv('SNAPSHOT_FORMATS', 'parquet').split(',') if fmt.strip()
+]
+
+# 快照输出目录
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(BASE_DIR, 'snapshots'))
+
+# 滚动数据集目录，设为空字符串可关闭
+SNAPSHOT_DATASET_DIR = os.getenv('SNAPSHOT_DATASET_DIR', os.path.join(BASE_DIR, 'data', 'wencai_raw'))
+
+COMPRESSION = 'zstd'
+
+def arrow_safe(df):
+    """整数和浮点数混在一起的 object 列转为数值，数字和字符串等混合类型的列转为字符串，
+    其余列保持原类型"""
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind == 'mixed-integer-float':
+            df[col] = pd.to_numeric(df[col])
+        elif kind in ('mixed', 'mixed-integer'):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+def _write_parquet(raw_frames, current_date, directory):
+    paths = []
+    for name, res in raw_frames.items():
+        path = os.path.join(directory, f'stock_data_{current_date}_{name}.parquet')
+        arrow_safe(res).to_parquet(path, index=False, compression=COMPRESSION)
+        paths.append(path)
+    return paths
+
+def _write_feather(raw_frames, current_date, directory):
+    paths = []
+    for name, res in raw_frames.items():
+        path = os.path.join(directory, f'stock_data_{current_date}_{name}.feather')
+        arrow_safe(res).to_feather(path, compression=COMPRESSION)
+        paths.append(path)
+    return paths
+
+def _write_excel(raw_frames, current_date, directory):
+    """每个策略一个工作表"""
+    path = os.path.join(directory, f'stock_data_{current_date}.xlsx')
+    with pd.ExcelWriter(path) as writer:
+        for name, res in raw_frames.items():
+            res.to_excel(writer, sheet_name=name[:31], index=False)
+    return [path]
+
+# 格式 -> 写入函数 (raw_frames, current_date, directory) -> [路径]，可以注册新的格式
+SNAPSHOT_WRITERS = {
+    'parquet': _write_parquet,
+    'feather': _write_feather,
+    'xlsx': _write_excel,
+}
+
+def write_snapshots(raw_frames, current_date, formats=None, directory=None):
+    """按配置的格式写入快照，返回写入的文件路径；单个格式失败不影响其他格式"""
+    formats = SNAPSHOT_FORMATS if formats is None else formats
+    directory = directory or SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for fmt in formats:
+        writer = SNAPSHOT_WRITERS.get(fmt)
+        if writer is None:
+            print(f"⚠️ 不支持的快照格式: {fmt}")
+            continue
+        try:
+            with metrics.span(f'snapshot_{fmt}', rows=sum(len(res) for res in raw_frames.values())):
+                written = writer(raw_frames, current_date, directory)
+        except Exception as e:
+            print(f"⚠️ 保存 {fmt} 快照失败: {e}")
+            continue
+        for path in written:
+            print(f"📄 快照已保存: {path}")
+        paths.extend(written)
+    return paths
+
+def dataset_path(strategy, update_date, run_time):
+    return os.path.join(
+        SNAPSHOT_DATASET_DIR, f'strategy={strategy}', f'update_date={update_date}',
+        f"run-{run_time.strftime('%H%M%S')}.parquet"
+    )
+
+def append_to_dataset(raw_frames, current_date, run_time=None):
+    """把本次运行的原始结果追加到滚动数据集，每次运行一个文件，返回写入的路径"""
+    if not SNAPSHOT_DATASET_DIR:
+        return []
+    run_time = run_time or datetime.now()
+    paths = []
+    for name, res in raw_frames.items():
+        path = dataset_path(name, current_date, run_time)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        arrow_safe(res).to_parquet(tmp_path, index=False, compression=COMPRESSION)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+def read_dataset(strategy, update_date):
+    """读取某个策略某天全部运行的原始结果，run 列为运行时间（HHMMSS）"""
+    directory = os.path.dirname(dataset_path(strategy, update_date, datetime.now()))
+    if not os.path.isdir(directory):
+        return pd.DataFrame()
+    frames = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith('run-') and name.endswith('.parquet'):
+            df = pd.read_parquet(os.path.join(directory, name))
+            df['run'] = name[len('run-'):-len('.parquet')]
+            frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def save_snapshots(raw_frames, current_date):
+    """写入快照文件并追加到滚动数据集"""
+    paths = write_snapshots(raw_frames, current_date)
+    try:
+        with metrics.span('snapshot_dataset'):
+            paths.extend(append_to_dataset(raw_frames, current_date))
+    except Exception as e:
+        print(f"⚠️ 追加原始数据集失败: {e}")
+    return paths
@@ -0,0 +1,118 @@
+"""
+数据日期目录（stock_dates 表）
+获取脚本写入 stocks 后同步维护每天一行的汇总（行数、均值、分位数、按板块和策略的分组汇总），
+面板的日期列表、数据概览和多日趋势只需查询这张小表，不再下载每天的全部数据。
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+CATALOG_TABLE = 'stock_dates'
+
+# 目录查询的分页大小（PostgREST 默认单次最多返回 1000 行）
+PAGE_SIZE = 1000
+
+def _round(value):
+    return None if pd.isna(value) else round(float(value), 4)
+
+def _mean(series):
+    return _round(pd.to_numeric(series, errors='coerce').mean())
+
+def _numeric(frame, column):
+    if column not in frame.columns:
+        return pd.Series(np.nan, index=frame.index, dtype=float)
+    return pd.to_numeric(frame[column], errors='coerce')
+
+def _group_stats(changes, auctions, groups):
+    """按分组（板块、策略）汇总：{分组: {row_count, up_count, 均值, 中位数}}"""
+    data = pd.DataFrame({
+        'group': groups.to_numpy(),
+        'change': changes.to_numpy(dtype=float),
+        'auction': auctions.to_numpy(dtype=float),
+    }).dropna(subset=['group'])
+    data['up'] = data['change'] > 0
+    agg = data.groupby('group', sort=True).agg(
+        row_count=('up', 'size'),
+        up_count=('up', 'sum'),
+        avg_latest_change_pct=('change', 'mean'),
+        median_latest_change_pct=('change', 'median'),
+        avg_auction_change_pct=('auction', 'mean'),
+    )
+    return {
+        str(group): {
+            'row_count': int(row.row_count),
+            'up_count': int(row.up_count),
+            'avg_latest_change_pct': _round(row.avg_latest_change_pct),
+            'median_latest_change_pct': _round(row.median_latest_change_pct),
+            'avg_auction_change_pct': _round(row.avg_auction_change_pct),
+        }
+        for group, row in agg.iterrows()
+    }
+
+def summarize_day(frame, update_date):
+    """根据当天映射后的数据计算目录行：条数、涨跌家数、均值、分位数、按板块和策略的分组汇总"""
+    frame = frame.reset_index(drop=True)
+    changes = _numeric(frame, 'latest_change_pct')
+    auctions = _numeric(frame, 'auction_change_pct')
+    volume_ratios = _numeric(frame, 'volume_ratio')
+    p25, median, p75 = (_round(v) for v in changes.quantile([0.25, 0.5, 0.75]))
+
+    boards = frame['listing_board'].fillna('未知') \
+        if 'listing_board' in frame.columns else pd.Series('未知', index=frame.index)
+    if 'strategies' in frame.columns:
+        tags = frame['strategies'].explode().dropna()
+        strategy_stats = _group_stats(changes.loc[tags.index], auctions.loc[tags.index], tags.astype(str))
+    else:
+        strategy_stats = {}
+
+    return {
+        'update_date': update_date,
+        'row_count': int(len(frame)),
+        'up_count': int((changes > 0).sum()),
+        'down_count': int((changes < 0).sum()),
+        'avg_latest_change_pct': _mean(changes),
+        'median_latest_change_pct': median,
+        'p25_latest_change_pct': p25,
+        'p75_latest_change_pct': p75,
+        'avg_auction_change_pct': _mean(auctions),
+        'median_auction_change_pct': _round(auctions.median()),
+        'avg_volume_ratio': _mean(volume_ratios),
+        'board_stats': _group_stats(changes, auctions, boards),
+        'strategy_stats': strategy_stats,
+        'refreshed_at': datetime.now().astimezone().isoformat(),
+    }
+
+def upsert_date_summary(client, summary):
+    """写入/更新一天的目录行"""
+    client.table(CATALOG_TABLE).upsert(summary, on_conflict='update_date').execute()
+
+def fetch_date_catalog(client, columns='*'):
+    """读取全部目录行，按日期倒序"""
+    rows, offset = [], 0
+    while True:
+        response = client.table(CATALOG_TABLE).select(columns) \
+            .order('update_date', desc=True).range(offset, offset + PAGE_SIZE - 1).execute()
+        rows.extend(response.data or [])
+        if len(response.data or []) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
+
+def catalog_frame(rows):
+    """目录行 -> 按日期升序的 DataFrame（趋势图用）"""
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    return df.sort_values('update_date').reset_index(drop=True)
+
+def fetch_available_dates(client):
+    """可用数据日期列表，按日期倒序；目录表为空时退回服务端分组查询"""
+    rows = fetch_date_catalog(client, 'update_date')
+    if not rows:
+        rows = client.rpc('get_stock_dates', {}).execute().data or []
+    return [row['update_date'] for row in rows]
+
+def rebuild_date_catalog(client):
+    """根据 stocks 表重建目录（调用 supabase_setup.sql 中的 refresh_stock_dates 函数）"""
+    return client.rpc('refresh_stock_dates', {}).execute().data
@@ -0,0 +1,89 @@
+"""
+多日对比分析
+把一段日期内的每日筛选结果装入 (股票代码 × 日期) 的透视表，一次构建后计算：
+重复入选次数、首次 / 最近入选日期、连续入选天数，以及个股的涨跌幅时间序列。
+数据由 stockdb.StockRepository.range_rows 读取：优先本地分区，缺失的日期按批用 update_date in (...) 查询。
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# 多日对比需要的列
+RANGE_COLUMNS = ['update_date', 'code', 'stock_name', 'latest_change_pct', 'auction_change_pct']
+
+# dates: 日期字符串列表；names: 代码 -> 最近一次的股票名称；
+# present: 代码 × 日期 bool 表；latest_change / auction_change: 代码 × 日期 float 表（未入选为 NaN）
+RangePivot = namedtuple('RangePivot', ['dates', 'names', 'present', 'latest_change', 'auction_change'])
+
+def build_pivot(history, dates):
+    """长表 -> RangePivot，日期轴为 dates（升序）"""
+    dates = sorted(dates)
+    history = history.dropna(subset=['code', 'update_date']).copy()
+    history['update_date'] = history['update_date'].astype(str).str[:10]
+    history = history[history['update_date'].isin(dates)]
+    history = history.sort_values('update_date').drop_duplicates(['update_date', 'code'], keep='last')
+
+    raw_codes = history['code'].to_numpy(dtype='int64')
+    codes = np.sort(pd.unique(raw_codes))
+    rows = pd.Index(codes).get_indexer(raw_codes)
+    cols = pd.Index(dates).get_indexer(history['update_date'].to_numpy(dtype=object))
+    shape = (len(codes), len(dates))
+
+    present = np.zeros(shape, dtype=bool)
+    present[rows, cols] = True
+
+    def matrix(column):
+        values = np.full(shape, np.nan)
+        if column in history.columns:
+            values[rows, cols] = pd.to_numeric(history[column], errors='coerce').to_numpy(dtype='float64')
+        return pd.DataFrame(values, index=codes, columns=dates)
+
+    names = history.groupby('code')['stock_name'].last() if 'stock_name' in history.columns \
+        else pd.Series(dtype=object)
+    return RangePivot(
+        dates=dates,
+        names=names.reindex(codes),
+        present=pd.DataFrame(present, index=codes, columns=dates),
+        latest_change=matrix('latest_change_pct'),
+        auction_change=matrix('auction_change_pct'),
+    )
+
+def streaks(present):
+    """每只股票的 (最长连续入选天数, 截至最后一天的连续入选天数)，按日期逐列向量化计算"""
+    current = np.zeros(present.shape[0], dtype=np.int32)
+    longest = np.zeros(present.shape[0], dtype=np.int32)
+    for column in present.T:
+        current = (current + 1) * column
+        np.maximum(longest, current, out=longest)
+    return longest, current
+
+def recurrence(pivot):
+    """每只股票的入选天数、占比、首次 / 最近入选日期和连续入选天数，按入选天数降序"""
+    present = pivot.present.to_numpy()
+    if present.size == 0:
+        return pd.DataFrame(columns=['stock_name', 'days', 'ratio', 'first_seen', 'last_seen',
+                                     'longest_streak', 'current_streak'])
+    dates = np.array(pivot.dates, dtype=object)
+    days = present.sum(axis=1)
+    longest, current = streaks(present)
+    table = pd.DataFrame({
+        'stock_name': pivot.names.to_numpy(),
+        'days': days,
+        'ratio': days / len(dates),
+        'first_seen': dates[present.argmax(axis=1)],
+        'last_seen': dates[len(dates) - 1 - present[:, ::-1].argmax(axis=1)],
+        'longest_streak': longest,
+        'current_streak': current,
+    }, index=pivot.present.index.rename('code'))
+    return table.sort_values(['days', 'longest_streak', 'last_seen'], ascending=False)
+
+def daily_counts(pivot, table=None):
+    """每天的入选数量和其中首次入选（区间内）的数量"""
+    table = recurrence(pivot) if table is None else table
+    first = table['first_seen'].value_counts()
+    return pd.DataFrame({
+        'selected': pivot.present.sum(axis=0),
+        'new': first.reindex(pivot.dates, fill_value=0),
+    }, index=pivot.dates)
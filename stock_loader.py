@@ -0,0 +1,193 @@
+"""
+股票数据分页加载
+只请求当前视图需要的列，按 code 排序分页读取一天（或按 update_date in 批量读取多天）的数据，
+逐页填入预分配的数组并转换为紧凑的 dtype，同时统计传输字节数
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# 每页请求行数；服务端 max-rows 更小时按实际返回的行数继续翻页
+PAGE_SIZE = 1000
+
+# 多天读取时每个 in 查询包含的日期数，避免 URL 过长
+DATES_PER_REQUEST = 60
+
+# 列 -> 加载后的 dtype，未列出的列保持 object
+COLUMN_DTYPES = {
+    'code': 'int32',
+    'latest_price': 'float32',
+    'latest_change_pct': 'float32',
+    'auction_change_pct': 'float32',
+    'pe_ttm': 'float32',
+    'pe': 'float32',
+    'dde_large_order': 'float32',
+    'volume_ratio': 'float32',
+    'interval_change_13d': 'float32',
+    'interval_change_5d': 'float32',
+    'forecast_pe_1y': 'float32',
+    'forecast_pe_2y': 'float32',
+    'forecast_pe_3y': 'float32',
+    'eps': 'float32',
+    'gross_margin': 'float32',
+    'net_margin': 'float32',
+    'auction_price': 'float32',
+    'market_cap': 'float64',
+    'listing_days': 'Int32',
+    'market_code': 'Int32',
+    'auction_volume': 'Int64',
+    'auction_amount': 'Int64',
+    'listing_board': 'category',
+    'auction_type': 'category',
+    'auction_rating': 'category',
+}
+
+# 每个线程累计的响应字节数（同步客户端的响应钩子在发起请求的线程中执行）
+_transfer = threading.local()
+
+def _count_response_bytes(response):
+    response.read()
+    _transfer.bytes = getattr(_transfer, 'bytes', 0) + response.num_bytes_downloaded
+
+def install_transfer_counter(client):
+    """在 Supabase 客户端的 HTTP 会话上挂载字节计数钩子，重复调用不会重复挂载"""
+    try:
+        hooks = client.postgrest.session.event_hooks
+    except AttributeError:
+        return False
+    if _count_response_bytes not in hooks['response']:
+        hooks['response'] = hooks['response'] + [_count_response_bytes]
+        client.postgrest.session.event_hooks = hooks
+    return True
+
+def _transferred_bytes():
+    return getattr(_transfer, 'bytes', 0)
+
+def _allocate(column, size):
+    dtype = COLUMN_DTYPES.get(column)
+    if dtype in ('float32', 'float64', 'Int32', 'Int64'):
+        # 可空整数先以浮点数组接收，最后再转换
+        return np.full(size, np.nan, dtype='float32' if dtype == 'float32' else 'float64')
+    if dtype == 'int32':
+        return np.zeros(size, dtype='int32')
+    return np.empty(size, dtype=object)
+
+def _grow(arrays, size):
+    for column, array in arrays.items():
+        extra = _allocate(column, size - len(array))
+        arrays[column] = np.concatenate([array, extra])
+
+def _finalize(arrays, size):
+    data = {}
+    for column, array in arrays.items():
+        array = array[:size]
+        dtype = COLUMN_DTYPES.get(column)
+        if dtype in ('Int32', 'Int64'):
+            data[column] = pd.array(np.round(array), dtype=dtype) if size else pd.array([], dtype=dtype)
+        elif dtype == 'category':
+            data[column] = pd.Categorical(array)
+        else:
+            data[column] = array
+    return pd.DataFrame(data)
+
+def _load_pages(client, table, columns, page_size, where, order):
+    """按 where 过滤、order 排序分页读取，返回 (DataFrame, 统计信息)
+
+    columns 为空时读取全部列；首页同时请求精确总数，用于预分配数组并判断是否读完，
+    避免服务端单次返回行数上限导致数据被截断。
+    """
+    select = ','.join(columns) if columns else '*'
+    counting = install_transfer_counter(client)
+    start_bytes = _transferred_bytes()
+    start = time.perf_counter()
+
+    arrays = None
+    total = None
+    offset = pages = 0
+    while True:
+        query = where(client.table(table).select(select, count='exact' if pages == 0 else None))
+        for column in order:
+            query = query.order(column)
+        response = query.range(offset, offset + page_size - 1).execute()
+        rows = response.data or []
+        if pages == 0:
+            total = response.count
+        pages += 1
+        if not rows:
+            break
+
+        end = offset + len(rows)
+        if arrays is None:
+            names = list(columns) if columns else list(rows[0].keys())
+            arrays = {column: _allocate(column, max(total or 0, end)) for column in names}
+        elif end > len(arrays[next(iter(arrays))]):
+            # 翻页期间有新数据写入时扩容
+            _grow(arrays, max(end, 2 * len(arrays[next(iter(arrays))])))
+        for column, array in arrays.items():
+            array[offset:end] = [row.get(column) for row in rows]
+        offset = end
+
+        # 有总数时读满即止；拿不到总数时一直读到空页
+        if total is not None and offset >= total:
+            break
+
+    df = _finalize(arrays, offset) if arrays else pd.DataFrame(columns=list(columns or []))
+    stats = {
+        'source': 'supabase',
+        'rows': offset,
+        'pages': pages,
+        'bytes': _transferred_bytes() - start_bytes if counting else None,
+        'elapsed': time.perf_counter() - start,
+    }
+    return df, stats
+
+def load_stocks_by_date(client, update_date, columns=None, page_size=PAGE_SIZE, table='stocks'):
+    """分页读取一天的数据，返回 (DataFrame, 统计信息)"""
+    return _load_pages(client, table, columns, page_size,
+                       where=lambda q: q.eq('update_date', update_date), order=('code',))
+
+def load_stocks_by_dates(client, dates, columns=None, page_size=PAGE_SIZE, table='stocks',
+                         batch_dates=DATES_PER_REQUEST):
+    """读取多天的数据：每批日期用一个 update_date in (...) 查询分页读取，而不是每天一个请求
+
+    返回 (DataFrame, 合计统计信息)，结果包含 update_date 列。
+    """
+    if columns and 'update_date' not in columns:
+        columns = ['update_date'] + list(columns)
+    dates = sorted(dates)
+    frames = []
+    totals = {'source': 'supabase', 'rows': 0, 'pages': 0, 'bytes': 0, 'elapsed': 0.0}
+    for i in range(0, len(dates), batch_dates):
+        batch = dates[i:i + batch_dates]
+        df, stats = _load_pages(client, table, columns, page_size,
+                                where=lambda q, batch=batch: q.in_('update_date', batch),
+                                order=('update_date', 'code'))
+        frames.append(df)
+        for key in ('rows', 'pages', 'elapsed'):
+            totals[key] += stats[key]
+        totals['bytes'] = None if stats['bytes'] is None or totals['bytes'] is None \
+            else totals['bytes'] + stats['bytes']
+    frames = [f for f in frames if not f.empty]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(columns or []))
+    return df, totals
+
+def apply_dtypes(df):
+    """把本地或其他来源读入的数据转换为同样的紧凑 dtype"""
+    for column, dtype in COLUMN_DTYPES.items():
+        if column not in df.columns:
+            continue
+        try:
+            if dtype == 'category':
+                df[column] = df[column].astype('category')
+            elif dtype == 'int32':
+                df[column] = pd.to_numeric(df[column], errors='coerce').astype('int32')
+            elif dtype in ('Int32', 'Int64'):
+                df[column] = pd.to_numeric(df[column], errors='coerce').round().astype(dtype)
+            else:
+                df[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+        except (TypeError, ValueError):
+            pass
+    return df
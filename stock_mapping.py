@@ -0,0 +1,120 @@
+"""
+问财数据列映射
+每个 DataFrame 只解析一次目标字段对应的源列，再按列批量生成入库数据
+"""
+
+import pandas as pd
+
+from column_plan import get_column_plan
+
+# 股票代码、名称的候选列（精确匹配）
+CODE_COLUMNS = ['代码', '股票代码', '证券代码', 'code']
+NAME_COLUMNS = ['股票简称', '证券简称', 'name']
+
+# 区间涨跌幅列的公共前缀
+INTERVAL_CHANGE_PREFIX = '区间涨跌幅:前复权'
+
+# 目标字段 -> (匹配方式, 候选列名/模式)，列名均先去掉 [日期] 后缀再匹配
+# exact: 基础列名精确匹配；fuzzy: 基础列名包含该模式
+# interval_long / interval_short: 取日期跨度较长/较短的区间涨跌幅列
+# forecast:N: 预测年份为运行年份 + N 的预测列
+FIELD_SPECS = [
+    ('latest_price', 'exact', ['最新价', '现价', 'price']),
+    ('latest_change_pct', 'exact', ['最新涨跌幅', '涨跌幅', '涨跌幅(%)']),
+    ('listing_board', 'exact', ['上市板块', '板块']),
+    ('auction_change_pct', 'fuzzy', ['竞价涨幅']),
+    ('pe_ttm', 'fuzzy', ['市盈率(pe,ttm)']),
+    ('pe', 'fuzzy', ['市盈率(pe)']),
+    ('dde_large_order', 'fuzzy', ['dde大单净量']),
+    ('volume_ratio', 'fuzzy', ['分时量比']),
+    ('interval_change_13d', 'interval_long', [INTERVAL_CHANGE_PREFIX]),
+    ('interval_change_5d', 'interval_short', [INTERVAL_CHANGE_PREFIX]),
+    ('listing_days', 'fuzzy', ['上市天数']),
+    ('forecast_pe_1y', 'forecast:0', ['预测市盈率(pe,最新预测)']),
+    ('forecast_pe_2y', 'forecast:1', ['预测市盈率(pe,最新预测)']),
+    ('forecast_pe_3y', 'forecast:2', ['预测市盈率(pe,最新预测)']),
+    ('market_cap', 'fuzzy', ['总市值']),
+    ('eps', 'exact', ['基本每股收益', 'EPS']),
+    ('gross_margin', 'exact', ['销售毛利率', '毛利率']),
+    ('net_margin', 'exact', ['销售净利率', '净利率']),
+    ('auction_price', 'fuzzy', ['竞价匹配价']),
+    ('auction_type', 'fuzzy', ['竞价异动类型']),
+    ('auction_desc', 'fuzzy', ['竞价异动说明']),
+    ('auction_rating', 'fuzzy', ['集合竞价评级']),
+    ('auction_volume', 'fuzzy', ['竞价量']),
+    ('auction_amount', 'exact', ['竞价金额', '竞价成交额']),
+    ('market_code', 'exact', ['market_code']),
+]
+
+# 文本字段，其余字段均按数值处理
+TEXT_FIELDS = {'listing_board', 'auction_type', 'auction_desc', 'auction_rating'}
+
+# 对应数据库中 INTEGER / BIGINT 类型的字段
+INTEGER_FIELDS = {'listing_days', 'auction_volume', 'auction_amount', 'market_code'}
+
+# 列映射计划使用的全部字段规则（含代码、名称）
+PLAN_SPECS = [
+    ('code', 'exact', CODE_COLUMNS),
+    ('stock_name', 'exact', NAME_COLUMNS),
+] + FIELD_SPECS
+
+def resolve_columns(columns, run_date=None, use_cache=True):
+    """为每个目标字段解析候选源列，返回 {字段: [源列, ...]}，按优先级排列"""
+    return get_column_plan(columns, PLAN_SPECS, run_date, use_cache=use_cache)
+
+def coalesce(df, source_columns):
+    """按优先级逐行取第一个非空值，与逐行查找候选列的结果一致"""
+    if not source_columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    result = df[source_columns[0]]
+    for col in source_columns[1:]:
+        result = result.combine_first(df[col])
+    return result
+
+def clean_code_series(series):
+    """批量清理股票代码并转为整数，无法转换的置为空"""
+    cleaned = series.astype(str).str.replace(r'\.(SH|SZ|BJ)', '', regex=True).str.strip()
+    codes = pd.to_numeric(cleaned.where(series.notna()), errors='coerce')
+    # 只保留整数代码
+    codes = codes.where(codes == codes.round())
+    return codes.astype('Int64')
+
+def map_stock_frame(df, update_date, plan=None):
+    """将问财 DataFrame 映射为 stocks 表结构的 DataFrame（已过滤无效行）"""
+    plan = plan if plan is not None else resolve_columns(df.columns, run_date=update_date)
+
+    out = pd.DataFrame(index=df.index)
+    out['code'] = clean_code_series(coalesce(df, plan['code']))
+
+    names = coalesce(df, plan['stock_name'])
+    out['stock_name'] = names.astype(str).where(names.notna(), '')
+
+    for field, _, _ in FIELD_SPECS:
+        values = coalesce(df, plan[field])
+        if field in TEXT_FIELDS:
+            out[field] = values.astype(str).where(values.notna(), None)
+        elif field in INTEGER_FIELDS:
+            out[field] = pd.to_numeric(values, errors='coerce').round().astype('Int64')
+        else:
+            out[field] = pd.to_numeric(values, errors='coerce')
+
+    out['update_date'] = update_date
+
+    # 过滤没有代码或名称的行
+    out = out[out['code'].notna() & (out['stock_name'] != '')]
+    return out.reset_index(drop=True)
+
+def frame_to_records(frame):
+    """DataFrame 转为可 JSON 序列化的字典列表，空值转为 None"""
+    if frame.empty:
+        return []
+    columns = list(frame.columns)
+    values = [
+        frame[col].astype(object).where(frame[col].notna(), None).tolist()
+        for col in columns
+    ]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+def build_stock_records(df, update_date):
+    """问财 DataFrame -> 待插入的字典列表"""
+    return frame_to_records(map_stock_frame(df, update_date))
@@ -0,0 +1,308 @@
+"""
+stocks 表的列式记录批次
+按 supabase_setup.sql 中 stocks 表的列类型（DECIMAL 精度、INTEGER / BIGINT 范围）整列校验和转换，
+写库前发现非有限值和超出精度的数值：必填列（代码、名称、日期）无效的行整行剔除并记录原因，
+可为空的列置为 NULL 并按列计数。批次按列保存为 numpy 数组，按块直接编码为紧凑 JSON，
+不为每行创建字典。
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，只用于加快文本列的编码
+    orjson = None
+
+# kind: integer / bigint / decimal / text / text[] / date；decimal 的 precision、scale 与建表语句一致
+ColumnType = namedtuple('ColumnType', ['kind', 'precision', 'scale'])
+
+def _decimal(precision, scale):
+    return ColumnType('decimal', precision, scale)
+
+INTEGER = ColumnType('integer', None, None)
+BIGINT = ColumnType('bigint', None, None)
+TEXT = ColumnType('text', None, None)
+
+# 与 supabase_setup.sql 中的 stocks 表一致（id、created_at 由数据库生成）
+STOCKS_SCHEMA = {
+    'code': INTEGER,
+    'stock_name': TEXT,
+    'latest_price': _decimal(10, 4),
+    'latest_change_pct': _decimal(8, 4),
+    'listing_board': TEXT,
+    'auction_change_pct': _decimal(8, 4),
+    'pe_ttm': _decimal(10, 4),
+    'pe': _decimal(10, 4),
+    'dde_large_order': _decimal(15, 4),
+    'volume_ratio': _decimal(10, 4),
+    'interval_change_13d': _decimal(8, 4),
+    'interval_change_5d': _decimal(8, 4),
+    'listing_days': INTEGER,
+    'forecast_pe_1y': _decimal(10, 4),
+    'forecast_pe_2y': _decimal(10, 4),
+    'forecast_pe_3y': _decimal(10, 4),
+    'market_cap': _decimal(20, 4),
+    'eps': _decimal(10, 6),
+    'gross_margin': _decimal(8, 4),
+    'net_margin': _decimal(8, 4),
+    'auction_price': _decimal(10, 4),
+    'auction_type': TEXT,
+    'auction_desc': TEXT,
+    'auction_rating': TEXT,
+    'auction_volume': BIGINT,
+    'auction_amount': BIGINT,
+    'market_code': INTEGER,
+    'update_date': ColumnType('date', None, None),
+    'strategies': ColumnType('text[]', None, None),
+}
+
+# NOT NULL 的列，无效时整行剔除
+REQUIRED_COLUMNS = ('code', 'stock_name', 'update_date')
+
+INTEGER_LIMITS = {
+    'integer': 2 ** 31 - 1,
+    'bigint': 2 ** 63 - 1,
+}
+
+# float64 能精确表示的最大整数，浮点输入的整数列超过该值视为无效
+_EXACT_FLOAT_INT = 2 ** 53
+
+def _dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value).decode('utf-8')
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def _check_decimal(series, column_type):
+    """返回 (数值数组, 空值掩码, 无效掩码, 原因)；数值已按 scale 四舍五入"""
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    limit = 10.0 ** (column_type.precision - column_type.scale)
+    with np.errstate(invalid='ignore'):
+        rounded = np.round(values, column_type.scale)
+        invalid = ~np.isnan(values) & ~(np.abs(rounded) < limit)
+    reason = f'超出 DECIMAL({column_type.precision},{column_type.scale}) 范围或非有限值'
+    return rounded, np.isnan(values) | invalid, invalid, reason
+
+def _check_integer(series, column_type):
+    numeric = pd.to_numeric(series, errors='coerce')
+    missing = numeric.isna().to_numpy()
+    limit = INTEGER_LIMITS[column_type.kind]
+    if pd.api.types.is_integer_dtype(numeric.dtype):
+        values = numeric.to_numpy(dtype='int64', na_value=0)
+        invalid = ~missing & ((values > limit) | (values < -limit))
+    else:
+        floats = np.round(numeric.to_numpy(dtype='float64', na_value=np.nan))
+        with np.errstate(invalid='ignore'):
+            invalid = ~missing & ~(np.abs(floats) <= min(limit, _EXACT_FLOAT_INT))
+        values = np.where(missing | invalid, 0, floats).astype('int64')
+    return values, missing | invalid, invalid, f'超出 {column_type.kind.upper()} 范围或非有限值'
+
+def _check_text(series, _):
+    missing = series.isna().to_numpy()
+    values = series.astype(str).to_numpy(dtype=object)
+    return values, missing, np.zeros(len(series), dtype=bool), ''
+
+def _check_text_array(series, _):
+    # TEXT[] NOT NULL DEFAULT '{}'：空值写为空数组
+    values = np.empty(len(series), dtype=object)
+    values[:] = [list(v) if isinstance(v, (list, tuple, np.ndarray)) else [] for v in series.tolist()]
+    return values, np.zeros(len(series), dtype=bool), np.zeros(len(series), dtype=bool), ''
+
+def _check_date(series, _):
+    parsed = pd.to_datetime(series.astype(str).str[:10], format='%Y-%m-%d', errors='coerce')
+    missing = parsed.isna().to_numpy()
+    values = parsed.dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+    return values, missing, missing & series.notna().to_numpy(), '日期格式错误'
+
+CHECKS = {
+    'integer': _check_integer,
+    'bigint': _check_integer,
+    'decimal': _check_decimal,
+    'text': _check_text,
+    'text[]': _check_text_array,
+    'date': _check_date,
+}
+
+def _fragments(values, nulls, kind):
+    """一列数值 -> JSON 片段列表"""
+    if not len(values):
+        return []
+    if kind in ('decimal', 'integer', 'bigint'):
+        # 数值列整列编码一次再按逗号切分，避免逐个调用 repr
+        out = json.dumps(values.tolist(), separators=(',', ':'))[1:-1].split(',')
+    elif kind in ('text', 'date'):
+        # 板块、评级、日期等重复值多，每个不同的值只编码一次
+        codes, uniques = pd.factorize(values)
+        encoded = [_dumps(value) for value in uniques.tolist()] + ['null']
+        out = list(map(encoded.__getitem__, codes.tolist()))
+    else:
+        out = list(map(_dumps, values.tolist()))
+    if nulls.any():
+        for index in np.flatnonzero(nulls).tolist():
+            out[index] = 'null'
+    return out
+
+class BatchChunk:
+    """批次中连续的一段行，发送时才编码"""
+
+    __slots__ = ('batch', 'start', 'stop')
+
+    def __init__(self, batch, start, stop):
+        self.batch = batch
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    @property
+    def columns(self):
+        return self.batch.columns
+
+    def encode(self):
+        return self.batch.encode(self.start, self.stop)
+
+class StockBatch:
+    """按列保存的一批已校验的 stocks 行
+
+    values / nulls: 列 -> numpy 数组；rejected: [{'row', 'code', 'stock_name', 'reasons'}]；
+    nulled: 列 -> (置为 NULL 的个数, 原因)
+    """
+
+    __slots__ = ('columns', 'schema', 'values', 'nulls', 'rejected', 'nulled', 'size')
+
+    def __init__(self, columns, schema, values, nulls, rejected=None, nulled=None):
+        self.columns = columns
+        self.schema = schema
+        self.values = values
+        self.nulls = nulls
+        self.rejected = rejected or []
+        self.nulled = nulled or {}
+        self.size = len(values[columns[0]]) if columns else 0
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_frame(cls, frame, schema=STOCKS_SCHEMA, key='code'):
+        """整列校验和转换映射后的 DataFrame；同一代码出现多次时保留最后一行"""
+        columns = [column for column in schema if column in frame.columns]
+        frame = frame.reset_index(drop=True)
+        size = len(frame)
+        values, nulls, nulled = {}, {}, {}
+        reasons = [[] for _ in range(size)]
+        rejected_mask = np.zeros(size, dtype=bool)
+
+        for column in columns:
+            column_type = schema[column]
+            series = frame[column]
+            data, null, invalid, reason = CHECKS[column_type.kind](series, column_type)
+            if column in REQUIRED_COLUMNS:
+                if column_type.kind == 'text':
+                    null = null | (series.astype(str).str.strip() == '').to_numpy()
+                for index in np.flatnonzero(null).tolist():
+                    reasons[index].append(f'{column}: {reason if invalid[index] else "为空"}')
+                rejected_mask |= null
+            elif invalid.any():
+                nulled[column] = (int(invalid.sum()), reason)
+            values[column], nulls[column] = data, null
+
+        keep = ~rejected_mask
+        if key in columns:
+            # 同一批次内代码重复会导致 upsert 冲突，保留最后出现的一行
+            keep &= ~pd.Series(values[key]).where(keep).duplicated(keep='last').to_numpy()
+
+        rejected = [
+            {'row': index, 'code': frame[key].iloc[index] if key in frame.columns else None,
+             'stock_name': frame['stock_name'].iloc[index] if 'stock_name' in frame.columns else None,
+             'reasons': reasons[index]}
+            for index in np.flatnonzero(rejected_mask).tolist()
+        ]
+        return cls(columns, schema,
+                   {column: array[keep] for column, array in values.items()},
+                   {column: array[keep] for column, array in nulls.items()},
+                   rejected, nulled)
+
+    def codes(self, column='code'):
+        return self.values[column].tolist() if column in self.values else []
+
+    def chunks(self, size):
+        size = max(1, int(size))
+        return [BatchChunk(self, start, min(start + size, self.size)) for start in range(0, self.size, size)]
+
+    def select(self, mask):
+        """按布尔掩码取出部分行，返回新的批次"""
+        mask = np.asarray(mask, dtype=bool)
+        return StockBatch(self.columns, self.schema,
+                          {column: array[mask] for column, array in self.values.items()},
+                          {column: array[mask] for column, array in self.nulls.items()})
+
+    def with_columns(self, **columns):
+        """追加文本列（标量或与行数等长的序列），返回新的批次"""
+        values, nulls, schema = dict(self.values), dict(self.nulls), dict(self.schema)
+        for column, data in columns.items():
+            array = np.empty(self.size, dtype=object)
+            array[:] = data if isinstance(data, (list, tuple, np.ndarray)) else [data] * self.size
+            values[column] = array
+            nulls[column] = np.zeros(self.size, dtype=bool)
+            schema[column] = TEXT
+        return StockBatch(self.columns + [c for c in columns if c not in self.columns], schema, values, nulls)
+
+    def _rows(self, start, stop):
+        """[start, stop) 行各自的 JSON 对象文本"""
+        fragments = [
+            _fragments(self.values[column][start:stop], self.nulls[column][start:stop], self.schema[column].kind)
+            for column in self.columns
+        ]
+        # 每行套用同一个模板，列名只拼接一次
+        template = '{' + ','.join(f'"{column}":%s' for column in self.columns) + '}'
+        return list(map(template.__mod__, zip(*fragments)))
+
+    def encode(self, start=0, stop=None):
+        """把 [start, stop) 行编码为紧凑 JSON 数组（UTF-8 字节）"""
+        stop = self.size if stop is None else stop
+        if stop <= start:
+            return b'[]'
+        return f'[{",".join(self._rows(start, stop))}]'.encode('utf-8')
+
+    def row_hashes(self):
+        """每行内容的哈希（与编码后的 JSON 一一对应），用于判断数据是否变化"""
+        if not self.size:
+            return []
+        return [hashlib.blake2b(row.encode('utf-8'), digest_size=16).hexdigest()
+                for row in self._rows(0, self.size)]
+
+    def to_records(self):
+        """解码为字典列表（旧版客户端不能直接发送编码后的请求体时使用）"""
+        return json.loads(self.encode())
+
+    def to_frame(self):
+        """还原为 DataFrame（只含保留的行，置为 NULL 的值为缺失值），与写入数据库的内容一致"""
+        data = {}
+        for column in self.columns:
+            values, nulls = self.values[column], self.nulls[column]
+            kind = self.schema[column].kind
+            if kind in ('integer', 'bigint'):
+                data[column] = pd.arrays.IntegerArray(values.astype('int64'), nulls.copy())
+            elif kind == 'decimal':
+                data[column] = np.where(nulls, np.nan, values)
+            else:
+                array = values.copy()
+                array[nulls] = None
+                data[column] = array
+        return pd.DataFrame(data, columns=self.columns)
+
+def print_validation_report(batch, limit=5):
+    """打印被剔除的行和置为 NULL 的数值"""
+    for column, (count, reason) in batch.nulled.items():
+        print(f"⚠️ {column}: {count} 个数值{reason}，已置为 NULL")
+    if batch.rejected:
+        print(f"⚠️ {len(batch.rejected)} 行未通过校验，不写入:")
+        for item in batch.rejected[:limit]:
+            print(f"   第 {item['row']} 行 {item['code']} {item['stock_name'] or ''}: {'; '.join(item['reasons'])}")
+        if len(batch.rejected) > limit:
+            print(f"   ... 还有 {len(batch.rejected) - limit} 行")
@@ -0,0 +1,232 @@
+"""
+股票数据分块并发写入
+基于 stocks 表的 (code, update_date) 唯一索引做 upsert，分块并发发送，
+瞬时错误自动退避重试，全部成功后才清理当天已不在结果中的旧数据
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from postgrest import APIError, ReturnMethod
+
+from retries import with_retries
+
+# 每块写入行数、并发线程数、重试次数
+UPSERT_CHUNK_SIZE = int(os.getenv('STOCK_UPSERT_CHUNK_SIZE', '500'))
+UPSERT_WORKERS = int(os.getenv('STOCK_UPSERT_WORKERS', '4'))
+UPSERT_MAX_RETRIES = int(os.getenv('STOCK_UPSERT_MAX_RETRIES', '3'))
+
+# (code, update_date) 唯一：执行迁移后由 migrations/0002 分区表的主键 (update_date, code) 保证
+# （只执行 0001 时为 idx_stocks_date_code_unique，未执行迁移时为 supabase_setup.sql 中的 idx_stocks_code_date_unique）；
+# ON CONFLICT 按列集合匹配，与列顺序无关
+STOCKS_CONFLICT_COLUMNS = 'code,update_date'
+
+# 版本化存储（STOCK_STORAGE_MODE=versioned）的表、最新版本视图和唯一约束，见 supabase_setup.sql
+VERSIONS_TABLE = 'stock_versions'
+VERSION_HEADS_VIEW = 'stock_version_heads'
+VERSIONS_CONFLICT_COLUMNS = 'run_id,code,update_date'
+
+# 退出当天结果的股票追加一条删除标记，内容哈希固定为该值
+REMOVED_HASH = 'removed'
+
+# 读取当天已有代码时的分页大小（PostgREST 默认单次最多返回 1000 行）
+PAGE_SIZE = 1000
+
+def chunked(items, size):
+    """按固定大小切分列表"""
+    size = max(1, int(size))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def upsert_encoded(client, table, body, columns, on_conflict):
+    """直接发送已编码的 JSON 请求体做 upsert（与 postgrest 的 upsert 请求一致）
+
+    旧版客户端的请求构造器没有 session 时，解码后退回普通 upsert。
+    """
+    builder = client.table(table)
+    session, path = getattr(builder, 'session', None), getattr(builder, 'path', None)
+    if session is None or path is None:
+        return builder.upsert(json.loads(body), on_conflict=on_conflict,
+                              returning=ReturnMethod.minimal).execute()
+    headers = dict(getattr(builder, 'headers', None) or {})
+    headers.update({
+        'Content-Type': 'application/json',
+        'Prefer': f'return={ReturnMethod.minimal.value},resolution=merge-duplicates',
+    })
+    params = {'columns': ','.join(f'"{column}"' for column in columns)}
+    if on_conflict:
+        params['on_conflict'] = on_conflict
+    response = session.post(str(path), content=body, params=params, headers=headers)
+    if not response.is_success:
+        # 错误码用 HTTP 状态码，便于 retries.is_transient_error 判断是否重试
+        raise APIError({'message': f'HTTP {response.status_code}: {response.text[:500]}',
+                        'code': str(response.status_code)})
+    return response
+
+def _upsert_chunk(client, table, chunk, on_conflict, max_retries):
+    attempts = 0
+    # StockBatch 的分块在发送前才编码，重试时复用同一个请求体
+    body = chunk.encode() if hasattr(chunk, 'encode') else None
+
+    def send():
+        nonlocal attempts
+        attempts += 1
+        if body is not None:
+            return upsert_encoded(client, table, body, chunk.columns, on_conflict)
+        return client.table(table).upsert(
+            chunk, on_conflict=on_conflict, returning=ReturnMethod.minimal
+        ).execute()
+
+    start = time.perf_counter()
+    error = None
+    try:
+        with_retries(send, max_retries=max_retries)
+    except Exception as e:
+        error = str(e)
+    return {
+        'rows': len(chunk),
+        'latency': time.perf_counter() - start,
+        'attempts': attempts,
+        'error': error,
+    }
+
+def upsert_records(client, records, table='stocks', on_conflict=STOCKS_CONFLICT_COLUMNS,
+                   chunk_size=UPSERT_CHUNK_SIZE, max_workers=UPSERT_WORKERS,
+                   max_retries=UPSERT_MAX_RETRIES):
+    """分块并发 upsert，返回写入报告（每块的行数、耗时、尝试次数、错误）
+
+    records 为字典列表或 stock_records.StockBatch（按块直接编码为 JSON 发送）
+    """
+    chunks = records.chunks(chunk_size) if hasattr(records, 'chunks') else chunked(records, chunk_size)
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(_upsert_chunk, client, table, chunk, on_conflict, max_retries)
+            for chunk in chunks
+        ]
+        results = [future.result() for future in futures]
+
+    for index, result in enumerate(results):
+        result['index'] = index
+
+    written = sum(r['rows'] for r in results if r['error'] is None)
+    return {
+        'table': table,
+        'rows': len(records),
+        'written': written,
+        'failed': len(records) - written,
+        'chunks': results,
+        'elapsed': time.perf_counter() - start,
+    }
+
+def fetch_codes_for_date(client, update_date, table='stocks'):
+    """分页读取某天已有的股票代码"""
+    codes = set()
+    offset = 0
+    while True:
+        response = client.table(table).select('code').eq('update_date', update_date) \
+            .order('code').range(offset, offset + PAGE_SIZE - 1).execute()
+        rows = response.data or []
+        codes.update(row['code'] for row in rows)
+        if len(rows) < PAGE_SIZE:
+            return codes
+        offset += PAGE_SIZE
+
+def delete_stale_rows(client, update_date, keep_codes, table='stocks', chunk_size=UPSERT_CHUNK_SIZE):
+    """删除当天不在本次结果中的旧数据，返回删除行数"""
+    stale = sorted(fetch_codes_for_date(client, update_date, table) - set(keep_codes))
+    for chunk in chunked(stale, chunk_size):
+        with_retries(lambda: client.table(table).delete()
+                     .eq('update_date', update_date).in_('code', chunk).execute(),
+                     max_retries=UPSERT_MAX_RETRIES)
+    return len(stale)
+
+def write_stock_records(client, records, update_date, table='stocks', delete_stale=True, **kwargs):
+    """写入一天的股票数据：先 upsert，全部成功后再清理旧数据（delete_stale=False 时只 upsert）"""
+    if hasattr(records, 'codes'):
+        # StockBatch 构建时已按代码去重
+        codes = records.codes()
+    else:
+        # 同一批次内代码重复会导致 upsert 冲突，保留最后出现的一行
+        records = list({r['code']: r for r in records}.values())
+        codes = [r['code'] for r in records]
+    report = upsert_records(client, records, table=table, **kwargs)
+    report['deleted'] = 0
+    if delete_stale and report['failed'] == 0:
+        report['deleted'] = delete_stale_rows(
+            client, update_date, codes, table=table,
+            chunk_size=kwargs.get('chunk_size', UPSERT_CHUNK_SIZE)
+        )
+    return report
+
+def fetch_version_heads(client, update_date, view=VERSION_HEADS_VIEW):
+    """分页读取某天每只股票最新版本的内容哈希，返回 {代码: (content_hash, removed)}"""
+    heads = {}
+    offset = 0
+    while True:
+        response = client.table(view).select('code,content_hash,removed').eq('update_date', update_date) \
+            .order('code').range(offset, offset + PAGE_SIZE - 1).execute()
+        rows = response.data or []
+        heads.update((row['code'], (row['content_hash'], bool(row['removed']))) for row in rows)
+        if len(rows) < PAGE_SIZE:
+            return heads
+        offset += PAGE_SIZE
+
+def write_stock_versions(client, batch, update_date, run_id, delete_stale=True,
+                         table=VERSIONS_TABLE, view=VERSION_HEADS_VIEW, **kwargs):
+    """版本化写入一天的数据：只追加内容哈希与最新版本不同的行，不删除也不覆盖旧版本
+
+    batch 为 stock_records.StockBatch；delete_stale 时为不在本次结果中的股票追加删除标记，
+    (run_id, code, update_date) 唯一，同一次运行重试写入不会产生重复版本。
+    """
+    heads, _ = with_retries(lambda: fetch_version_heads(client, update_date, view),
+                            max_retries=UPSERT_MAX_RETRIES)
+    hashes = batch.row_hashes()
+    codes = batch.codes()
+    changed = [heads.get(code) != (digest, False) for code, digest in zip(codes, hashes)]
+    versions = batch.select(changed).with_columns(
+        run_id=run_id,
+        content_hash=[digest for digest, flag in zip(hashes, changed) if flag],
+    )
+    report = upsert_records(client, versions, table=table, on_conflict=VERSIONS_CONFLICT_COLUMNS, **kwargs)
+    # 未变化的行已有相同的最新版本，也算作写入成功
+    written = len(batch) - report['failed']
+
+    removed = []
+    if delete_stale and report['failed'] == 0:
+        current = set(codes)
+        removed = sorted(code for code, (_, is_removed) in heads.items()
+                         if not is_removed and code not in current)
+    if removed:
+        markers = [{'code': code, 'update_date': update_date, 'run_id': run_id,
+                    'content_hash': REMOVED_HASH, 'removed': True} for code in removed]
+        marked = upsert_records(client, markers, table=table, on_conflict=VERSIONS_CONFLICT_COLUMNS, **kwargs)
+        for chunk in marked['chunks']:
+            chunk['index'] += len(report['chunks'])
+        report['chunks'] += marked['chunks']
+        report['elapsed'] += marked['elapsed']
+        report['failed'] += marked['failed']
+
+    report.update(run_id=run_id, rows=len(batch), unchanged=len(batch) - len(versions),
+                  changed=len(versions), removed=len(removed), deleted=0, written=written)
+    return report
+
+def print_write_report(report):
+    """打印写入报告"""
+    chunks = report['chunks']
+    if chunks:
+        latencies = sorted(c['latency'] for c in chunks)
+        print(f"📦 {report['table']}: {len(chunks)} 块, 共 {report['rows']} 行, "
+              f"耗时 {report['elapsed']:.2f}s, 单块耗时 "
+              f"p50={latencies[len(latencies) // 2]:.2f}s max={latencies[-1]:.2f}s")
+    for c in chunks:
+        if c['error'] or c['attempts'] > 1:
+            status = f"失败: {c['error']}" if c['error'] else '成功'
+            print(f"   块 {c['index']}: {c['rows']} 行, 尝试 {c['attempts']} 次, {status}")
+    if report.get('deleted'):
+        print(f"🗑️ 已清理 {report['deleted']} 条当天的旧数据")
+    if 'run_id' in report:
+        print(f"🧬 版本 {report['run_id']}: 变化 {report['changed']} 行, 未变 {report['unchanged']} 行, "
+              f"退出 {report['removed']} 行")
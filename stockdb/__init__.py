@@ -0,0 +1,11 @@
+"""
+统一的数据访问层，见 stockdb/repository.py
+
+    from stockdb import StockRepository
+    repo = StockRepository.from_env()
+    df, stats = repo.day_rows('2025-09-03', columns=['code', 'stock_name'])
+"""
+
+from stockdb.repository import StockRepository, create_pooled_client
+
+__all__ = ['StockRepository', 'create_pooled_client']
@@ -0,0 +1,318 @@
+"""
+Supabase 数据访问仓库
+获取脚本、Web 应用和各命令行脚本共用同一个 StockRepository：
+一个带连接池的 HTTP 会话，统一的超时和瞬时错误重试，按列分页读取，
+历史日期优先读本地 Parquet 分区，并记录每次查询的耗时和行数。
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import local_store
+import metrics
+from metrics import new_run_id
+from pipeline import BEIJING_TZ
+from retries import with_retries
+from stock_catalog import fetch_available_dates, fetch_date_catalog, upsert_date_summary
+from stock_loader import load_stocks_by_date, load_stocks_by_dates, apply_dtypes
+from stock_writer import upsert_records, write_stock_records, write_stock_versions, VERSIONS_TABLE
+
+# 请求超时（秒）、连接池大小、读取重试次数
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', '30'))
+SUPABASE_MAX_CONNECTIONS = int(os.getenv('SUPABASE_MAX_CONNECTIONS', '10'))
+SUPABASE_MAX_RETRIES = int(os.getenv('SUPABASE_MAX_RETRIES', '3'))
+
+# 保留最近多少条查询耗时记录
+TIMING_HISTORY = 1000
+
+# 存储模式：upsert（默认，stocks 表每天每只股票一行，重跑时覆盖）/
+# versioned（stock_versions 只追加内容有变化的行，读取 stocks_latest 视图）
+STOCK_STORAGE_MODE = os.getenv('STOCK_STORAGE_MODE', 'upsert')
+
+# 版本化存储时读取的最新版本视图
+LATEST_VIEW = 'stocks_latest'
+
+# 写入 stocks 前补建按月分区（migrations/0002）的天数：写入日期到今天之后这么多天，设为 0 关闭
+PARTITION_AHEAD_DAYS = int(os.getenv('STOCK_PARTITION_AHEAD_DAYS', '92'))
+
+def create_pooled_client(url, key, timeout=SUPABASE_TIMEOUT, max_connections=SUPABASE_MAX_CONNECTIONS):
+    """创建 Supabase 客户端，PostgREST 请求共用一个带连接池的 httpx 会话"""
+    import httpx
+    from supabase import create_client, ClientOptions
+
+    http_client = httpx.Client(
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+    try:
+        options = ClientOptions(postgrest_client_timeout=timeout, httpx_client=http_client)
+    except TypeError:
+        # 旧版 supabase 不支持传入 httpx 会话，只设置超时
+        http_client.close()
+        options = ClientOptions(postgrest_client_timeout=timeout)
+    return create_client(url, key, options=options)
+
+class StockRepository:
+    """stocks / stock_dates 等表的读写入口"""
+
+    def __init__(self, client, max_retries=SUPABASE_MAX_RETRIES, local_cache=None,
+                 storage_mode=STOCK_STORAGE_MODE, run_id=None):
+        if storage_mode not in ('upsert', 'versioned'):
+            raise ValueError(f'未知的存储模式: {storage_mode}')
+        self.client = client
+        self.max_retries = max_retries
+        # 为 None 时跟随 LOCAL_STORE_DIR 配置
+        self.local_cache = local_store.is_enabled() if local_cache is None else local_cache
+        self.versioned = storage_mode == 'versioned'
+        # 读取每日数据的表：版本化存储时为最新版本视图
+        self.stocks_table = LATEST_VIEW if self.versioned else 'stocks'
+        self.run_id = run_id or new_run_id()
+        self.timings = deque(maxlen=TIMING_HISTORY)
+        self._lock = threading.Lock()
+        # 已补建过分区的月份；None 表示数据库中没有 ensure_stock_partitions（未执行 0002 迁移）
+        self._partition_months = set()
+
+    @classmethod
+    def connect(cls, url, key, timeout=SUPABASE_TIMEOUT, max_connections=SUPABASE_MAX_CONNECTIONS, **kwargs):
+        return cls(create_pooled_client(url, key, timeout, max_connections), **kwargs)
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """按 SUPABASE_URL / SUPABASE_KEY 创建，未配置时返回 None"""
+        url, key = os.getenv('SUPABASE_URL', ''), os.getenv('SUPABASE_KEY', '')
+        if not url or not key:
+            return None
+        return cls.connect(url, key, **kwargs)
+
+    # ---- 计时 ----
+
+    @contextmanager
+    def _timed(self, name, **info):
+        record = {'query': name, **info, 'rows': None, 'ok': True}
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record['ok'] = False
+            record['error'] = str(e)
+            raise
+        finally:
+            record['elapsed'] = time.perf_counter() - start
+            with self._lock:
+                self.timings.append(record)
+            metrics.event('query', **record)
+
+    def _read(self, func):
+        """读取操作统一按瞬时错误重试"""
+        result, _ = with_retries(func, max_retries=self.max_retries)
+        return result
+
+    def timing_summary(self):
+        """按查询类型汇总：次数、失败次数、总耗时、最长耗时、行数"""
+        with self._lock:
+            records = list(self.timings)
+        if not records:
+            return pd.DataFrame(columns=['calls', 'failed', 'total_s', 'max_s', 'rows'])
+        df = pd.DataFrame(records)
+        df['failed'] = ~df['ok']
+        return df.groupby('query').agg(
+            calls=('elapsed', 'size'),
+            failed=('failed', 'sum'),
+            total_s=('elapsed', 'sum'),
+            max_s=('elapsed', 'max'),
+            rows=('rows', 'sum'),
+        ).sort_values('total_s', ascending=False)
+
+    def print_timings(self):
+        summary = self.timing_summary()
+        if summary.empty:
+            return
+        print("⏱️ 数据库查询耗时:")
+        for name, row in summary.iterrows():
+            failed = f", 失败 {int(row.failed)} 次" if row.failed else ''
+            print(f"   {name}: {int(row.calls)} 次, 共 {row.total_s:.2f}s, 最长 {row.max_s:.2f}s, "
+                  f"{int(row.rows)} 行{failed}")
+
+    # ---- 读取 ----
+
+    def ping(self, table=None):
+        """检查连接和表是否可用，默认检查写入的表"""
+        table = table or (VERSIONS_TABLE if self.versioned else 'stocks')
+        with self._timed('ping'):
+            self._read(lambda: self.client.table(table).select('update_date').limit(1).execute())
+        return True
+
+    def count_rows(self, table=None):
+        """只取精确总数，不下载数据"""
+        table = table or self.stocks_table
+        with self._timed('count_rows', table=table) as record:
+            response = self._read(
+                lambda: self.client.table(table).select('update_date', count='exact').limit(1).execute()
+            )
+            record['rows'] = 1
+        return response.count or 0
+
+    def date_catalog(self, columns='*'):
+        """stock_dates 目录全部行，按日期倒序"""
+        with self._timed('date_catalog') as record:
+            rows = self._read(lambda: fetch_date_catalog(self.client, columns))
+            record['rows'] = len(rows)
+        return rows
+
+    def available_dates(self):
+        """可用数据日期，按日期倒序"""
+        with self._timed('available_dates') as record:
+            dates = self._read(lambda: fetch_available_dates(self.client))
+            record['rows'] = len(dates)
+        return dates
+
+    def day_rows(self, update_date, columns=None):
+        """读取一天的数据，返回 (DataFrame, 加载统计)
+
+        历史日期优先读本地分区；本地没有时整天读取一次并写入本地分区，之后按列从本地读取。
+        """
+        columns = list(columns) if columns else None
+        # 当天的数据可能被重跑更新，本地分区只对历史日期可信
+        cache_locally = self.local_cache and local_store.is_immutable(update_date)
+        if cache_locally:
+            df = local_store.read_partition(update_date, columns)
+            if df is not None:
+                return apply_dtypes(df), {'source': 'local', 'rows': len(df)}
+
+        with self._timed('day_rows', update_date=update_date) as record:
+            df, stats = self._read(
+                lambda: load_stocks_by_date(self.client, update_date, None if cache_locally else columns,
+                                            table=self.stocks_table)
+            )
+            record['rows'] = len(df)
+        if cache_locally and not df.empty:
+            try:
+                local_store.write_partition(df, update_date)
+            except Exception as e:
+                print(f"⚠️ 写入本地分区失败: {e}")
+            if columns:
+                df = df[[col for col in columns if col in df.columns]]
+        return df, stats
+
+    def range_rows(self, dates, columns=None, table=None):
+        """读取多天的数据（含 update_date 列），返回 (DataFrame, 加载统计)
+
+        本地已有的历史日期读分区，当天和其余日期按批用 update_date in (...) 查询；
+        读取全部列时顺便把历史日期写入本地分区。本地分区只保存 stocks 表，
+        table 为其他表（如 stocks_sweep）时全部从 Supabase 读取。
+        """
+        dates = list(dates)
+        table = self.stocks_table if table in (None, 'stocks') else table
+        local_cache = self.local_cache and table == self.stocks_table
+        frames, missing = [], dates
+        stats = {'local_days': 0, 'remote_days': 0, 'rows': 0, 'pages': 0}
+        if local_cache:
+            # 当天（及之后）的日期总是从 Supabase 读取
+            recent = [d for d in dates if not local_store.is_immutable(d)]
+            df, missing = local_store.read_partitions([d for d in dates if local_store.is_immutable(d)], columns)
+            frames.append(df)
+            stats['local_days'] = len(dates) - len(recent) - len(missing)
+            missing += recent
+
+        if missing and self.client is not None:
+            with self._timed('range_rows', days=len(missing)) as record:
+                df, remote = self._read(
+                    lambda: load_stocks_by_dates(self.client, missing, columns, table=table)
+                )
+                record['rows'] = len(df)
+            frames.append(df)
+            stats.update(remote_days=len(missing), pages=remote['pages'])
+            if local_cache and columns is None and not df.empty:
+                self._cache_days(df)
+
+        frames = [f for f in frames if not f.empty]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(columns or []))
+        stats['rows'] = len(df)
+        return df, stats
+
+    def _cache_days(self, df):
+        for update_date, day in df.groupby('update_date'):
+            if local_store.is_immutable(update_date):
+                try:
+                    local_store.write_partition(day, update_date)
+                except Exception as e:
+                    print(f"⚠️ 写入本地分区 {update_date} 失败: {e}")
+
+    def sync_local(self, dates=None):
+        """从 Supabase 补齐本地缺失的历史分区，返回同步的日期列表"""
+        if not self.local_cache:
+            return []
+        dates = self.available_dates() if dates is None else dates
+        pending = [d for d in dates if not local_store.has_partition(d) and local_store.is_immutable(d)]
+        if pending:
+            self.range_rows(pending)
+        return [d for d in pending if local_store.has_partition(d)]
+
+    # ---- 写入 ----
+
+    def write_day(self, records, update_date, table='stocks', delete_stale=True):
+        """按 (code, update_date) 分块并发 upsert 一天的数据，返回写入报告
+
+        records 为字典列表或 stock_records.StockBatch；版本化存储时 stocks 表的数据
+        （必须为 StockBatch）只追加有变化的行到 stock_versions。
+        """
+        if table == 'stocks' and not self.versioned:
+            self.ensure_partitions(update_date)
+        if self.versioned and table == 'stocks':
+            with self._timed('write_versions', table=VERSIONS_TABLE) as record:
+                report = write_stock_versions(self.client, records, update_date, self.run_id,
+                                              delete_stale=delete_stale)
+                record['rows'] = report['changed'] + report['removed']
+            return report
+        with self._timed('write_day', table=table) as record:
+            report = write_stock_records(self.client, records, update_date, table=table,
+                                         delete_stale=delete_stale)
+            record['rows'] = report['written']
+        return report
+
+    def ensure_partitions(self, update_date):
+        """stocks 按月分区时，补建写入日期所在月份到 PARTITION_AHEAD_DAYS 天后的分区
+
+        超出已有分区的数据会落入 stocks_default，之后就不能再为这些月份建分区；
+        每个月份每个进程只调用一次，数据库中没有该函数时提示一次后不再调用。
+        """
+        month = str(update_date)[:7]
+        if not PARTITION_AHEAD_DAYS or self._partition_months is None or month in self._partition_months:
+            return
+        today = datetime.now(BEIJING_TZ).date()
+        start = min(str(update_date)[:10], today.isoformat())
+        end = (today + timedelta(days=PARTITION_AHEAD_DAYS)).isoformat()
+        try:
+            with self._timed('ensure_partitions', update_date=update_date) as record:
+                created = self._read(lambda: self.client.rpc(
+                    'ensure_stock_partitions', {'from_date': start, 'to_date': end}).execute().data)
+                record['rows'] = created
+        except Exception as e:
+            message = str(e).lower()
+            if getattr(e, 'code', None) == 'PGRST202' or 'could not find' in message or 'not found' in message:
+                print("ℹ️ 数据库中没有 ensure_stock_partitions（未执行 0002 分区迁移），跳过补建分区")
+                self._partition_months = None
+            else:
+                print(f"⚠️ 补建 stocks 分区失败: {e}")
+            return
+        if created:
+            print(f"🗂️ 已新建 {created} 个 stocks 月度分区（至 {end}）")
+        self._partition_months.add(month)
+
+    def upsert(self, table, records, on_conflict):
+        """通用分块 upsert，返回写入报告"""
+        with self._timed('upsert', table=table) as record:
+            report = upsert_records(self.client, records, table=table, on_conflict=on_conflict)
+            record['rows'] = report['written']
+        return report
+
+    def upsert_date_summary(self, summary):
+        with self._timed('upsert_date_summary') as record:
+            self._read(lambda: upsert_date_summary(self.client, summary))
+            record['rows'] = 1
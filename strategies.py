@@ -0,0 +1,177 @@
+"""
+多策略选股
+策略（问财查询语句、目标表、标签）定义在 strategies.json 中，
+用有界线程池并发执行，所有查询共享一个限速器，结果按代码合并并记录命中的策略
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+# 策略配置文件
+STRATEGY_CONFIG = os.getenv(
+    'STRATEGY_CONFIG',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strategies.json')
+)
+
+DEFAULT_TABLE = 'stocks'
+DEFAULT_MAX_WORKERS = 3
+DEFAULT_MIN_INTERVAL = 1.0
+
+class RateLimiter:
+    """限制相邻两次请求的最小间隔，多线程共享"""
+
+    def __init__(self, min_interval):
+        self.min_interval = max(0.0, float(min_interval))
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+def load_strategy_config(path=STRATEGY_CONFIG):
+    """读取策略配置，只返回启用的策略"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    strategies = []
+    for item in config.get('strategies', []):
+        if not item.get('enabled', True):
+            continue
+        if not item.get('name') or not item.get('query'):
+            raise ValueError(f'策略配置缺少 name 或 query: {item}')
+        strategies.append({
+            'name': item['name'],
+            'title': item.get('title', item['name']),
+            'query': ' '.join(item['query'].split()),
+            'table': item.get('table', DEFAULT_TABLE),
+            'tag': item.get('tag', item['name']),
+        })
+
+    return {
+        'max_workers': int(config.get('max_workers', DEFAULT_MAX_WORKERS)),
+        'min_interval_seconds': float(config.get('min_interval_seconds', DEFAULT_MIN_INTERVAL)),
+        'strategies': strategies,
+    }
+
+def dated_query(query, query_date):
+    """把查询语句改写为指定日期的查询，用于补历史数据
+
+    语句中有 {date} 占位符时直接替换；以「今天」开头时把「今天」换成日期；否则在开头加上日期。
+    """
+    import pandas as pd
+
+    day = pd.Timestamp(query_date)
+    text = f'{day.year}年{day.month}月{day.day}日'
+    if '{date}' in query:
+        return query.replace('{date}', text)
+    if query.startswith('今天'):
+        return text + query[len('今天'):]
+    return f'{text}，{query}'
+
+def run_strategies(strategies, fetch, max_workers=DEFAULT_MAX_WORKERS,
+                   min_interval=DEFAULT_MIN_INTERVAL, timeout=None):
+    """并发执行所有策略，fetch(query) 返回问财结果
+
+    返回与 strategies 顺序一致的结果列表：
+    {'strategy', 'data', 'error', 'elapsed'}，单个策略失败不影响其他策略；
+    timeout（秒）内未完成的策略记为超时，不再等待其结果。
+    工作线程为守护线程：卡住的问财请求不会在超时后继续阻止进程退出。
+    """
+    import pandas as pd
+
+    limiter = RateLimiter(min_interval)
+
+    def run(strategy):
+        limiter.wait()
+        start = time.perf_counter()
+        try:
+            data = fetch(strategy['query'])
+            if data is not None and not isinstance(data, pd.DataFrame):
+                data = pd.DataFrame(data)
+            error = None
+        except Exception as e:
+            data, error = None, str(e)
+        return {
+            'strategy': strategy,
+            'data': data,
+            'error': error,
+            'elapsed': time.perf_counter() - start,
+        }
+
+    if not strategies:
+        return []
+    pending = queue.Queue()
+    for index, strategy in enumerate(strategies):
+        pending.put((index, strategy))
+    finished = [None] * len(strategies)
+    lock = threading.Lock()
+    all_done = threading.Event()
+    stopped = threading.Event()
+    remaining = [len(strategies)]
+
+    def worker():
+        while not stopped.is_set():
+            try:
+                index, strategy = pending.get_nowait()
+            except queue.Empty:
+                return
+            result = run(strategy)
+            with lock:
+                finished[index] = result
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    all_done.set()
+
+    for i in range(max(1, min(max_workers, len(strategies)))):
+        threading.Thread(target=worker, name=f'strategy-{i}', daemon=True).start()
+    all_done.wait(timeout)
+    # 超时后不再开始新的策略，已卡住的请求留在守护线程里，不阻塞后续写库和进程退出
+    stopped.set()
+
+    results = []
+    with lock:
+        finished = list(finished)
+    for strategy, result in zip(strategies, finished):
+        if result is not None:
+            results.append(result)
+        else:
+            results.append({'strategy': strategy, 'data': None,
+                            'error': f'超过截止时间 ({timeout:.0f}s) 未返回', 'elapsed': timeout})
+    return results
+
+def merge_strategy_frames(tagged_frames):
+    """按目标表合并各策略映射后的数据
+
+    tagged_frames: [(strategy, 映射后的 DataFrame), ...]，靠前的策略字段优先；
+    同一代码命中多个策略时合并为一行，strategies 列记录全部命中策略的标签。
+    返回 {表名: DataFrame}
+    """
+    import pandas as pd
+
+    grouped = {}
+    for strategy, frame in tagged_frames:
+        if frame is None or frame.empty:
+            continue
+        grouped.setdefault(strategy['table'], []).append((strategy['tag'], frame))
+
+    merged = {}
+    for table, items in grouped.items():
+        tags = pd.concat(
+            [pd.DataFrame({'code': frame['code'].values, 'tag': tag}) for tag, frame in items],
+            ignore_index=True
+        ).drop_duplicates()
+        combined = None
+        for _, frame in items:
+            frame = frame.drop_duplicates('code', keep='last').set_index('code')
+            combined = frame if combined is None else combined.combine_first(frame)
+        combined['strategies'] = tags.groupby('code', sort=False)['tag'].agg(list)
+        merged[table] = combined.reset_index()
+    return merged
@@ -1,5 +1,6 @@
 -- Supabase 数据表创建 SQL
 -- 在 Supabase SQL Editor 中执行此脚本来创建 stocks 表
+-- 之后按编号依次执行 migrations/ 下的脚本（索引精简、按月分区），已执行的版本记录在 schema_migrations 表
 
 CREATE TABLE IF NOT EXISTS public.stocks (
     id SERIAL PRIMARY KEY,
@@ -72,4 +73,345 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_stocks_updated_at 
     BEFORE UPDATE ON public.stocks 
     FOR EACH ROW 
-    EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- ============================================================
+-- 数据日期目录：每个 update_date 一行，由获取脚本在写入 stocks 后维护
+-- 面板读取日期列表和每日条数时只查询这张小表
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS public.stock_dates (
+    update_date DATE PRIMARY KEY,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    up_count INTEGER NOT NULL DEFAULT 0,
+    avg_latest_change_pct DECIMAL(8,4),
+    avg_auction_change_pct DECIMAL(8,4),
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE public.stock_dates ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Enable read access for all users" ON public.stock_dates
+FOR SELECT USING (true);
+
+-- 目录为空时的兜底：在服务端分组返回日期和条数
+CREATE OR REPLACE FUNCTION public.get_stock_dates()
+RETURNS TABLE (update_date DATE, row_count BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT s.update_date, count(*)
+    FROM public.stocks s
+    GROUP BY s.update_date
+    ORDER BY s.update_date DESC;
+$$;
+
+-- 根据 stocks 表重建目录，返回目录行数
+CREATE OR REPLACE FUNCTION public.refresh_stock_dates()
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    INSERT INTO public.stock_dates (
+        update_date, row_count, up_count,
+        avg_latest_change_pct, avg_auction_change_pct, refreshed_at
+    )
+    SELECT
+        s.update_date,
+        count(*),
+        count(*) FILTER (WHERE s.latest_change_pct > 0),
+        round(avg(s.latest_change_pct), 4),
+        round(avg(s.auction_change_pct), 4),
+        CURRENT_TIMESTAMP
+    FROM public.stocks s
+    GROUP BY s.update_date
+    ON CONFLICT (update_date) DO UPDATE SET
+        row_count = EXCLUDED.row_count,
+        up_count = EXCLUDED.up_count,
+        avg_latest_change_pct = EXCLUDED.avg_latest_change_pct,
+        avg_auction_change_pct = EXCLUDED.avg_auction_change_pct,
+        refreshed_at = EXCLUDED.refreshed_at;
+    GET DIAGNOSTICS affected = ROW_COUNT;
+
+    DELETE FROM public.stock_dates d
+    WHERE NOT EXISTS (SELECT 1 FROM public.stocks s WHERE s.update_date = d.update_date);
+
+    RETURN affected;
+END;
+$$;
+
+-- 用已有数据初始化目录
+SELECT public.refresh_stock_dates();
+
+
+-- ============================================================
+-- 多策略选股：记录每只股票当天命中的策略（strategies.json 中的 tag）
+-- ============================================================
+
+ALTER TABLE public.stocks ADD COLUMN IF NOT EXISTS strategies TEXT[] NOT NULL DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS idx_stocks_strategies ON public.stocks USING GIN (strategies);
+
+-- 参数扫描超集（strategies.json 中的 sweep_superset）单独写入 stocks_sweep，
+-- 条件宽松的入选股票不进入 stocks、stock_dates、面板、通知和回测；sweep.py 从这张表读取
+CREATE TABLE IF NOT EXISTS public.stocks_sweep (
+    LIKE public.stocks INCLUDING DEFAULTS
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stocks_sweep_code_date_unique
+ON public.stocks_sweep(code, update_date);
+
+ALTER TABLE public.stocks_sweep ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Enable read access for all users" ON public.stocks_sweep
+FOR SELECT USING (true);
+
+CREATE POLICY "Enable insert for service role" ON public.stocks_sweep
+FOR INSERT WITH CHECK (true);
+
+CREATE POLICY "Enable update for service role" ON public.stocks_sweep
+FOR UPDATE USING (true);
+
+
+-- ============================================================
+-- 盘中增量快照：fetch_stock_data.py --intraday 每轮只写入相对上一轮的变化
+-- change_type: enter 新入选（data 为整行）/ exit 退出（previous 为退出前的整行）/
+--              update 字段变化（data、previous 只包含变化的字段）
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS public.stock_snapshots (
+    id BIGSERIAL PRIMARY KEY,
+    snapshot_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    update_date DATE NOT NULL,
+    code INTEGER NOT NULL,
+    change_type TEXT NOT NULL CHECK (change_type IN ('enter', 'exit', 'update')),
+    stock_name TEXT,
+    strategies TEXT[] NOT NULL DEFAULT '{}',
+    data JSONB NOT NULL DEFAULT '{}',
+    previous JSONB
+);
+
+-- 同一轮同一股票只有一条记录，写入重试时不会重复
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_snapshots_code_time
+ON public.stock_snapshots(code, snapshot_at);
+
+CREATE INDEX IF NOT EXISTS idx_stock_snapshots_date_time
+ON public.stock_snapshots(update_date, snapshot_at);
+
+ALTER TABLE public.stock_snapshots ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Enable read access for all users" ON public.stock_snapshots
+FOR SELECT USING (true);
+
+
+-- ============================================================
+-- 日期目录汇总扩展：分位数、涨跌家数、按板块 / 策略的分组汇总
+-- 面板的数据概览和多日趋势只读取 stock_dates，不再下载每天的全部数据
+-- board_stats / strategy_stats 格式:
+--   {"主板": {"row_count": 12, "up_count": 8, "avg_latest_change_pct": 1.2,
+--             "median_latest_change_pct": 0.9, "avg_auction_change_pct": 2.1}, ...}
+-- ============================================================
+
+ALTER TABLE public.stock_dates ADD COLUMN IF NOT EXISTS down_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE public.stock_dates ADD COLUMN IF NOT EXISTS median_latest_change_pct DECIMAL(8,4);
+ALTER TABLE public.stock_dates ADD COLUMN IF NOT EXISTS p25_latest_change_pct DECIMAL(8,4);
+ALTER TABLE public.stock_dates ADD COLUMN IF NOT EXISTS p75_latest_change_pct DECIMAL(8,4);
+ALTER TABLE public.stock_dates ADD COLUMN IF NOT EXISTS median_auction_change_pct DECIMAL(8,4);
+ALTER TABLE public.stock_dates ADD COLUMN IF NOT EXISTS avg_volume_ratio DECIMAL(10,4);
+ALTER TABLE public.stock_dates ADD COLUMN IF NOT EXISTS board_stats JSONB NOT NULL DEFAULT '{}';
+ALTER TABLE public.stock_dates ADD COLUMN IF NOT EXISTS strategy_stats JSONB NOT NULL DEFAULT '{}';
+
+-- 分组汇总，与 stock_catalog._group_stats 的口径一致
+CREATE OR REPLACE FUNCTION public.stock_group_stats(changes DECIMAL[], auctions DECIMAL[])
+RETURNS JSONB
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT jsonb_build_object(
+        'row_count', cardinality(changes),
+        'up_count', (SELECT count(*) FROM unnest(changes) c WHERE c > 0),
+        'avg_latest_change_pct', (SELECT round(avg(c), 4) FROM unnest(changes) c),
+        'median_latest_change_pct',
+            (SELECT round((percentile_cont(0.5) WITHIN GROUP (ORDER BY c))::numeric, 4) FROM unnest(changes) c),
+        'avg_auction_change_pct', (SELECT round(avg(a), 4) FROM unnest(auctions) a)
+    );
+$$;
+
+-- 根据 stocks 表重建目录（替换上面的简化版本），返回目录行数
+CREATE OR REPLACE FUNCTION public.refresh_stock_dates()
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    WITH days AS (
+        SELECT
+            s.update_date,
+            count(*) AS row_count,
+            count(*) FILTER (WHERE s.latest_change_pct > 0) AS up_count,
+            count(*) FILTER (WHERE s.latest_change_pct < 0) AS down_count,
+            round(avg(s.latest_change_pct), 4) AS avg_latest_change_pct,
+            round((percentile_cont(0.5) WITHIN GROUP (ORDER BY s.latest_change_pct))::numeric, 4)
+                AS median_latest_change_pct,
+            round((percentile_cont(0.25) WITHIN GROUP (ORDER BY s.latest_change_pct))::numeric, 4)
+                AS p25_latest_change_pct,
+            round((percentile_cont(0.75) WITHIN GROUP (ORDER BY s.latest_change_pct))::numeric, 4)
+                AS p75_latest_change_pct,
+            round(avg(s.auction_change_pct), 4) AS avg_auction_change_pct,
+            round((percentile_cont(0.5) WITHIN GROUP (ORDER BY s.auction_change_pct))::numeric, 4)
+                AS median_auction_change_pct,
+            round(avg(s.volume_ratio), 4) AS avg_volume_ratio
+        FROM public.stocks s
+        GROUP BY s.update_date
+    ),
+    boards AS (
+        SELECT update_date, jsonb_object_agg(board, stats) AS board_stats
+        FROM (
+            SELECT s.update_date, coalesce(s.listing_board, '未知') AS board,
+                   public.stock_group_stats(array_agg(s.latest_change_pct), array_agg(s.auction_change_pct)) AS stats
+            FROM public.stocks s
+            GROUP BY 1, 2
+        ) b
+        GROUP BY update_date
+    ),
+    tags AS (
+        SELECT update_date, jsonb_object_agg(tag, stats) AS strategy_stats
+        FROM (
+            SELECT s.update_date, t.tag,
+                   public.stock_group_stats(array_agg(s.latest_change_pct), array_agg(s.auction_change_pct)) AS stats
+            FROM public.stocks s
+            CROSS JOIN LATERAL unnest(s.strategies) AS t(tag)
+            GROUP BY 1, 2
+        ) g
+        GROUP BY update_date
+    )
+    INSERT INTO public.stock_dates (
+        update_date, row_count, up_count, down_count,
+        avg_latest_change_pct, median_latest_change_pct, p25_latest_change_pct, p75_latest_change_pct,
+        avg_auction_change_pct, median_auction_change_pct, avg_volume_ratio,
+        board_stats, strategy_stats, refreshed_at
+    )
+    SELECT
+        d.update_date, d.row_count, d.up_count, d.down_count,
+        d.avg_latest_change_pct, d.median_latest_change_pct, d.p25_latest_change_pct, d.p75_latest_change_pct,
+        d.avg_auction_change_pct, d.median_auction_change_pct, d.avg_volume_ratio,
+        coalesce(b.board_stats, '{}'), coalesce(t.strategy_stats, '{}'), CURRENT_TIMESTAMP
+    FROM days d
+    LEFT JOIN boards b USING (update_date)
+    LEFT JOIN tags t USING (update_date)
+    ON CONFLICT (update_date) DO UPDATE SET
+        row_count = EXCLUDED.row_count,
+        up_count = EXCLUDED.up_count,
+        down_count = EXCLUDED.down_count,
+        avg_latest_change_pct = EXCLUDED.avg_latest_change_pct,
+        median_latest_change_pct = EXCLUDED.median_latest_change_pct,
+        p25_latest_change_pct = EXCLUDED.p25_latest_change_pct,
+        p75_latest_change_pct = EXCLUDED.p75_latest_change_pct,
+        avg_auction_change_pct = EXCLUDED.avg_auction_change_pct,
+        median_auction_change_pct = EXCLUDED.median_auction_change_pct,
+        avg_volume_ratio = EXCLUDED.avg_volume_ratio,
+        board_stats = EXCLUDED.board_stats,
+        strategy_stats = EXCLUDED.strategy_stats,
+        refreshed_at = EXCLUDED.refreshed_at;
+    GET DIAGNOSTICS affected = ROW_COUNT;
+
+    DELETE FROM public.stock_dates d
+    WHERE NOT EXISTS (SELECT 1 FROM public.stocks s WHERE s.update_date = d.update_date);
+
+    RETURN affected;
+END;
+$$;
+
+-- 用已有数据补齐新增的汇总列
+SELECT public.refresh_stock_dates();
+
+
+-- ============================================================
+-- 版本化存储（STOCK_STORAGE_MODE=versioned）：每次运行有一个 run_id，
+-- 只追加内容哈希与最新版本不同的行，不删除、不覆盖，保留同一天多次重跑的结果；
+-- 退出当天结果的股票追加一条 removed = true 的删除标记。
+-- stocks_latest 视图给出每个 (code, update_date) 的最新版本，面板和脚本改为读取该视图。
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS public.stock_versions (
+    id BIGSERIAL PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    recorded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    content_hash TEXT NOT NULL,
+    removed BOOLEAN NOT NULL DEFAULT FALSE,
+    code INTEGER NOT NULL,
+    stock_name TEXT,
+    latest_price DECIMAL(10,4),
+    latest_change_pct DECIMAL(8,4),
+    listing_board TEXT,
+    auction_change_pct DECIMAL(8,4),
+    pe_ttm DECIMAL(10,4),
+    pe DECIMAL(10,4),
+    dde_large_order DECIMAL(15,4),
+    volume_ratio DECIMAL(10,4),
+    interval_change_13d DECIMAL(8,4),
+    interval_change_5d DECIMAL(8,4),
+    listing_days INTEGER,
+    forecast_pe_1y DECIMAL(10,4),
+    forecast_pe_2y DECIMAL(10,4),
+    forecast_pe_3y DECIMAL(10,4),
+    market_cap DECIMAL(20,4),
+    eps DECIMAL(10,6),
+    gross_margin DECIMAL(8,4),
+    net_margin DECIMAL(8,4),
+    auction_price DECIMAL(10,4),
+    auction_type TEXT,
+    auction_desc TEXT,
+    auction_rating TEXT,
+    auction_volume BIGINT,
+    auction_amount BIGINT,
+    market_code INTEGER,
+    update_date DATE NOT NULL,
+    strategies TEXT[] NOT NULL DEFAULT '{}'
+);
+
+-- 同一次运行同一股票只有一个版本，写入重试时不会重复
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_versions_run_code_date
+ON public.stock_versions(run_id, code, update_date);
+
+-- 按日期取每只股票的最新版本
+CREATE INDEX IF NOT EXISTS idx_stock_versions_date_code_time
+ON public.stock_versions(update_date, code, recorded_at DESC, id DESC);
+
+ALTER TABLE public.stock_versions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Enable read access for all users" ON public.stock_versions
+FOR SELECT USING (true);
+
+-- 每个 (code, update_date) 的最新版本（含删除标记），写入时据此比较内容哈希
+CREATE OR REPLACE VIEW public.stock_version_heads AS
+SELECT DISTINCT ON (update_date, code) *
+FROM public.stock_versions
+ORDER BY update_date, code, recorded_at DESC, id DESC;
+
+-- 当前数据：最新版本中未被删除的行，列与 stocks 表一致，另带 run_id 和 recorded_at
+CREATE OR REPLACE VIEW public.stocks_latest AS
+SELECT
+    id, code, stock_name, latest_price, latest_change_pct, listing_board, auction_change_pct,
+    pe_ttm, pe, dde_large_order, volume_ratio, interval_change_13d, interval_change_5d,
+    listing_days, forecast_pe_1y, forecast_pe_2y, forecast_pe_3y, market_cap, eps,
+    gross_margin, net_margin, auction_price, auction_type, auction_desc, auction_rating,
+    auction_volume, auction_amount, market_code, update_date, strategies, run_id, recorded_at
+FROM public.stock_version_heads
+WHERE NOT removed;
+
+-- 从 stocks 表迁移已有数据作为初始版本（只在 stock_versions 为空时执行）；
+-- 迁移的行没有内容哈希，之后第一次版本化写入时每行会再追加一个版本
+INSERT INTO public.stock_versions (
+    run_id, recorded_at, content_hash, code, stock_name, latest_price, latest_change_pct,
+    listing_board, auction_change_pct, pe_ttm, pe, dde_large_order, volume_ratio,
+    interval_change_13d, interval_change_5d, listing_days, forecast_pe_1y, forecast_pe_2y,
+    forecast_pe_3y, market_cap, eps, gross_margin, net_margin, auction_price, auction_type,
+    auction_desc, auction_rating, auction_volume, auction_amount, market_code, update_date, strategies
+)
+SELECT
+    'migrated', coalesce(updated_at, created_at, CURRENT_TIMESTAMP), 'migrated', code, stock_name,
+    latest_price, latest_change_pct, listing_board, auction_change_pct, pe_ttm, pe, dde_large_order,
+    volume_ratio, interval_change_13d, interval_change_5d, listing_days, forecast_pe_1y,
+    forecast_pe_2y, forecast_pe_3y, market_cap, eps, gross_margin, net_margin, auction_price,
+    auction_type, auction_desc, auction_rating, auction_volume, auction_amount, market_code,
+    update_date, strategies
+FROM public.stocks
+WHERE NOT EXISTS (SELECT 1 FROM public.stock_versions);
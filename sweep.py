@@ -0,0 +1,199 @@
+"""
+筛选阈值参数扫描
+先用宽松条件的策略（strategies.json 中的 sweep_superset）获取一个超集并保存到 stocks_sweep 表，
+再在本地对已保存的字段按阈值网格逐一组合筛选，按入选后 N 日收益排序，
+调参时不需要每个组合都请求一次问财。
+
+每个阈值预先算好一个布尔向量（长度为超集中的信号数），组合只需按位与，
+每日组合收益用 np.add.reduceat 按交易日分段求和；网格按块分给进程池并行计算。
+
+用法:
+    python sweep.py --base-strategy sweep_superset --horizon 1
+    python sweep.py --grid my_grid.json --workers 4 --top 30 --output sweep.csv
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from stockdb import StockRepository
+from backtest import (load_history, build_panel, load_price_file, signal_mask,
+                      forward_returns, max_drawdown)
+
+# 默认网格：(字段, 比较方式, 候选阈值)，None 表示不限制该条件
+DEFAULT_GRID = [
+    ('auction_change_pct', '>', [0, 1, 2]),
+    ('auction_change_pct', '<', [4, 6, 8]),
+    ('interval_change_13d', '>=', [None, 5, 10]),
+    ('interval_change_5d', '>=', [None, 5, 10]),
+    ('listing_days', '>', [None, 100, 250]),
+    ('volume_ratio', '>', [None, 1, 3]),
+    ('dde_large_order', '>', [None, 0]),
+]
+
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+}
+
+SWEEP_WORKERS = int(os.getenv('SWEEP_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# 每块组合数
+CHUNK_SIZE = 256
+
+# 有收益的信号少于该数量的组合不参与排名
+MIN_SIGNALS = 30
+
+# 超集策略写入的表（strategies.json 中 sweep_superset 的 table）
+SWEEP_TABLE = os.getenv('SWEEP_TABLE', 'stocks_sweep')
+
+def load_grid(path):
+    """读取网格 JSON：[{"field": ..., "op": ">", "values": [...]}, ...]"""
+    with open(path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    return [(item['field'], item.get('op', '>'), item['values']) for item in items]
+
+def build_observations(panel, grid, horizon, base_strategy=None):
+    """取出超集中全部信号的所在日期、收益，并为每个条件的每个阈值预先计算布尔向量"""
+    rows, cols = np.nonzero(signal_mask(panel, base_strategy))
+    with np.errstate(invalid='ignore'):
+        returns = forward_returns(panel, horizon)[rows, cols]
+    masks = []
+    for field, op, values in grid:
+        column = panel.fields[field][rows, cols]
+        with np.errstate(invalid='ignore'):
+            masks.append([
+                np.ones(len(rows), dtype=bool) if value is None else OPERATORS[op](column, value)
+                for value in values
+            ])
+    # np.nonzero 按行（交易日）顺序返回，同一天的信号是连续的一段，
+    # 每日汇总用 reduceat 按段求和，避免每个组合都做布尔索引
+    days, starts = np.unique(rows, return_index=True)
+    has_return = ~np.isnan(returns)
+    return {
+        'days': days,
+        'starts': starts,
+        'n_days': len(panel.dates),
+        'n_signals': len(rows),
+        'returns': np.where(has_return, returns, 0.0),
+        'has_return': has_return,
+        'positive': returns > 0,
+        'horizon': horizon,
+        'masks': masks,
+    }
+
+def evaluate_combo(obs, combo):
+    """combo 为每个条件选中的阈值下标，返回该组合的统计"""
+    mask = obs['masks'][0][combo[0]].copy()
+    for masks, index in zip(obs['masks'][1:], combo[1:]):
+        mask &= masks[index]
+    signals = int(np.count_nonzero(mask))
+    observed = mask & obs['has_return']
+    n = int(np.count_nonzero(observed))
+    picked = obs['returns'] * observed
+
+    # 每日等权组合收益，与 backtest.evaluate 的口径一致
+    daily = np.zeros(obs['n_days'])
+    total = 0.0
+    if len(obs['starts']):
+        sums = np.add.reduceat(picked, obs['starts'])
+        counts = np.add.reduceat(observed, obs['starts'], dtype=np.int64)
+        daily[obs['days']] = np.divide(sums, counts, out=np.zeros(len(sums)), where=counts > 0)
+        total = sums.sum()
+    equity = np.cumprod(1 + daily / obs['horizon'])
+
+    return {
+        'signals': signals,
+        'observed': n,
+        'mean_return': float(total / n) if n else np.nan,
+        'hit_rate': float(np.count_nonzero(observed & obs['positive']) / n) if n else np.nan,
+        'total_return': float(equity[-1] - 1) if len(equity) else 0.0,
+        'max_drawdown': max_drawdown(equity),
+    }
+
+_worker_obs = None
+
+def _init_worker(obs):
+    global _worker_obs
+    _worker_obs = obs
+
+def _evaluate_chunk(combos):
+    return [evaluate_combo(_worker_obs, combo) for combo in combos]
+
+def run_sweep(obs, grid, workers=SWEEP_WORKERS, chunk_size=CHUNK_SIZE):
+    """计算网格中全部组合，返回每个组合的阈值和统计（未排序）"""
+    combos = list(itertools.product(*[range(len(values)) for _, _, values in grid]))
+    chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        _init_worker(obs)
+        results = [r for chunk in chunks for r in _evaluate_chunk(chunk)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(obs,)) as executor:
+            results = [r for chunk_results in executor.map(_evaluate_chunk, chunks) for r in chunk_results]
+
+    columns = [f'{field} {op}' for field, op, _ in grid]
+    records = []
+    for combo, result in zip(combos, results):
+        thresholds = {col: grid[i][2][index] for i, (col, index) in enumerate(zip(columns, combo))}
+        records.append({**thresholds, **result})
+    return pd.DataFrame(records)
+
+def rank_results(results, min_signals=MIN_SIGNALS, sort_by='mean_return'):
+    ranked = results[results['observed'] >= min_signals]
+    return ranked.sort_values([sort_by, 'observed'], ascending=[False, False]).reset_index(drop=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-strategy', help='作为超集的策略标签，默认使用全部入选股票')
+    parser.add_argument('--horizon', type=int, default=1, help='持有天数')
+    parser.add_argument('--grid', help='网格 JSON 文件，默认使用 DEFAULT_GRID')
+    parser.add_argument('--workers', type=int, default=SWEEP_WORKERS)
+    parser.add_argument('--min-signals', type=int, default=MIN_SIGNALS)
+    parser.add_argument('--sort-by', default='mean_return',
+                        choices=['mean_return', 'hit_rate', 'total_return'])
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help='全部组合的结果（不按 --min-signals 过滤）保存为 CSV')
+    parser.add_argument('--table', default=SWEEP_TABLE, help=f'超集所在的表，默认 {SWEEP_TABLE}')
+    parser.add_argument('--local', action='store_true', help='只使用本地分区（仅包含 stocks 表），不访问 Supabase')
+    args = parser.parse_args()
+
+    if args.local and args.table != 'stocks':
+        print(f"❌ 本地分区只包含 stocks 表，不包含 {args.table}；使用 --local 时请加 --table stocks")
+        return 1
+    repo = None if args.local else StockRepository.from_env()
+    history = load_history(repo, table=args.table)
+    if history.empty:
+        print("❌ 没有可用的历史数据")
+        return 1
+
+    grid = load_grid(args.grid) if args.grid else DEFAULT_GRID
+    panel = build_panel(history, load_price_file())
+    obs = build_observations(panel, grid, args.horizon, args.base_strategy)
+
+    start = time.perf_counter()
+    results = run_sweep(obs, grid, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"🧮 {len(results)} 个组合, 超集信号 {obs['n_signals']} 个, 耗时 {elapsed:.2f}s")
+
+    if args.output:
+        results.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"📄 结果已保存: {args.output}")
+    ranked = rank_results(results, args.min_signals, args.sort_by)
+    if ranked.empty:
+        print(f"⚠️ 没有组合的有收益信号数达到 {args.min_signals}")
+        return 0
+    print(ranked.head(args.top).to_string())
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
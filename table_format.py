@@ -0,0 +1,72 @@
+"""
+股票明细表的展示数据准备
+数值列保持数值 dtype（表格内点击列头按数值排序），单位换算整列完成，
+显示格式交给 st.column_config 的 printf 格式，不再逐个单元格转换为字符串。
+筛选和排序在服务端用 pandas 完成，只把结果发送给浏览器。
+"""
+
+import pandas as pd
+
+# 列 -> 显示名
+COLUMN_LABELS = {
+    'code': '股票代码',
+    'stock_name': '股票名称',
+    'latest_price': '最新价',
+    'latest_change_pct': '最新涨跌幅(%)',
+    'auction_change_pct': '竞价涨幅(%)',
+    'pe_ttm': '市盈率TTM',
+    'market_cap': '总市值',
+    'volume_ratio': '量比',
+    'listing_board': '上市板块',
+    'auction_type': '竞价异动类型',
+    'auction_rating': '竞价评级',
+    'strategies': '命中策略',
+}
+
+# 数值列 -> printf 显示格式
+NUMBER_FORMATS = {
+    'code': '%06d',
+    'latest_price': '%.2f',
+    'latest_change_pct': '%.2f%%',
+    'auction_change_pct': '%.2f%%',
+    'pe_ttm': '%.2f',
+    'market_cap': '%.2f亿',
+    'volume_ratio': '%.2f',
+}
+
+# 展示前的单位换算（除数）
+UNIT_SCALES = {
+    'market_cap': 1e8,
+}
+
+# 可排序的数值列
+SORTABLE_COLUMNS = ['latest_change_pct', 'auction_change_pct', 'pe_ttm', 'market_cap', 'volume_ratio']
+
+def search_mask(df, text):
+    """按代码前缀或名称包含筛选，向量化字符串匹配"""
+    text = (text or '').strip()
+    if not text:
+        return pd.Series(True, index=df.index)
+    mask = pd.Series(False, index=df.index)
+    if 'code' in df.columns:
+        mask |= df['code'].astype(str).str.zfill(6).str.startswith(text)
+    if 'stock_name' in df.columns:
+        mask |= df['stock_name'].astype(str).str.contains(text, regex=False, na=False)
+    return mask
+
+def prepare_table(df, columns, sort_by=None, ascending=False, search=None, boards=None):
+    """选列、筛选、排序和单位换算，返回仍为数值 dtype 的展示表（列名不变）"""
+    table = df[[col for col in columns if col in df.columns]]
+    mask = search_mask(table, search)
+    if boards and 'listing_board' in table.columns:
+        mask &= table['listing_board'].isin(boards)
+    table = table[mask]
+
+    if sort_by in table.columns:
+        table = table.sort_values(sort_by, ascending=ascending, na_position='last')
+
+    table = table.reset_index(drop=True)
+    for column, scale in UNIT_SCALES.items():
+        if column in table.columns:
+            table[column] = pd.to_numeric(table[column], errors='coerce') / scale
+    return table
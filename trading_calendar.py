@@ -0,0 +1,67 @@
+"""
+A 股交易日历
+周一至周五为交易日，去掉 trading_holidays.txt 中列出的休市日；
+节假日表未覆盖的年份只按工作日判断，并打印一次提示。
+"""
+
+import os
+from datetime import date, datetime, timedelta
+
+TRADING_HOLIDAYS_FILE = os.getenv(
+    'TRADING_HOLIDAYS_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trading_holidays.txt')
+)
+
+_holidays = None
+_warned_years = set()
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def load_holidays(path=TRADING_HOLIDAYS_FILE):
+    """读取休市日，返回 (休市日集合, 覆盖的年份集合)"""
+    holidays = set()
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    holidays.add(date.fromisoformat(line))
+    return holidays, {d.year for d in holidays}
+
+def _get_holidays():
+    global _holidays
+    if _holidays is None:
+        _holidays = load_holidays()
+    return _holidays
+
+def is_trading_day(value):
+    day = _as_date(value)
+    if day.weekday() >= 5:
+        return False
+    holidays, years = _get_holidays()
+    if day.year not in years and day.year not in _warned_years:
+        _warned_years.add(day.year)
+        print(f"⚠️ 休市日表未覆盖 {day.year} 年，只按工作日判断")
+    return day not in holidays
+
+def trading_days(start, end):
+    """[start, end] 区间内的交易日，返回 'YYYY-MM-DD' 字符串列表"""
+    day, end = _as_date(start), _as_date(end)
+    days = []
+    while day <= end:
+        if is_trading_day(day):
+            days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+def previous_trading_day(value):
+    """value 之前最近的一个交易日"""
+    day = _as_date(value) - timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day.isoformat()
@@ -0,0 +1,315 @@
+"""
+问财数据获取客户端
+在 pywencai 外面加一层：多个同花顺 Cookie 轮换使用并分别限速，请求失败按指数退避重试并换用其他 Cookie，
+被限流的 Cookie 暂停一段时间；原始结果按 (查询语句, 交易分钟) 做内容寻址缓存，
+同一分钟内的重跑和补数不再请求上游。
+传输层可替换：默认调用 pywencai.get，设置 WENCAI_FIXTURE_DIR 后改为回放录制的结果，便于离线运行。
+
+用法:
+    python wencai_client.py record fixtures/wencai   # 录制 strategies.json 中全部策略的当前结果
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+# 单个查询的最大重试次数
+WENCAI_MAX_RETRIES = int(os.getenv('WENCAI_MAX_RETRIES', '3'))
+
+# 同一个 Cookie 相邻两次请求的最小间隔（秒）
+WENCAI_COOKIE_INTERVAL = float(os.getenv('WENCAI_COOKIE_INTERVAL', '1'))
+
+# Cookie 被限流后的暂停时间（秒），连续被限流时翻倍
+WENCAI_COOLDOWN = float(os.getenv('WENCAI_COOLDOWN', '30'))
+
+# 原始结果缓存目录，设为空字符串可关闭缓存
+WENCAI_CACHE_DIR = os.getenv(
+    'WENCAI_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'wencai_cache')
+)
+
+# 缓存保留天数
+WENCAI_CACHE_DAYS = int(os.getenv('WENCAI_CACHE_DAYS', '7'))
+
+# 录制结果目录，设置后不再访问问财，直接回放
+WENCAI_FIXTURE_DIR = os.getenv('WENCAI_FIXTURE_DIR', '')
+
+# 视为被限流或登录失效的错误关键字，命中后暂停该 Cookie
+RATE_LIMIT_PATTERN = re.compile(r'\b(401|403|429)\b|频繁|限制|登录|forbidden|too many', re.IGNORECASE)
+
+def parse_cookies(value):
+    """THS_COOKIE 中每行一个 Cookie（Cookie 本身含分号，不能用分号分隔），去掉空行和重复项"""
+    cookies = []
+    for line in (value or '').splitlines():
+        line = line.strip()
+        if line and line not in cookies:
+            cookies.append(line)
+    return cookies
+
+def trading_minute(now=None):
+    """北京时间精确到分钟，作为缓存键的一部分"""
+    now = (now or datetime.now(BEIJING_TZ)).astimezone(BEIJING_TZ)
+    return now.strftime('%Y-%m-%dT%H:%M')
+
+def normalize_query(query):
+    return ' '.join(str(query).split())
+
+def cache_key(query, minute):
+    payload = json.dumps({'query': normalize_query(query), 'minute': minute}, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def query_key(query):
+    """录制结果的文件名只取决于查询语句"""
+    return hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+
+def is_rate_limited(error):
+    return bool(RATE_LIMIT_PATTERN.search(str(error)))
+
+def _write_pickle(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    import pandas as pd
+
+    tmp_path = f'{path}.tmp'
+    pd.to_pickle(data, tmp_path)
+    os.replace(tmp_path, path)
+
+class CookiePool:
+    """按 Cookie 记录下次可用时间、请求数和失败数，每次取最早可用的 Cookie"""
+
+    def __init__(self, cookies, min_interval=WENCAI_COOKIE_INTERVAL, cooldown=WENCAI_COOLDOWN):
+        self.cookies = list(cookies) or [None]
+        self.min_interval = max(0.0, float(min_interval))
+        self.cooldown = max(0.0, float(cooldown))
+        self._lock = threading.Lock()
+        self._state = [
+            {'next_at': 0.0, 'requests': 0, 'errors': 0, 'rate_limited': 0, 'strikes': 0}
+            for _ in self.cookies
+        ]
+
+    def acquire(self, exclude=None):
+        """占用一个 Cookie（必要时等待到可用时间），返回下标；exclude 中的下标在有其他选择时跳过"""
+        with self._lock:
+            candidates = [i for i in range(len(self.cookies)) if i not in (exclude or ())]
+            if not candidates:
+                candidates = list(range(len(self.cookies)))
+            index = min(candidates, key=lambda i: self._state[i]['next_at'])
+            state = self._state[index]
+            now = time.monotonic()
+            start = max(now, state['next_at'])
+            state['next_at'] = start + self.min_interval
+            state['requests'] += 1
+        if start > now:
+            time.sleep(start - now)
+        return index
+
+    def release(self, index, error=None):
+        """记录请求结果；被限流时按连续次数翻倍暂停该 Cookie"""
+        with self._lock:
+            state = self._state[index]
+            if error is None:
+                state['strikes'] = 0
+                return
+            state['errors'] += 1
+            if is_rate_limited(error):
+                state['rate_limited'] += 1
+                state['strikes'] += 1
+                pause = self.cooldown * (2 ** (state['strikes'] - 1))
+                state['next_at'] = max(state['next_at'], time.monotonic() + pause)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {'cookie': f'#{i + 1}', 'requests': s['requests'], 'errors': s['errors'],
+                 'rate_limited': s['rate_limited']}
+                for i, s in enumerate(self._state)
+            ]
+
+class ResponseCache:
+    """按缓存键保存原始结果（pickle，保留问财返回的原始列和类型）"""
+
+    def __init__(self, directory=WENCAI_CACHE_DIR, max_age_days=WENCAI_CACHE_DAYS):
+        self.directory = directory
+        self.max_age_days = max_age_days
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.pkl')
+
+    def get(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        import pandas as pd
+
+        try:
+            return pd.read_pickle(path)
+        except Exception as e:
+            print(f"⚠️ 读取问财缓存失败: {e}")
+            return None
+
+    def put(self, key, data):
+        try:
+            _write_pickle(data, self.path(key))
+        except Exception as e:
+            print(f"⚠️ 写入问财缓存失败: {e}")
+
+    def prune(self):
+        """删除超过保留天数的缓存，返回删除的文件数"""
+        if not os.path.isdir(self.directory):
+            return 0
+        cutoff = time.time() - self.max_age_days * 86400
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+def pywencai_transport(query, cookie):
+    """默认传输层：直接调用 pywencai"""
+    import pywencai
+    return pywencai.get(query=query, cookie=cookie)
+
+class FixtureTransport:
+    """回放录制的问财结果；设置 fallback 时，缺少的结果改为调用 fallback 并录制下来"""
+
+    def __init__(self, directory=WENCAI_FIXTURE_DIR, fallback=None):
+        self.directory = directory
+        self.fallback = fallback
+
+    def path(self, query):
+        return os.path.join(self.directory, f'{query_key(query)}.pkl')
+
+    def record(self, query, data):
+        _write_pickle(data, self.path(query))
+
+    def __call__(self, query, cookie):
+        path = self.path(query)
+        if os.path.exists(path):
+            import pandas as pd
+            return pd.read_pickle(path)
+        if self.fallback is None:
+            raise LookupError(f'没有录制的问财结果: {normalize_query(query)[:40]}')
+        data = self.fallback(query, cookie)
+        if data is not None:
+            self.record(query, data)
+        return data
+
+class WencaiClient:
+    """带重试、Cookie 轮换和结果缓存的问财查询客户端，可在多个线程中共享"""
+
+    def __init__(self, cookies=None, transport=None, cache=None, max_retries=WENCAI_MAX_RETRIES,
+                 backoff=1.0, max_backoff=16.0, cookie_interval=WENCAI_COOKIE_INTERVAL,
+                 cooldown=WENCAI_COOLDOWN):
+        self.pool = CookiePool(cookies or [], cookie_interval, cooldown)
+        self.transport = transport or pywencai_transport
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._counters = {'queries': 0, 'cache_hits': 0, 'attempts': 0, 'failures': 0}
+
+    @classmethod
+    def from_env(cls, cookie_value=None, **kwargs):
+        """按环境变量创建：THS_COOKIE 多行轮换，WENCAI_FIXTURE_DIR 回放，WENCAI_CACHE_DIR 缓存；
+        kwargs 覆盖其余构造参数"""
+        cookies = parse_cookies(cookie_value if cookie_value is not None else os.getenv('THS_COOKIE', ''))
+        transport = FixtureTransport(WENCAI_FIXTURE_DIR) if WENCAI_FIXTURE_DIR else None
+        cache = None
+        if WENCAI_CACHE_DIR:
+            cache = ResponseCache(WENCAI_CACHE_DIR)
+            try:
+                cache.prune()
+            except OSError as e:
+                print(f"⚠️ 清理问财缓存失败: {e}")
+        return cls(cookies, transport=transport, cache=cache, **kwargs)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, query, minute=None, use_cache=True):
+        """执行问财查询；同一交易分钟内相同的查询直接返回缓存结果
+
+        pywencai 返回 None（通常是 Cookie 无效或被拦截）视为失败重试，全部失败时抛出 RuntimeError。
+        """
+        self._count('queries')
+        key = cache_key(query, minute or trading_minute())
+        if use_cache and self.cache is not None:
+            data = self.cache.get(key)
+            if data is not None:
+                self._count('cache_hits')
+                return data
+
+        tried = set()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+                time.sleep(delay + random.uniform(0, delay / 2))
+            # 重试时优先换用还没试过的 Cookie
+            index = self.pool.acquire(exclude=tried)
+            tried.add(index)
+            self._count('attempts')
+            try:
+                data = self.transport(query, self.pool.cookies[index])
+            except LookupError:
+                # 回放时缺少录制结果，重试也不会成功
+                self.pool.release(index)
+                self._count('failures')
+                raise
+            except Exception as e:
+                self.pool.release(index, e)
+                last_error = e
+                continue
+            if data is None:
+                # Cookie 无效或被拦截时 pywencai 通常返回 None，按失败处理并换 Cookie 重试
+                last_error = RuntimeError('问财返回空结果（Cookie 可能无效或被拦截）')
+                self.pool.release(index, last_error)
+                continue
+            self.pool.release(index)
+            if use_cache and self.cache is not None:
+                self.cache.put(key, data)
+            return data
+
+        self._count('failures')
+        raise RuntimeError(f'问财查询失败（尝试 {self.max_retries + 1} 次）: {last_error}') from last_error
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters['cookies'] = self.pool.stats()
+        return counters
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != 'record':
+        print(__doc__)
+        return 1
+
+    from strategies import load_strategy_config
+
+    directory = sys.argv[2]
+    client = WencaiClient(parse_cookies(os.getenv('THS_COOKIE', '')))
+    fixtures = FixtureTransport(directory)
+    for strategy in load_strategy_config()['strategies']:
+        try:
+            data = client.get(strategy['query'], use_cache=False)
+        except RuntimeError as e:
+            print(f"⚠️ 策略 {strategy['title']} 未获取到数据，跳过: {e}")
+            continue
+        fixtures.record(strategy['query'], data)
+        print(f"💾 已录制 {strategy['title']}: {len(data)} 条 -> {fixtures.path(strategy['query'])}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())